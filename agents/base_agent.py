@@ -5,20 +5,79 @@ and enforces JSON‐only output. Each derived Agent inherits from this class.
 
 import os
 import json
+import time
+import random
 import textwrap
 import re
-from typing import List, Dict, Any
-from openai import OpenAI
+import asyncio
+import weakref
+from typing import List, Dict, Any, Iterator, AsyncIterator, Tuple
 from dotenv import load_dotenv
 
+from agents.llm_cache import LLMCache, cache_enabled_for, get_shared_cache
+from agents.context import serialize_context, count_tokens
+from agents.llm_provider import get_provider
+from agents.json_stream import JSONArrayStream, array_elements
+from agents.json_recovery import repair_json, default_recovery_metrics, RecoveryMetrics
+from agents.llm_metrics import LLMMetrics, default_llm_metrics, estimate_cost, prompt_hash
+
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    raise RuntimeError("Missing OPENAI_API_KEY in environment")
 
 dirname = os.path.dirname(__file__)
-# Instantiate the new client
-client = OpenAI(api_key=api_key)
+
+# max in-flight async LLM requests across all agents
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    """Semaphore shared by every agent running on the current event loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphores[loop]
+
+# retries of rate-limited / timed-out LLM requests
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = 20.0
+
+CONTINUE_PROMPT = (
+    "Your previous reply was cut off. Continue it exactly where it stopped: output only "
+    "the remaining characters of the JSON, without repeating anything already written."
+)
+REPAIR_PROMPT = (
+    "The user message is meant to be one JSON object but it does not parse. Return the "
+    "corrected JSON object only, changing nothing except what is needed to make it valid."
+)
+
+
+def _retry_kind(error: Exception) -> str | None:
+    """"rate_limit" / "timeout" for errors worth retrying, else None."""
+    try:
+        import openai
+    except ImportError:          # e.g. offline provider only
+        openai = None
+    if openai is not None:
+        if isinstance(error, openai.RateLimitError):
+            return "rate_limit"
+        if isinstance(error, openai.APITimeoutError):
+            return "timeout"
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    return None
+
+
+def _backoff(attempt: int, error: Exception) -> float:
+    """Server's Retry-After if given, else exponential backoff with jitter."""
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(LLM_BACKOFF_MAX, max(0.0, float(retry_after)))
+    except ValueError:
+        pass
+    return min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
 _PLACEHOLDER_RE = re.compile(r"\{\{(\w+?)\}\}")   # {{word}}
 
 def render_prompt(template: str, mapping: dict[str, str]) -> str:
@@ -31,6 +90,73 @@ def render_prompt(template: str, mapping: dict[str, str]) -> str:
         return mapping.get(key, match.group(0))   # keep original if missing
     return _PLACEHOLDER_RE.sub(_sub, template)
 
+
+def _delta_text(chunk: Any) -> str:
+    """Text carried by one ChatCompletionChunk ("" for role/usage-only chunks)."""
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+
+def _finish_reason(chunk: Any) -> str | None:
+    return chunk.choices[0].finish_reason if chunk.choices else None
+
+
+def _unsent_elements(reply: Any, emitted: Dict[str, int]) -> Iterator[Tuple[str, Any]]:
+    """Elements of `reply` beyond the first emitted[key] of each array (already streamed)."""
+    seen: Dict[str, int] = {}
+    for key, element in array_elements(reply):
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] > emitted.get(key, 0):
+            yield key, element
+
+
+class ChatStream:
+    """
+    Streamed agent reply. Iterate it for (key, element) pairs, yielded as soon
+    as each element of a top-level array (e.g. "links", "to_clarifier") has
+    been generated; once iteration finishes, `result` holds the whole parsed
+    reply. The request is sent when iteration starts.
+    """
+
+    def __init__(self):
+        self.result: Dict[str, Any] | None = None
+        self._events: Iterator[Tuple[str, Any]] = iter(())
+
+    @classmethod
+    def from_reply(cls, reply: Dict[str, Any]) -> "ChatStream":
+        """A stream over an already complete reply (e.g. one built without the LLM)."""
+        stream = cls()
+        stream.result = reply
+        stream._events = array_elements(reply)
+        return stream
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        return self._events
+
+    def wait(self) -> Dict[str, Any]:
+        """Drain the remaining elements and return the full reply."""
+        for _ in self:
+            pass
+        return self.result
+
+
+class AsyncChatStream:
+    """Async twin of ChatStream: `async for key, element in stream`, then `stream.result`."""
+
+    def __init__(self):
+        self.result: Dict[str, Any] | None = None
+        self._events: AsyncIterator[Tuple[str, Any]] | None = None
+
+    def __aiter__(self) -> AsyncIterator[Tuple[str, Any]]:
+        return self._events
+
+    async def wait(self) -> Dict[str, Any]:
+        async for _ in self:
+            pass
+        return self.result
+
+
 class BaseAgent:
     """
     Parent class for all LLM agents (query_handler, clarifier, tool_selector, info_extractor …).
@@ -38,43 +164,70 @@ class BaseAgent:
     A single ChatCompletion call is built from up to four logical parts:
       1. system prompt  (self.system_prompt rendered with user_profile & history_summary)
       2. conversation history summary (already inside the system prompt to save tokens)
-      3. retrieved context (optional)
+      3. retrieved context (optional; field-projected compact JSON, see agents.context)
       4. latest user query
     """
-    def __init__(self, agent_name: str, openai_client:  OpenAI = client):
+    def __init__(
+        self,
+        agent_name: str,
+        openai_client: Any = None,
+        use_cache: bool | None = None,
+        llm_cache: LLMCache | None = None,
+        async_openai_client: Any = None
+    ):
         self.agent_name = agent_name
-        self.openai = openai_client
+        # clients come from the configured provider (LLM_PROVIDER) on first use
+        self._openai = openai_client
+        self._async_openai = async_openai_client
+        self.model = "gpt-4.1"
+
+        # opt-in response cache (temperature-0 calls only); None → LLM_CACHE_AGENTS
+        self.use_cache = cache_enabled_for(agent_name) if use_cache is None else use_cache
+        self._llm_cache = llm_cache
+
+        # counters of clean / repaired / re-requested replies and retries
+        self.recovery_metrics: RecoveryMetrics = default_recovery_metrics
+        # per-call latency / token / cost records, aggregated per turn and session
+        self.llm_metrics: LLMMetrics = default_llm_metrics
 
         # load prompt templates
         base_dir = "prompts"
         with open(os.path.join(dirname, "..", base_dir, f"{agent_name}_sys.txt"), encoding="utf-8") as f:
             self._sys_template = f.read().strip()
 
+    @property
+    def openai(self) -> Any:
+        if self._openai is None:
+            self._openai = get_provider().client(self.agent_name)
+        return self._openai
+
+    @property
+    def async_openai(self) -> Any:
+        # not cached here: the provider keeps one client per event loop
+        if self._async_openai is not None:
+            return self._async_openai
+        return get_provider().async_client(self.agent_name)
+
+    @property
+    def llm_cache(self) -> LLMCache:
+        if self._llm_cache is None:
+            self._llm_cache = get_shared_cache()
+        return self._llm_cache
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss/store counts of the LLM cache (all agents sharing it)."""
+        return self.llm_cache.stats()
+
     # --------------------------------------------------------------------- #
     # Core helper that every concrete agent calls.
     # --------------------------------------------------------------------- #
-    def _chat(
+    def _build_messages(
         self,
         user_query: str,
-        *,
         user_profile: Dict[str, Any] | None = None,
         history_summary: str | None = None,
         retrieved_data: str | Dict[str, Any] | List[Any] | None = None,
-        temperature: float = 0.0,
-        max_tokens: int = 1500,
-    ) -> Dict[str, Any]:
-        """
-        Build and send a ChatCompletion request. Returns the *parsed JSON* that
-        the assistant outputs (raise if parsing fails).
-
-        Arguments
-        ---------
-        user_query        – The user’s latest natural-language request.
-        user_profile      – Dict inserted into {{user_profile}}.
-        history_summary   – One-paragraph assistant summary of prior turns.
-        retrieved_data    – Extra context (string or JSON-able). Put in its own
-                            system-level message with name='retrieved_context'.
-        """
+    ) -> List[Dict[str, str]]:
         # ---- 1) render system prompt template ---- #
         rendered_sys = render_prompt(
             self._sys_template,
@@ -90,12 +243,8 @@ class BaseAgent:
 
         # ---- 2) optional retrieved context ---- #
         if retrieved_data:
-            # stringify in a predictable way to avoid parsing errors downstream
-            retrieved_str = (
-                retrieved_data
-                if isinstance(retrieved_data, str)
-                else json.dumps(retrieved_data, ensure_ascii=False, indent=2)
-            )
+            # only the fields this agent reads, compact, within its token budget
+            retrieved_str = serialize_context(retrieved_data, self.agent_name, model=self.model)
             messages.append({
                 "role": "system",
                 "name": "retrieved_context",
@@ -104,18 +253,26 @@ class BaseAgent:
 
         # ---- 3) latest user query ---- #
         messages.append({"role": "user", "content": user_query})
+        return messages
 
-        # ---- 4) send request ---- #
-        resp = self.openai.chat.completions.create(
-            model="gpt-4.1",
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            response_format={"type": "json_object"},
-        )
+    def _cache_for(self, temperature: float) -> LLMCache | None:
+        # only deterministic calls are worth replaying
+        return self.llm_cache if self.use_cache and temperature == 0 else None
 
-        assistant_msg = resp.choices[0].message.content
+    def _cached_reply(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int
+    ) -> Tuple[LLMCache | None, str | None, Any | None]:
+        """(cache, key, cached reply or None) for this request."""
+        cache = self._cache_for(temperature)
+        if cache is None:
+            return None, None, None
+        cache_key = cache.key(self.agent_name, self.model, temperature, max_tokens, messages)
+        return cache, cache_key, cache.get(cache_key, self.agent_name)
 
+    def _parse_reply(self, assistant_msg: str) -> Dict[str, Any]:
         try:
             return json.loads(assistant_msg)
         except json.JSONDecodeError:
@@ -124,7 +281,444 @@ class BaseAgent:
             raise ValueError(
                 f"[{self.agent_name}] assistant returned non-JSON:\n{snippet}"
             )
-        
+
+    # --------------------------------------------------------------------- #
+    # Per-call instrumentation (see agents.llm_metrics)
+    # --------------------------------------------------------------------- #
+    def _begin_call(self, mode: str, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {
+            "agent": self.agent_name,
+            "model": self.model,
+            "mode": mode,
+            "cache": "off",
+            "wall_ms": 0.0,
+            "ttft_ms": None,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "tokens_estimated": False,
+            "requests": 0,
+            "retries": 0,
+            "parse": None,
+            "cost_usd": 0.0,
+            "prompt_chars": sum(len(m.get("content", "")) for m in messages),
+            "prompt_hash": prompt_hash(messages),
+            "error": None,
+            "_started": time.perf_counter(),
+        }
+
+    def _set_cache_state(self, call: Dict[str, Any], cache: LLMCache | None, cached: Any | None) -> None:
+        call["cache"] = "off" if cache is None else ("hit" if cached is not None else "miss")
+
+    def _add_usage(self, call: Dict[str, Any], usage: Any, messages: List[Dict[str, str]], content: str) -> None:
+        """Token counts from the response, or estimated locally if it carries none."""
+        if usage is not None:
+            call["prompt_tokens"] += usage.prompt_tokens
+            call["completion_tokens"] += usage.completion_tokens
+        else:
+            call["prompt_tokens"] += sum(count_tokens(m.get("content", ""), self.model) for m in messages)
+            call["completion_tokens"] += count_tokens(content, self.model)
+            call["tokens_estimated"] = True
+
+    def _first_token(self, call: Dict[str, Any]) -> None:
+        if call["ttft_ms"] is None:
+            call["ttft_ms"] = round((time.perf_counter() - call["_started"]) * 1000, 1)
+
+    def _end_call(self, call: Dict[str, Any], error: BaseException | None = None) -> None:
+        if error is not None:
+            call["error"] = f"{type(error).__name__}: {error}"
+        call["wall_ms"] = round((time.perf_counter() - call.pop("_started")) * 1000, 1)
+        call["total_tokens"] = call["prompt_tokens"] + call["completion_tokens"]
+        call["cost_usd"] = estimate_cost(self.model, call["prompt_tokens"], call["completion_tokens"])
+        self.llm_metrics.record(call)
+
+    # --------------------------------------------------------------------- #
+    # Retries and recovery of malformed replies (see agents.json_recovery)
+    # --------------------------------------------------------------------- #
+    def recovery_stats(self) -> Dict[str, Dict[str, int]]:
+        """How often each recovery path / fix / retry was taken, per agent."""
+        return self.recovery_metrics.snapshot()
+
+    def _retry_or_raise(self, error: Exception, attempt: int, call: Dict[str, Any]) -> float:
+        """Backoff before retrying `error`, recorded per kind; re-raise if not retryable or out of retries."""
+        kind = _retry_kind(error)
+        if kind is None or attempt >= LLM_MAX_RETRIES:
+            raise error
+        self.recovery_metrics.record(self.agent_name, f"retry_{kind}")
+        call["retries"] += 1
+        return _backoff(attempt, error)
+
+    def _create(self, call: Dict[str, Any], **kwargs) -> Any:
+        """chat.completions.create with bounded retries on rate-limit / timeout errors."""
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            call["requests"] += 1
+            try:
+                return self.openai.chat.completions.create(model=self.model, **kwargs)
+            except Exception as e:
+                time.sleep(self._retry_or_raise(e, attempt, call))
+
+    async def _acreate(self, call: Dict[str, Any], **kwargs) -> Any:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            call["requests"] += 1
+            try:
+                return await self.async_openai.chat.completions.create(model=self.model, **kwargs)
+            except Exception as e:
+                await asyncio.sleep(self._retry_or_raise(e, attempt, call))
+
+    def _parse_path(self, call: Dict[str, Any], path: str) -> None:
+        call["parse"] = path
+        self.recovery_metrics.record(self.agent_name, path)
+
+    def _local_parse(self, content: str, call: Dict[str, Any]) -> Any | None:
+        """Parse, repairing locally if needed; None when a follow-up request is required."""
+        try:
+            parsed = json.loads(content)
+            self._parse_path(call, "clean")
+            return parsed
+        except json.JSONDecodeError:
+            pass
+        try:
+            parsed, fixes = repair_json(content)
+        except json.JSONDecodeError:
+            return None
+        self._parse_path(call, "repaired")
+        for fix in fixes:
+            self.recovery_metrics.record(self.agent_name, f"fix_{fix}")
+        return parsed
+
+    @staticmethod
+    def _followup_request(
+        messages: List[Dict[str, str]],
+        content: str,
+        finish_reason: str | None,
+        max_tokens: int
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        The cheapest request that can still save this reply: ask the model to
+        continue a reply cut at max_tokens, otherwise send only the broken text
+        back to be fixed (no prompt or context is re-sent).
+        """
+        if finish_reason == "length":
+            return "continued", dict(
+                messages=messages + [
+                    {"role": "assistant", "content": content},
+                    {"role": "user", "content": CONTINUE_PROMPT},
+                ],
+                temperature=0.0,
+                max_tokens=max_tokens,
+            )
+        return "repair_request", dict(
+            messages=[
+                {"role": "system", "content": REPAIR_PROMPT},
+                {"role": "user", "content": content},
+            ],
+            temperature=0.0,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+        )
+
+    def _finish_followup(self, path: str, content: str, resp: Any, kwargs: Dict[str, Any], call: Dict[str, Any]) -> Dict[str, Any]:
+        reply = resp.choices[0].message.content or ""
+        self._add_usage(call, getattr(resp, "usage", None), kwargs["messages"], reply)
+        text = content + reply if path == "continued" else reply
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                parsed = repair_json(text)[0]
+            except json.JSONDecodeError:
+                self._parse_path(call, "failed")
+                return self._parse_reply(text)      # raises ValueError
+        self._parse_path(call, path)
+        return parsed
+
+    def _recover(
+        self,
+        content: str,
+        finish_reason: str | None,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        call: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Parsed reply: as is, locally repaired, or — only if that fails — via a
+        continue / repair request. ValueError if all of them fail.
+        """
+        parsed = self._local_parse(content, call)
+        if parsed is not None:
+            return parsed
+        path, kwargs = self._followup_request(messages, content, finish_reason, max_tokens)
+        resp = self._create(call, **kwargs)
+        return self._finish_followup(path, content, resp, kwargs, call)
+
+    async def _arecover(
+        self,
+        content: str,
+        finish_reason: str | None,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        call: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        parsed = self._local_parse(content, call)
+        if parsed is not None:
+            return parsed
+        path, kwargs = self._followup_request(messages, content, finish_reason, max_tokens)
+        resp = await self._acreate(call, **kwargs)
+        return self._finish_followup(path, content, resp, kwargs, call)
+
+    def _chat(
+        self,
+        user_query: str,
+        *,
+        user_profile: Dict[str, Any] | None = None,
+        history_summary: str | None = None,
+        retrieved_data: str | Dict[str, Any] | List[Any] | None = None,
+        temperature: float = 0.0,
+        max_tokens: int = 1500,
+    ) -> Dict[str, Any]:
+        """
+        Build and send a ChatCompletion request. Returns the *parsed JSON* that
+        the assistant outputs. Malformed JSON is repaired locally or with a
+        small follow-up request; ValueError only if that fails too.
+
+        Arguments
+        ---------
+        user_query        – The user’s latest natural-language request.
+        user_profile      – Dict inserted into {{user_profile}}.
+        history_summary   – One-paragraph assistant summary of prior turns.
+        retrieved_data    – Extra context (string or JSON-able). Put in its own
+                            system-level message with name='retrieved_context'.
+        """
+        messages = self._build_messages(user_query, user_profile, history_summary, retrieved_data)
+        call = self._begin_call("sync", messages)
+        try:
+            # ---- 4) identical deterministic request already answered? ---- #
+            cache, cache_key, cached = self._cached_reply(messages, temperature, max_tokens)
+            self._set_cache_state(call, cache, cached)
+            if cached is not None:
+                self._end_call(call)
+                return cached
+
+            # ---- 5) send request (retried on rate limits / timeouts) ---- #
+            resp = self._create(
+                call,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                response_format={"type": "json_object"},
+            )
+
+            choice = resp.choices[0]
+            content = choice.message.content or ""
+            self._add_usage(call, getattr(resp, "usage", None), messages, content)
+            parsed = self._recover(content, choice.finish_reason, messages, max_tokens, call)
+        except BaseException as e:
+            self._end_call(call, e)
+            raise
+        self._end_call(call)
+        if cache is not None:
+            cache.put(cache_key, parsed, self.agent_name)
+        return parsed
+
+    async def _achat(
+        self,
+        user_query: str,
+        *,
+        user_profile: Dict[str, Any] | None = None,
+        history_summary: str | None = None,
+        retrieved_data: str | Dict[str, Any] | List[Any] | None = None,
+        temperature: float = 0.0,
+        max_tokens: int = 1500,
+        timeout: float | None = None,
+    ) -> Dict[str, Any]:
+        """
+        Async twin of `_chat` on the AsyncOpenAI client. At most
+        LLM_MAX_CONCURRENCY requests (all agents together) are in flight per
+        event loop; `timeout` is a per-call deadline in seconds covering the
+        wait for a slot plus the request, its retries and any recovery request
+        (asyncio.TimeoutError when exceeded). Cancelling the awaiting task
+        cancels the HTTP request.
+        """
+        messages = self._build_messages(user_query, user_profile, history_summary, retrieved_data)
+        call = self._begin_call("async", messages)
+
+        async def _send():
+            async with _llm_semaphore():
+                resp = await self._acreate(
+                    call,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    response_format={"type": "json_object"},
+                )
+                choice = resp.choices[0]
+                content = choice.message.content or ""
+                self._add_usage(call, getattr(resp, "usage", None), messages, content)
+                return await self._arecover(content, choice.finish_reason, messages, max_tokens, call)
+
+        try:
+            cache, cache_key, cached = self._cached_reply(messages, temperature, max_tokens)
+            self._set_cache_state(call, cache, cached)
+            if cached is not None:
+                self._end_call(call)
+                return cached
+            parsed = await asyncio.wait_for(_send(), timeout)
+        except BaseException as e:
+            self._end_call(call, e)
+            raise
+        self._end_call(call)
+        if cache is not None:
+            cache.put(cache_key, parsed, self.agent_name)
+        return parsed
+
+    def _chat_stream(
+        self,
+        user_query: str,
+        *,
+        user_profile: Dict[str, Any] | None = None,
+        history_summary: str | None = None,
+        retrieved_data: str | Dict[str, Any] | List[Any] | None = None,
+        temperature: float = 0.0,
+        max_tokens: int = 1500,
+    ) -> ChatStream:
+        """
+        Streaming `_chat`: returns a ChatStream that yields (key, element) for
+        every element of the reply's top-level arrays as it completes, parsing
+        the JSON incrementally; `stream.result` is the full reply afterwards.
+        Cache hits replay the cached reply's elements. A malformed reply is
+        recovered like in `_chat` at the end, and any elements recovered
+        beyond those already yielded are yielded then.
+        """
+        messages = self._build_messages(user_query, user_profile, history_summary, retrieved_data)
+        stream = ChatStream()
+
+        def _events() -> Iterator[Tuple[str, Any]]:
+            call = self._begin_call("stream", messages)
+            try:
+                cache, cache_key, cached = self._cached_reply(messages, temperature, max_tokens)
+                self._set_cache_state(call, cache, cached)
+                if cached is not None:
+                    stream.result = cached
+                    yield from array_elements(cached)
+                    self._end_call(call)
+                    return
+
+                chunks = self._create(
+                    call,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    response_format={"type": "json_object"},
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                parser = JSONArrayStream()
+                finish_reason = usage = None
+                for chunk in chunks:
+                    finish_reason = _finish_reason(chunk) or finish_reason
+                    usage = getattr(chunk, "usage", None) or usage
+                    delta = _delta_text(chunk)
+                    if delta:
+                        self._first_token(call)
+                        yield from parser.feed(delta)
+
+                self._add_usage(call, usage, messages, parser.text())
+                stream.result = self._recover(parser.text(), finish_reason, messages, max_tokens, call)
+                yield from _unsent_elements(stream.result, parser.emitted)
+            except BaseException as e:
+                self._end_call(call, e)
+                raise
+            self._end_call(call)
+            if cache is not None:
+                cache.put(cache_key, stream.result, self.agent_name)
+
+        stream._events = _events()
+        return stream
+
+    def _achat_stream(
+        self,
+        user_query: str,
+        *,
+        user_profile: Dict[str, Any] | None = None,
+        history_summary: str | None = None,
+        retrieved_data: str | Dict[str, Any] | List[Any] | None = None,
+        temperature: float = 0.0,
+        max_tokens: int = 1500,
+        timeout: float | None = None,
+    ) -> AsyncChatStream:
+        """
+        Async `_chat_stream`. Holds one LLM_MAX_CONCURRENCY slot while the
+        reply streams; `timeout` bounds the slot wait plus the whole stream.
+        """
+        messages = self._build_messages(user_query, user_profile, history_summary, retrieved_data)
+        stream = AsyncChatStream()
+
+        async def _events() -> AsyncIterator[Tuple[str, Any]]:
+            call = self._begin_call("astream", messages)
+            try:
+                cache, cache_key, cached = self._cached_reply(messages, temperature, max_tokens)
+                self._set_cache_state(call, cache, cached)
+                if cached is not None:
+                    stream.result = cached
+                    for event in array_elements(cached):
+                        yield event
+                    self._end_call(call)
+                    return
+
+                loop = asyncio.get_running_loop()
+                deadline = None if timeout is None else loop.time() + timeout
+
+                def _left() -> float | None:
+                    return None if deadline is None else max(0.0, deadline - loop.time())
+
+                semaphore = _llm_semaphore()
+                await asyncio.wait_for(semaphore.acquire(), _left())
+                try:
+                    chunks = await asyncio.wait_for(
+                        self._acreate(
+                            call,
+                            messages=messages,
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            response_format={"type": "json_object"},
+                            stream=True,
+                            stream_options={"include_usage": True},
+                        ),
+                        _left(),
+                    )
+                    parser = JSONArrayStream()
+                    finish_reason = usage = None
+                    chunk_iter = chunks.__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(anext(chunk_iter), _left())
+                        except StopAsyncIteration:
+                            break
+                        finish_reason = _finish_reason(chunk) or finish_reason
+                        usage = getattr(chunk, "usage", None) or usage
+                        delta = _delta_text(chunk)
+                        if delta:
+                            self._first_token(call)
+                            for event in parser.feed(delta):
+                                yield event
+
+                    self._add_usage(call, usage, messages, parser.text())
+                    stream.result = await asyncio.wait_for(
+                        self._arecover(parser.text(), finish_reason, messages, max_tokens, call), _left()
+                    )
+                finally:
+                    semaphore.release()
+
+                for event in _unsent_elements(stream.result, parser.emitted):
+                    yield event
+            except BaseException as e:
+                self._end_call(call, e)
+                raise
+            self._end_call(call)
+            if cache is not None:
+                cache.put(cache_key, stream.result, self.agent_name)
+
+        stream._events = _events()
+        return stream
 
 if __name__ == "__main__":
     example_profile = {
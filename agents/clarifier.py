@@ -2,6 +2,7 @@ import json
 from typing import Dict, Any, List
 
 from .base_agent import BaseAgent  
+from .context import compact_json
 
 class ClarifierAgent(BaseAgent):
     """
@@ -38,11 +39,33 @@ class ClarifierAgent(BaseAgent):
         Parsed JSON from the LLM with the schema specified in the system prompt.
         Raises ValueError if the assistant fails to emit valid JSON.
         """
+        return self._chat(**self._chat_kwargs(links_payload, user_profile, history_summary))
+
+    async def arun(
+        self,
+        links_payload: Dict[str, Any],
+        *,
+        user_profile: Dict[str, Any] | None = None,
+        history_summary: str | None = None,
+        timeout: float | None = None,
+    ) -> Dict[str, Any]:
+        """Async `run`; `timeout` is a per-call deadline in seconds."""
+        return await self._achat(
+            **self._chat_kwargs(links_payload, user_profile, history_summary),
+            timeout=timeout,
+        )
+
+    def _chat_kwargs(
+        self,
+        links_payload: Dict[str, Any],
+        user_profile: Dict[str, Any] | None,
+        history_summary: str | None,
+    ) -> Dict[str, Any]:
         # Feed the raw dict to the model as the *entire* user message.
-        user_query = json.dumps(links_payload["to_clarifier"], ensure_ascii=False, indent=2)
+        user_query = compact_json(links_payload["to_clarifier"])
 
         # No extra retrieved context for this agent.
-        return self._chat(
+        return dict(
             user_query=user_query,
             user_profile=user_profile or {},     # optional; can be empty
             history_summary=history_summary,     # optional; usually None here
@@ -0,0 +1,166 @@
+"""
+Context serialization for agent prompts.
+
+Instead of pretty-printing whole records, each agent gets only the fields it
+actually reads, as compact JSON, cut down to a per-agent token budget:
+
+  1. project  – keep the fields listed for the agent (nested child-link
+                metadata included), drop empty values ("", null, [], {})
+  2. measure  – count tokens with tiktoken (in requirements.txt); without it
+                ~4 chars/token is only a rough estimate that undercounts
+                CJK and JSON-heavy text
+  3. shrink   – while over budget, truncate the largest string (or list)
+                and mark it with "…[truncated N chars]"
+"""
+import json
+from typing import Dict, Any, List
+
+try:
+    import tiktoken
+except ImportError:          # fall back to a rough character heuristic
+    tiktoken = None
+
+# fields each agent reads from a retrieved record (None = keep everything)
+RECORD_FIELDS: Dict[str, List[str] | None] = {
+    "info_retriever": [
+        "link_id", "url", "source", "title", "description", "content", "author",
+        "channel", "published_at", "source_url", "links", "metadata", "truncated", "extracted",
+    ],
+    "tool_selector": None,
+    "query_handler": None,
+    "clarifier": None,
+}
+
+# fields kept for each workspace link / child-link metadata entry
+WORKSPACE_LINK_FIELDS = ["link", "platform", "is_confirmed", "add_to_db"]
+CHILD_LINK_FIELDS = ["channel", "title", "description", "author"]
+
+# token budget for the serialized retrieved context, per agent
+CONTEXT_BUDGETS: Dict[str, int] = {
+    "info_retriever": 6000,
+    "tool_selector": 1000,
+    "query_handler": 2000,
+    "clarifier": 2000,
+}
+DEFAULT_BUDGET = 4000
+
+_encoders: Dict[str, Any] = {}
+
+
+def count_tokens(text: str, model: str = "gpt-4.1") -> int:
+    if tiktoken is not None:
+        if model not in _encoders:
+            try:
+                _encoders[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encoders[model] = tiktoken.get_encoding("o200k_base")
+        return len(_encoders[model].encode(text))
+    return (len(text) + 3) // 4
+
+
+def compact_json(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def prune(data: Any) -> Any:
+    """Recursively drop empty values."""
+    if isinstance(data, dict):
+        out = {k: prune(v) for k, v in data.items()}
+        return {k: v for k, v in out.items() if not _is_empty(v)}
+    if isinstance(data, list):
+        return [v for v in (prune(v) for v in data) if not _is_empty(v)]
+    return data
+
+
+def project_record(record: Dict[str, Any], agent_name: str) -> Dict[str, Any]:
+    fields = RECORD_FIELDS.get(agent_name)
+    projected = dict(record) if fields is None else {k: record[k] for k in fields if k in record}
+    metadata = projected.get("metadata")
+    if fields is not None and isinstance(metadata, dict):
+        projected["metadata"] = {
+            link: {k: v for k, v in meta.items() if k in CHILD_LINK_FIELDS} if isinstance(meta, dict) else meta
+            for link, meta in metadata.items()
+        }
+    return prune(projected)
+
+
+def project_workspace(workspace_links: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """workspace_links (url → item) as a list of the fields agents need."""
+    return prune([
+        {k: item.get(k) for k in WORKSPACE_LINK_FIELDS if k in item}
+        for item in workspace_links.values()
+        if isinstance(item, dict)
+    ])
+
+
+def _largest(data: Any, path: tuple = ()) -> tuple[tuple, int]:
+    """Path to the biggest string or list inside `data` and its size."""
+    best: tuple[tuple, int] = ((), 0)
+    if isinstance(data, str):
+        return path, len(data)
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, list):
+        best = (path, len(compact_json(data))) if len(data) > 1 else best
+        items = enumerate(data)
+    else:
+        return best
+    for k, v in items:
+        candidate = _largest(v, path + (k,))
+        if candidate[1] > best[1]:
+            best = candidate
+    return best
+
+
+def _shrink_at(data: Any, path: tuple) -> None:
+    parent = data
+    for key in path[:-1]:
+        parent = parent[key]
+    value = parent[path[-1]]
+    if isinstance(value, str):
+        keep = len(value) // 2
+        parent[path[-1]] = value[:keep] + f"…[truncated {len(value) - keep} chars]"
+    elif isinstance(value, list):
+        keep = max(1, len(value) // 2)
+        parent[path[-1]] = value[:keep] + [f"…[{len(value) - keep} more items truncated]"]
+
+
+def fit_to_budget(data: Any, budget: int, model: str = "gpt-4.1") -> str:
+    """Compact JSON of `data`, truncating its largest fields until it fits `budget` tokens."""
+    text = compact_json(data)
+    if count_tokens(text, model) <= budget or not isinstance(data, (dict, list)):
+        return text
+    data = json.loads(text)        # private copy we can cut
+    for _ in range(200):
+        path, size = _largest(data)
+        if not path or size < 64:
+            break
+        _shrink_at(data, path)
+        text = compact_json(data)
+        if count_tokens(text, model) <= budget:
+            break
+    return text
+
+
+def serialize_context(
+    data: Any,
+    agent_name: str,
+    budget: int | None = None,
+    model: str = "gpt-4.1"
+) -> str:
+    """
+    Serialize retrieved context for `agent_name`: project the fields the agent
+    uses (single records only), drop empties, emit compact JSON within the
+    agent's token budget. Strings are passed through unchanged.
+    """
+    if isinstance(data, str):
+        return data
+    if isinstance(data, dict) and ("source" in data or "link_id" in data):
+        data = project_record(data, agent_name)
+    else:
+        data = prune(data)
+    return fit_to_budget(data, budget or CONTEXT_BUDGETS.get(agent_name, DEFAULT_BUDGET), model)
@@ -0,0 +1,144 @@
+"""
+Near-duplicate detection of crawled records with SimHash + LSH buckets.
+
+Mirrors, reposts and template-identical profile pages would otherwise each
+cost a full info-retriever analysis. Every analysed record gets a 64-bit
+SimHash of its text (word 3-shingles, blake2b) and is stored with the
+verdict the model gave, in a per-user fingerprints.json next to
+link_index.json:
+
+    { "<link_id>": { "simhash": "<16 hex digits>", "url": "...", "verdict": {...} } }
+
+Lookups only compare against records sharing one of SIMHASH_BANDS 16-bit
+bands (LSH buckets); with at most SIMHASH_MAX_DISTANCE (3) differing bits,
+two fingerprints always share a band. Texts shorter than MIN_SHINGLES
+shingles are not fingerprinted.
+
+InfoRetrieverAgent fingerprints crawl_external_content records (title,
+description and full content, before extraction); a match is answered with
+reuse_verdict() instead of a model call. Site-links records are left out:
+their verdicts depend on which child links are confirmed at the time.
+"""
+import os
+import re
+import json
+import hashlib
+from typing import List, Dict, Any, Tuple
+
+from utils.url_canon import canonicalize_url
+from executor.link_index import write_json_atomic
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+SIMHASH_MAX_DISTANCE = int(os.getenv("SIMHASH_MAX_DISTANCE", "3"))
+MIN_SHINGLES = 20
+_BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+_WORD_RE = re.compile(r"\w+")
+
+
+def simhash(text: str) -> int | None:
+    """64-bit SimHash over word 3-shingles of `text`; None if the text is too short."""
+    words = _WORD_RE.findall(text.lower())
+    shingles: Dict[str, int] = {}
+    for i in range(len(words) - 2):
+        key = " ".join(words[i:i + 3])
+        shingles[key] = shingles.get(key, 0) + 1
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    weights = [0] * SIMHASH_BITS
+    for shingle, count in shingles.items():
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += count if h >> bit & 1 else -count
+    return sum(1 << bit for bit, w in enumerate(weights) if w > 0)
+
+
+def _bands(fp: int) -> List[Tuple[int, int]]:
+    mask = (1 << _BAND_BITS) - 1
+    return [(band, fp >> (band * _BAND_BITS) & mask) for band in range(SIMHASH_BANDS)]
+
+
+class FingerprintIndex:
+    """Persistent link_id → (simhash, url, verdict) map with LSH buckets for near-duplicate lookups."""
+
+    def __init__(self, path: str, max_distance: int | None = None):
+        self.path = path
+        self.max_distance = SIMHASH_MAX_DISTANCE if max_distance is None else max_distance
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._buckets: Dict[Tuple[int, int], set] = {}
+        self._dirty = False
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+        for link_id, entry in self.entries.items():
+            self._index(link_id, int(entry["simhash"], 16))
+
+    def _index(self, link_id: str, fp: int) -> None:
+        for band in _bands(fp):
+            self._buckets.setdefault(band, set()).add(link_id)
+
+    def find(self, fp: int) -> Tuple[str, Dict[str, Any], int] | None:
+        """(link_id, entry, distance) of the closest stored record within max_distance bits of `fp`, or None."""
+        candidates = set()
+        for band in _bands(fp):
+            candidates |= self._buckets.get(band, set())
+        best: Tuple[int, str] | None = None
+        for link_id in candidates:
+            distance = bin(fp ^ int(self.entries[link_id]["simhash"], 16)).count("1")
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, link_id)
+        return (best[1], self.entries[best[1]], best[0]) if best else None
+
+    def add(self, link_id: str, fp: int, url: str, verdict: Dict[str, Any]) -> None:
+        old = self.entries.get(link_id)
+        if old:
+            for band in _bands(int(old["simhash"], 16)):
+                self._buckets.get(band, set()).discard(link_id)
+        self.entries[link_id] = {"simhash": f"{fp:016x}", "url": url, "verdict": verdict}
+        self._index(link_id, fp)
+        self._dirty = True
+
+    def save(self) -> None:
+        if self._dirty:
+            write_json_atomic(self.path, self.entries, indent=None)
+            self._dirty = False
+
+
+def reuse_verdict(
+    verdict: Dict[str, Any],
+    old_url: str,
+    new_url: str,
+    confirmed: bool,
+    distance: int
+) -> Dict[str, Any]:
+    """
+    An earlier record's verdict applied to its near-duplicate: only the items
+    about `old_url` carry over (items for other links were already stored
+    with the earlier verdict), re-pointed at `new_url` and placed by the
+    prompt's rules for the new link – a confirmed link goes to
+    to_knowledge_base with add_to_db, an unconfirmed one is never put there.
+    """
+    old_key = canonicalize_url(old_url)
+    to_kb: List[Dict[str, Any]] = []
+    to_clarifier: List[Dict[str, Any]] = []
+    for items in (verdict.get("to_knowledge_base"), verdict.get("to_clarifier")):
+        for item in items or []:
+            if not isinstance(item, dict):
+                continue
+            if not isinstance(item.get("link"), str) or canonicalize_url(item["link"]) != old_key:
+                continue
+            item = {**item, "link": new_url, "is_confirmed": confirmed}
+            if confirmed:
+                item["confidence"] = max(int(item.get("confidence") or 0), 4)
+                item["add_to_db"] = True
+                to_kb.append(item)
+            else:
+                item["add_to_db"] = False
+                to_clarifier.append(item)
+    note = f"Near-duplicate of {old_url} (SimHash distance {distance}); its verdict is reused."
+    return {
+        **verdict,
+        "thinking_process": f"{note} {verdict.get('thinking_process') or ''}".strip(),
+        "to_knowledge_base": to_kb,
+        "to_clarifier": to_clarifier,
+    }
@@ -0,0 +1,180 @@
+"""
+Local extraction of the relevant part of large crawl_external_content bodies.
+
+Crawled pages arrive as full page text (sometimes raw HTML) and used to be
+sent to the info retriever verbatim. Extractor cuts a large body down before
+the model sees it:
+
+  1. strip   – drop script/style/nav/header/footer/aside/form blocks and
+               tags from HTML, and cookie/menu/copyright lines from text
+  2. chunk   – split on paragraph boundaries (sentences for run-on text,
+               e.g. transcripts) into chunks of about CHUNK_CHARS
+  3. rank    – score chunks by overlap with the profile terms (full name
+               weighted ×3, headline / position / organization words ×1)
+  4. select  – keep the best chunks within EXTRACT_BUDGET tokens, in page
+               order, joined with " … "
+
+Steps 1–2 depend only on the content and are cached per content hash
+(LLMCache storage under data/cache/extract); ranking is per profile.
+Bodies shorter than EXTRACT_MIN_CHARS are left as they are.
+"""
+import os
+import re
+import html
+import hashlib
+from collections import Counter
+from typing import List, Dict, Any, Tuple
+
+from agents.llm_cache import LLMCache
+from agents.context import count_tokens
+
+dirname = os.path.dirname(__file__)
+default_extract_cache_dir = os.path.join(dirname, "..", "data/cache/extract")
+
+EXTRACT_BUDGET = int(os.getenv("EXTRACT_BUDGET", "1500"))
+EXTRACT_MIN_CHARS = int(os.getenv("EXTRACT_MIN_CHARS", "6000"))
+CHUNK_CHARS = 1200
+
+_BOILERPLATE_BLOCK_RE = re.compile(
+    r"<(script|style|noscript|nav|header|footer|aside|form|svg|iframe)\b.*?</\1\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+_BLOCK_TAG_RE = re.compile(r"<(?:/?(?:p|div|section|article|li|ul|ol|tr|table|h[1-6]|blockquote|main)|br\s*/?)\b[^>]*>",
+                           re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_HTML_RE = re.compile(r"<(html|body|div|p|span|a|script)\b", re.IGNORECASE)
+# whole-line navigation items, and lines that start like a legal / cookie notice
+_NAV_LINE_RE = re.compile(
+    r"^(skip to (main )?content|menu|search|home|share|sign ?in|log ?in|sign ?up|subscribe|"
+    r"accept( all)?( cookies)?|next|previous|back to top)\W*$",
+    re.IGNORECASE,
+)
+_LEGAL_LINE_RE = re.compile(
+    r"^(©|\(c\)|copyright\b|all rights reserved|privacy policy|terms of (service|use)|"
+    r"we use cookies|this (web)?site uses cookies)",
+    re.IGNORECASE,
+)
+_LINK_ONLY_RE = re.compile(r"^(\[[^\]]*\]\([^)]*\)[\s|·•-]*)+$")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset("a an and at by for from in of on or the to with".split())
+
+
+def strip_boilerplate(text: str) -> str:
+    """Main text of a page: HTML reduced to paragraphs, boilerplate lines removed."""
+    if _HTML_RE.search(text):
+        text = _COMMENT_RE.sub(" ", text)
+        text = _BOILERPLATE_BLOCK_RE.sub(" ", text)
+        text = _BLOCK_TAG_RE.sub("\n\n", text)
+        text = html.unescape(_TAG_RE.sub(" ", text))
+    lines = []
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        # short navigation / legal lines; real sentences are kept
+        if _NAV_LINE_RE.match(line) or (len(line) < 120 and (_LEGAL_LINE_RE.match(line) or _LINK_ONLY_RE.match(line))):
+            continue
+        lines.append(line)
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def chunk_text(text: str, max_chars: int = CHUNK_CHARS) -> List[str]:
+    """Paragraph-aligned chunks of at most ~max_chars; long paragraphs split on sentences, then words."""
+    pieces: List[str] = []
+    for para in re.split(r"\n\s*\n", text):
+        para = " ".join(para.split())
+        if not para:
+            continue
+        if len(para) <= max_chars:
+            pieces.append(para)
+            continue
+        sentences = _SENTENCE_RE.split(para)
+        if len(sentences) == 1:
+            # no punctuation (e.g. transcripts): fixed-size word windows
+            words = para.split()
+            step = max(1, max_chars // 8)
+            sentences = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        pieces += sentences
+
+    chunks: List[str] = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + 1 + len(piece) <= max_chars:
+            chunks[-1] += " " + piece
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def profile_terms(user_profile: Dict[str, Any]) -> Dict[str, float]:
+    """Lower-cased word → weight: full-name words 3, headline / position / organization words 1."""
+    profile = user_profile or {}
+    position = profile.get("current_position") if isinstance(profile.get("current_position"), dict) else {}
+    terms: Dict[str, float] = {}
+    for value in (profile.get("headline"), position.get("title"), position.get("organization")):
+        for word in _WORD_RE.findall(str(value or "").lower()):
+            if len(word) > 2 and word not in _STOPWORDS:
+                terms[word] = 1.0
+    for word in _WORD_RE.findall(str(profile.get("full_name") or "").lower()):
+        if len(word) > 1:
+            terms[word] = 3.0
+    return terms
+
+
+def rank_chunks(chunks: List[str], terms: Dict[str, float]) -> List[Tuple[float, int]]:
+    """(score, chunk index), best first; a chunk scores the weighted, length-damped count of profile terms."""
+    ranked = []
+    for i, chunk in enumerate(chunks):
+        counts = Counter(_WORD_RE.findall(chunk.lower()))
+        hits = sum(weight * (1 + min(counts[t], 5) / 5) for t, weight in terms.items() if counts[t])
+        ranked.append((round(hits, 3), i))
+    # ties keep page order, so the top of the page wins
+    ranked.sort(key=lambda r: (-r[0], r[1]))
+    return ranked
+
+
+class Extractor:
+    def __init__(
+        self,
+        budget: int | None = None,
+        min_chars: int | None = None,
+        cache: LLMCache | None = None,
+        model: str = "gpt-4.1"
+    ):
+        self.budget = EXTRACT_BUDGET if budget is None else budget
+        self.min_chars = EXTRACT_MIN_CHARS if min_chars is None else min_chars
+        self.cache = cache
+        self.model = model
+
+    def chunks(self, content: str) -> List[str]:
+        """Stripped, chunked content; cached per content hash."""
+        if self.cache is None:
+            self.cache = LLMCache(cache_dir=default_extract_cache_dir)
+        key = hashlib.sha256(content.encode("utf-8", errors="replace")).hexdigest()
+        cached = self.cache.get(key, "extraction")
+        if cached is not None:
+            return cached
+        chunks = chunk_text(strip_boilerplate(content))
+        self.cache.put(key, chunks, "extraction")
+        return chunks
+
+    def extract(self, content: str, user_profile: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
+        """
+        (the most relevant part of `content` within the token budget, stats
+        {"chunks", "kept"}); short content is returned unchanged.
+        """
+        if len(content) < self.min_chars:
+            return content, {"chunks": 1, "kept": 1}
+        chunks = self.chunks(content)
+        kept: List[int] = []
+        used = 0
+        for score, i in rank_chunks(chunks, profile_terms(user_profile)):
+            tokens = count_tokens(chunks[i], self.model)
+            if used + tokens > self.budget:
+                if kept:
+                    continue
+                # the best chunk alone is over budget: keep its head
+                chunks[i] = chunks[i][: self.budget * 4]
+                tokens = self.budget
+            kept.append(i)
+            used += tokens
+        return " … ".join(chunks[i] for i in sorted(kept)), {"chunks": len(chunks), "kept": len(kept)}
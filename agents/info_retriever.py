@@ -1,77 +1,261 @@
 import os
 import json
-from typing import List, Dict, Any
-from openai import OpenAI
+import hashlib
+from typing import List, Dict, Any, AsyncIterator, Iterable, Iterator, Tuple
 
-from agents.base_agent import BaseAgent, client
+from agents.base_agent import BaseAgent, AsyncChatStream
+from utils.url_canon import canonicalize_url
+from executor.crawl_store import load_record, sidecar_path, body_path
+from executor.link_index import write_json_atomic
+from agents.relevance import RelevanceScorer
+from agents.extraction import Extractor
+from agents.dedup import FingerprintIndex, simhash, reuse_verdict
+from agents.context import project_workspace, fit_to_budget, serialize_context, count_tokens, RECORD_FIELDS
 dirname = os.path.dirname(__file__)
 
+# processed-records watermark, next to link_index.json
+WATERMARK_FILE = "processed_records.json"
+# SimHash fingerprints and verdicts of analysed records (agents.dedup)
+FINGERPRINT_FILE = "fingerprints.json"
+
+# token budget for the confirmed-links summary inlined in the user query
+WORKSPACE_BUDGET = 1500
+# token budget for the crawl-history summary built by refresh()
+HISTORY_BUDGET = 2000
+
+# batched mode: records packed into one request up to this many tokens of
+# retrieved data / this many records; reply tokens allowed per record
+INFO_BATCH_BUDGET = int(os.getenv("INFO_BATCH_BUDGET", "12000"))
+INFO_BATCH_MAX = int(os.getenv("INFO_BATCH_MAX", "8"))
+BATCH_REPLY_TOKENS = 1500
+BATCH_MAX_TOKENS = 12000
+
+BATCH_PROMPT = (
+    "The retrieved data is a JSON array of {n} independent records. Process every record on its "
+    "own with the rules above and return one JSON object "
+    '{{"results": [{{"link_id": "<link_id of the record>", "to_user": ..., "thinking_process": ..., '
+    '"to_knowledge_base": [...], "to_clarifier": [...]}}, ...]}} '
+    "with exactly one entry per record, in input order."
+)
+# keys of one record's output
+OUTPUT_KEYS = ("to_user", "thinking_process", "to_knowledge_base", "to_clarifier")
+
 
 
 class InfoRetrieverAgent(BaseAgent):
     def __init__(
         self,
         user_root: str,
-        openai_client: OpenAI = client
+        openai_client: Any = None,
+        async_openai_client: Any = None,
+        prescore: bool | None = None,
+        dedup: bool | None = None
     ):
-        super().__init__(agent_name="info_retriever", openai_client=openai_client)
+        super().__init__(
+            agent_name="info_retriever",
+            openai_client=openai_client,
+            async_openai_client=async_openai_client
+        )
+        # local relevance scoring of site-links child links (agents.relevance)
+        self.prescore = os.getenv("RELEVANCE_PRESCORE", "1") != "0" if prescore is None else prescore
+        self.relevance_stats: Dict[str, int] = {"dropped": 0, "local": 0, "llm": 0}
+        # large crawl_external_content bodies are cut to their relevant chunks
+        self.extractor = Extractor(model=self.model)
 
         self.user_root = user_root
-        self.records: List[Dict[str, Any]] = []
+
+        # near-duplicates of analysed external content reuse the earlier verdict
+        self.dedup = os.getenv("NEAR_DUP_REUSE", "1") != "0" if dedup is None else dedup
+        self.fingerprints = FingerprintIndex(os.path.join(self.user_root, FINGERPRINT_FILE))
+        self.dedup_stats: Dict[str, int] = {"reused": 0, "analysed": 0}
+        # link_id → (simhash, url) of records handed to the model, until their verdict is known
+        self._fingerprinted: Dict[str, Tuple[int, str]] = {}
 
         self.history = ""
 
+        # link_id → {"hash", "stat"} of every record already processed
+        self.watermark_path = os.path.join(self.user_root, WATERMARK_FILE)
+        self.watermark: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.watermark_path):
+            with open(self.watermark_path, encoding="utf-8") as f:
+                self.watermark = json.load(f)
+        # (link_id, url, stat) of files changed since processed, found by refresh()
+        self._pending: List[Tuple[str, str, List[int]]] = []
+        self._indexed_urls: set = set()
+        # link_id → (hash, stat) of the records handed out
+        self._versions: Dict[str, tuple] = {}
+        self.refresh()
+
+    @staticmethod
+    def _stat(paths: List[str]) -> List[int]:
+        """(mtime_ns, size) of each existing file, flattened; cheap change detection."""
+        out: List[int] = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            out += [st.st_mtime_ns, st.st_size]
+        return out
+
+    @staticmethod
+    def _hash(paths: List[str]) -> str:
+        digest = hashlib.sha256()
+        for path in paths:
+            try:
+                with open(path, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 16), b""):
+                        digest.update(block)
+            except FileNotFoundError:
+                continue
+        return digest.hexdigest()[:16]
+
+    def _paths(self, link_id: str) -> List[str]:
+        return [sidecar_path(self.user_root, link_id), body_path(self.user_root, link_id)]
+
+    def refresh(self) -> int:
+        """
+        Rescan link_index.json for records that are new or changed since they
+        were last processed (see mark_processed). Only file sizes/mtimes are
+        compared here; get_retrieved_data() then loads the candidates one at
+        a time. The history summary is built here too, in index order, from
+        the metadata of every candidate site-links record (see
+        _build_history), so every record and batch of the round sees the
+        same history. Returns the number of candidates.
+        """
+        self._versions = {}
+        self.history = ""
+
         # 1) load the index: link_id → url
         index_path = os.path.join(self.user_root, "link_index.json")
-        with open(index_path, encoding="utf-8") as f:
-            index: Dict[str, str] = json.load(f)
+        index: Dict[str, str] = {}
+        if os.path.exists(index_path):
+            with open(index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        self._indexed_urls = {canonicalize_url(url) for url in index.values()}
 
-        # 2) for each link_id, load its JSON and pull out `body`
+        # 2) keep the link_ids whose files changed since they were processed
+        self._pending = []
         for link_id, url in index.items():
-            file_path = os.path.join(self.user_root, f"{link_id}.json")
-            if not os.path.exists(file_path):
-                continue
+            stat = self._stat(self._paths(link_id))
+            seen = self.watermark.get(link_id)
+            if stat and not (seen and seen.get("stat") == stat):
+                self._pending.append((link_id, url, stat))
+        self.history = self._build_history()
+        return len(self._pending)
 
-            with open(file_path, encoding="utf-8") as f:
-                data = json.load(f)
-            if not isinstance(data, dict):
-                continue
+    def _build_history(self) -> str:
+        """
+        "Loaded with metadata from …" per candidate site-links record, fitted
+        to HISTORY_BUDGET tokens by shrinking the largest metadata values and
+        then, if needed, dropping the last records.
+        Only the `metadata` field is read (streamed for large bodies).
+        """
+        metas: List[Any] = []
+        for link_id, _, _ in self._pending:
+            data = load_record(self.user_root, link_id, fields=["links", "metadata"])
+            body = data.get("body") if isinstance(data, dict) else None
+            if isinstance(body, dict) and (body.get("links") or body.get("metadata")):
+                metas.append(body.get("metadata"))
+        if not metas:
+            return ""
+        lines = [f"Loaded with metadata from {meta} .\n" for meta in metas]
+        if count_tokens("".join(lines), self.model) <= HISTORY_BUDGET:
+            return "".join(lines)
+        metas = json.loads(fit_to_budget(metas, HISTORY_BUDGET, self.model))
+        # still over budget (many small values): keep whole lines in index order
+        kept, used = [], 0
+        for meta in metas:
+            line = f"Loaded with metadata from {meta} .\n"
+            tokens = count_tokens(line, self.model)
+            if used + tokens > HISTORY_BUDGET:
+                if not kept:
+                    # a single record over budget: keep its head
+                    kept.append(line[: HISTORY_BUDGET * 3] + " …\n")
+                    if len(metas) > 1:
+                        kept.append(f"… and {len(metas) - 1} more site-links records.\n")
+                else:
+                    kept.append(f"… and {len(metas) - len(kept)} more site-links records.\n")
+                break
+            kept.append(line)
+            used += tokens
+        return "".join(kept)
 
-            body = data.get("body", {})
-            if not isinstance(body, dict):
-                continue
+    def _load(self, link_id: str, url: str) -> Dict[str, Any] | None:
+        """One record built from its stored crawl result, or None if there is nothing to process."""
+        # plain or gzip-compressed body, see executor.crawl_store; large
+        # JSON bodies are streamed, keeping only the fields the prompt reads
+        data = load_record(self.user_root, link_id, fields=RECORD_FIELDS[self.agent_name])
+        if not isinstance(data, dict):
+            return None
 
-            # Decide source
-            if body.get("links") or body.get("metadata"):
-                source = "crawl_get_site_links"
-                self.history += f"Loaded with metadata from {body.get("metadata")} .\n"
+        body = data.get("body", {})
+        if isinstance(body, str) and data.get("truncated"):
+            # body cut at max_body_bytes no longer parses as JSON; keep the text
+            body = {"content": body, "truncated": True}
+        if not isinstance(body, dict):
+            return None
 
-                # — if every discovered link is already in our index, skip this record —
-                links = body.get("links", [])
-                if links and all(link in index.values() for link in links):
-                    continue
+        # Decide source
+        if body.get("links") or body.get("metadata"):
+            source = "crawl_get_site_links"
 
-            else:
-                source = "crawl_external_content"
+            # — if every discovered link is already in our index, skip this record —
+            links = body.get("links", [])
+            if links and all(canonicalize_url(link) in self._indexed_urls for link in links):
+                return None
+        else:
+            source = "crawl_external_content"
 
-            # Build the record
-            record: Dict[str, Any] = {
-                "link_id":  link_id,
-                "url":      url,
-                "source":   source,
-            }
-            # Merge in all the body fields (links+metadata or content+…)
-            record.update(body)
-            self.records.append(record)
+        # Build the record
+        record: Dict[str, Any] = {
+            "link_id":  link_id,
+            "url":      url,
+            "source":   source,
+        }
+        # Merge in all the body fields (links+metadata or content+…)
+        record.update(body)
+        return record
 
+    def mark_processed(self, records: Iterable[Dict[str, Any]]) -> None:
+        """
+        Advance the watermark past `records` so later refreshes skip them
+        until they change; verdicts fingerprinted since the last call are
+        saved too.
+        """
+        self.fingerprints.save()
+        changed = False
+        for rec in records:
+            version = self._versions.get(rec.get("link_id"))
+            if version:
+                self.watermark[rec["link_id"]] = {"hash": version[0], "stat": version[1]}
+                changed = True
+        if changed:
+            write_json_atomic(self.watermark_path, self.watermark, indent=None)
 
-    def get_retrieved_data(self) -> List[Dict[str, Any]]:
+    def get_retrieved_data(self) -> Iterator[Dict[str, Any]]:
         """
-        Returns the list of loaded records, each with:
+        Lazily yields the records found by the last refresh() (new or changed
+        since last processed), reading and decoding one file at a time, each
+        with:
           • link_id, url, source, platform
           • plus everything inside `body`
+        Files that were only touched (same content hash) and site-link
+        records with nothing new are skipped and marked processed.
         """
-        return self.records
+        skipped = []
+        try:
+            for link_id, url, stat in self._pending:
+                digest = self._hash(self._paths(link_id))
+                self._versions[link_id] = (digest, stat)
+                seen = self.watermark.get(link_id)
+                record = None if seen and seen.get("hash") == digest else self._load(link_id, url)
+                if record is None:
+                    skipped.append({"link_id": link_id})
+                    continue
+                yield record
+        finally:
+            self.mark_processed(skipped)
 
     def run(
         self,
@@ -84,25 +268,354 @@ class InfoRetrieverAgent(BaseAgent):
         """
         Parameters
         ----------
-        retrieved_context      – dict with the loaded data from self.records
+        retrieved_context      – one record from get_retrieved_data()
         user_profile      – dict used to fill {{user_profile}} in the system prompt
         """
+        record, local = self._prescore(retrieved_context, user_profile, workspace_data)
+        if record is None:
+            return self._remember(retrieved_context.get("link_id"), local)
+        # Send to OpenAI – we expect a pure-JSON array back
+        reply = self._chat(**self._chat_kwargs(workspace_data, record, user_profile, history_summary))
+        return self._remember(record.get("link_id"), self._combine(local, reply))
+
+    async def arun(
+        self,
+        *,
+        workspace_data = None,
+        retrieved_context: Dict[str, Any],
+        user_profile: Dict[str, Any],
+        history_summary: str | None = None,
+        timeout: float | None = None
+    ) -> List[Dict[str, Any]]:
+        """Async `run`; `timeout` is a per-call deadline in seconds."""
+        record, local = self._prescore(retrieved_context, user_profile, workspace_data)
+        if record is None:
+            return self._remember(retrieved_context.get("link_id"), local)
+        reply = await self._achat(
+            **self._chat_kwargs(workspace_data, record, user_profile, history_summary),
+            timeout=timeout,
+        )
+        return self._remember(record.get("link_id"), self._combine(local, reply))
+
+    def arun_stream(
+        self,
+        *,
+        workspace_data = None,
+        retrieved_context: Dict[str, Any],
+        user_profile: Dict[str, Any],
+        history_summary: str | None = None,
+        timeout: float | None = None
+    ) -> AsyncChatStream:
+        """
+        Streaming `arun`: yields ("to_knowledge_base" | "to_clarifier", item)
+        as each decision is generated; the full reply is `stream.result`.
+        Locally decided links are yielded first.
+        """
+        record, local = self._prescore(retrieved_context, user_profile, workspace_data)
+        inner = None if record is None else self._achat_stream(
+            **self._chat_kwargs(workspace_data, record, user_profile, history_summary),
+            timeout=timeout,
+        )
+        link_id = retrieved_context.get("link_id")
+        if local is None and link_id not in self._fingerprinted:
+            return inner
+        stream = AsyncChatStream()
+
+        async def _events() -> AsyncIterator:
+            for key in ("to_knowledge_base", "to_clarifier"):
+                for item in (local or {}).get(key) or []:
+                    yield key, item
+            if inner is not None:
+                async for key, element in inner:
+                    yield key, element
+            stream.result = self._remember(
+                link_id, self._combine(local, inner.result if inner is not None else None)
+            )
+
+        stream._events = _events()
+        return stream
+
+    # ------------------------------------------------------------------ #
+    # local relevance pre-scoring
+    # ------------------------------------------------------------------ #
+    def _prescore(
+        self,
+        record: Dict[str, Any],
+        user_profile: Dict[str, Any],
+        workspace_data = None
+    ) -> Tuple[Dict[str, Any] | None, Dict[str, Any] | None]:
+        """
+        (record to send to the model – None if nothing is left for it,
+        output decided locally – None if pre-scoring does not apply).
+        Site-links records are pre-scored; child links the user already
+        confirmed are left out as the prompt asks. External content that is a
+        near-duplicate of an analysed record reuses its verdict
+        (agents.dedup); large bodies are reduced to their most relevant
+        chunks (agents.extraction).
+        """
+        if record.get("source") == "crawl_external_content":
+            reused = self._near_duplicate(record, workspace_data) if self.dedup else None
+            if reused is not None:
+                return None, reused
+            return self._extract(record, user_profile), None
+        if not self.prescore or record.get("source") != "crawl_get_site_links":
+            return record, None
+        confirmed = {
+            canonicalize_url(item.get("link") or url)
+            for url, item in (workspace_data or {}).items()
+            if isinstance(item, dict) and item.get("is_confirmed") is True
+        }
+        skip = {
+            link for link in list(record.get("links") or []) + list(record.get("metadata") or {})
+            if isinstance(link, str) and canonicalize_url(link) in confirmed
+        }
+        pruned, decided, dropped = RelevanceScorer(user_profile).split(record, skip)
+        self.relevance_stats["dropped"] += dropped
+        self.relevance_stats["local"] += len(decided)
+        self.relevance_stats["llm"] += len(pruned["links"]) if pruned else 0
+        local = {
+            "thinking_process": f"Local pre-scoring: {len(decided)} child links decided, "
+                                f"{dropped} dropped as unrelated to the user.",
+            "to_knowledge_base": [],
+            "to_clarifier": decided,
+        }
+        return pruned, local
+
+    def _near_duplicate(self, record: Dict[str, Any], workspace_data = None) -> Dict[str, Any] | None:
+        """
+        The verdict of an analysed near-duplicate of `record`, re-pointed at
+        its link, or None; a record with no match is fingerprinted so its own
+        verdict is stored once known (see _remember).
+        """
+        text = " ".join(str(record.get(k) or "") for k in ("title", "description", "content"))
+        fp = simhash(text)
+        if fp is None:
+            return None
+        url = record.get("url") or ""
+        match = self.fingerprints.find(fp)
+        if match is None or not isinstance(match[1].get("verdict"), dict):
+            self._fingerprinted[record.get("link_id")] = (fp, url)
+            self.dedup_stats["analysed"] += 1
+            return None
+        _, entry, distance = match
+        key = canonicalize_url(url)
+        confirmed = any(
+            isinstance(item, dict) and item.get("is_confirmed") is True
+            and canonicalize_url(item.get("link") or link) == key
+            for link, item in (workspace_data or {}).items()
+        )
+        self.dedup_stats["reused"] += 1
+        reused = reuse_verdict(entry["verdict"], entry["url"], url, confirmed, distance)
+        # the mirror is indexed too, under the same fingerprint
+        self._fingerprinted[record.get("link_id")] = (fp, url)
+        return reused
+
+    def _remember(self, link_id: str | None, output: Any) -> Any:
+        """Store the verdict of a fingerprinted record; returns `output` unchanged."""
+        fingerprinted = self._fingerprinted.pop(link_id, None)
+        if fingerprinted is not None and isinstance(output, dict):
+            fp, url = fingerprinted
+            self.fingerprints.add(link_id, fp, url, output)
+        return output
+
+    def _extract(self, record: Dict[str, Any], user_profile: Dict[str, Any]) -> Dict[str, Any]:
+        content = record.get("content")
+        if not isinstance(content, str) or len(content) < self.extractor.min_chars:
+            return record
+        excerpt, stats = self.extractor.extract(content, user_profile)
+        return {
+            **record,
+            "content": excerpt,
+            "extracted": f"{stats['kept']} of {stats['chunks']} chunks most relevant to the user",
+        }
+
+    @staticmethod
+    def _combine(local: Dict[str, Any] | None, reply: Any) -> Any:
+        """The model's reply with the locally decided links added."""
+        if local is None:
+            return reply
+        if not isinstance(reply, dict):
+            return local
+        merged = dict(reply)
+        merged["to_clarifier"] = list(reply.get("to_clarifier") or []) + local["to_clarifier"]
+        return merged
+
+    # ------------------------------------------------------------------ #
+    # batched mode: several records per request
+    # ------------------------------------------------------------------ #
+    def iter_batches(self, records: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Group `records` (in order, consumed lazily) into batches whose
+        serialized records fit INFO_BATCH_BUDGET tokens, at most
+        INFO_BATCH_MAX records each; a batch is yielded as soon as it is full.
+        A record too big for the budget on its own gets a batch to itself.
+        """
+        batch: List[Dict[str, Any]] = []
+        used = 0
+        for rec in records:
+            tokens = self._estimate_tokens(rec)
+            if batch and (len(batch) >= INFO_BATCH_MAX or used + tokens > INFO_BATCH_BUDGET):
+                yield batch
+                batch, used = [], 0
+            batch.append(rec)
+            used += tokens
+        if batch:
+            yield batch
+
+    def _estimate_tokens(self, rec: Dict[str, Any]) -> int:
+        """Tokens `rec` will take in a batch (a large body counts as its extraction budget)."""
+        content = rec.get("content")
+        if rec.get("source") == "crawl_external_content" and isinstance(content, str) \
+                and len(content) >= self.extractor.min_chars:
+            rest = {k: v for k, v in rec.items() if k != "content"}
+            return count_tokens(serialize_context(rest, self.agent_name, model=self.model), self.model) \
+                + self.extractor.budget
+        return count_tokens(serialize_context(rec, self.agent_name, model=self.model), self.model)
+
+    def batches(self, records: Iterable[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        return list(self.iter_batches(records))
+
+    def _batch_kwargs(
+        self,
+        workspace_data,
+        records: List[Dict[str, Any]],
+        user_profile: Dict[str, Any],
+        history_summary: str | None
+    ) -> Dict[str, Any]:
+        kwargs = self._chat_kwargs(workspace_data, {}, user_profile, history_summary)
+        # each record projected and fitted on its own; passed through as text
+        kwargs["retrieved_data"] = "[" + ",".join(
+            serialize_context(rec, self.agent_name, model=self.model) for rec in records
+        ) + "]"
+        kwargs["user_query"] += ". " + BATCH_PROMPT.format(n=len(records))
+        kwargs["max_tokens"] = min(BATCH_REPLY_TOKENS * len(records), BATCH_MAX_TOKENS)
+        return kwargs
+
+    @staticmethod
+    def demux(records: List[Dict[str, Any]], reply: Any) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-record outputs of a batched reply, keyed by link_id. Records the
+        reply leaves out (or entries with an unknown link_id) are absent.
+        """
+        entries = reply.get("results", []) if isinstance(reply, dict) else reply or []
+        if isinstance(entries, dict):          # {"<link_id>": {...}} is accepted too
+            entries = [{"link_id": k, **v} for k, v in entries.items() if isinstance(v, dict)]
+        wanted = {rec.get("link_id") for rec in records}
+        out: Dict[str, Dict[str, Any]] = {}
+        for entry in entries:
+            if not isinstance(entry, dict) or entry.get("link_id") not in wanted:
+                continue
+            output = {k: entry.get(k) for k in OUTPUT_KEYS if k in entry}
+            output.setdefault("to_knowledge_base", [])
+            output.setdefault("to_clarifier", [])
+            out[entry["link_id"]] = output
+        return out
+
+    def _prescore_batch(
+        self,
+        records: List[Dict[str, Any]],
+        user_profile: Dict[str, Any],
+        workspace_data = None
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """(records left for the model, link_id → locally decided output)."""
+        pending: List[Dict[str, Any]] = []
+        local: Dict[str, Dict[str, Any]] = {}
+        for rec in records:
+            record, decided = self._prescore(rec, user_profile, workspace_data)
+            if decided is not None:
+                local[rec.get("link_id")] = decided
+            if record is not None:
+                pending.append(record)
+        return pending, local
+
+    def _demux_combined(
+        self,
+        pending: List[Dict[str, Any]],
+        reply: Any,
+        local: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """demux() of the model's reply plus the locally decided outputs."""
+        out = self.demux(pending, reply) if pending else {}
+        pending_ids = {rec.get("link_id") for rec in pending}
+        for link_id, decided in local.items():
+            if link_id in out:
+                out[link_id] = self._combine(decided, out[link_id])
+            elif link_id not in pending_ids:
+                out[link_id] = decided
+        for link_id, output in out.items():
+            self._remember(link_id, output)
+        return out
+
+    def run_batch(
+        self,
+        *,
+        records: List[Dict[str, Any]],
+        workspace_data = None,
+        user_profile: Dict[str, Any],
+        history_summary: str | None = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """One request for all `records` (see batches()); returns link_id → output."""
+        pending, local = self._prescore_batch(records, user_profile, workspace_data)
+        reply = self._chat(**self._batch_kwargs(workspace_data, pending, user_profile, history_summary)) if pending else None
+        return self._demux_combined(pending, reply, local)
+
+    def arun_batch_stream(
+        self,
+        *,
+        records: List[Dict[str, Any]],
+        workspace_data = None,
+        user_profile: Dict[str, Any],
+        history_summary: str | None = None,
+        timeout: float | None = None
+    ) -> AsyncChatStream:
+        """
+        Streaming batched `arun`: yields ("results", output) as each record's
+        output (with its link_id) is generated; `stream.result` is then the
+        link_id → output mapping of demux().
+        """
+        pending, local = self._prescore_batch(records, user_profile, workspace_data)
+        inner = self._achat_stream(
+            **self._batch_kwargs(workspace_data, pending, user_profile, history_summary),
+            timeout=timeout,
+        ) if pending else None
+        pending_ids = {rec.get("link_id") for rec in pending}
+        stream = AsyncChatStream()
+
+        async def _events() -> AsyncIterator:
+            # records decided entirely without the model come first
+            for link_id, output in local.items():
+                if link_id not in pending_ids:
+                    yield "results", {"link_id": link_id, **output}
+            if inner is not None:
+                async for key, element in inner:
+                    if key == "results" and isinstance(element, dict) and element.get("link_id") in local:
+                        element = self._combine(local[element["link_id"]], element)
+                    yield key, element
+            stream.result = self._demux_combined(pending, inner.result if inner is not None else None, local)
+
+        stream._events = _events()
+        return stream
+
+    def _chat_kwargs(
+        self,
+        workspace_data,
+        retrieved_context: Dict[str, Any],
+        user_profile: Dict[str, Any],
+        history_summary: str | None
+    ) -> Dict[str, Any]:
         if workspace_data and isinstance(workspace_data, Dict):
-            workspace_data_str = json.dumps(workspace_data, ensure_ascii=False, indent=2)
+            workspace_data_str = fit_to_budget(project_workspace(workspace_data), WORKSPACE_BUDGET, self.model)
             user_query = f"Note that there are some confirmed data {workspace_data_str}. Process the retreived data"
         else:
             user_query = "Process the retrieved data"
 
-        # Send to OpenAI – we expect a pure-JSON array back
-        response = self._chat(
+        return dict(
             user_query=user_query,
             user_profile=user_profile,
             history_summary=self.history if history_summary is None else history_summary,
             retrieved_data=retrieved_context
         )
 
-        return response
-
 
 if __name__ == "__main__":
 
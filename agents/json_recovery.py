@@ -0,0 +1,186 @@
+"""
+Recovery of malformed agent replies.
+
+repair_json() fixes the defects models commonly produce without another
+request:
+
+  • fence            – reply wrapped in ```json … ``` (closing fence optional)
+  • prose            – text before the first "{" / "[" or after the closing one
+  • python_literals  – True / False / None outside strings
+  • trailing_comma   – "," right before "}" or "]"
+  • truncated        – cut off mid-reply (e.g. at max_tokens): the reply is cut
+                       back to the last complete array element / field and
+                       every open container closed
+
+RecoveryMetrics counts, per agent, which path each reply took (clean,
+repaired, continued, repair_request, failed), the local fixes applied and the
+rate-limit / timeout retries; BaseAgent.recovery_stats() reports them.
+"""
+import re
+import json
+import threading
+from typing import List, Dict, Any, Tuple
+
+_FENCE_OPEN_RE = re.compile(r"^```[a-zA-Z]*[ \t]*\n?")
+_FENCE_CLOSE_RE = re.compile(r"\n?```\s*$")
+_LITERALS = {"True": "true", "False": "false", "None": "null"}   # same lengths
+_CLOSERS = {"{": "}", "[": "]"}
+MAX_TRUNCATION_ATTEMPTS = 200
+
+
+def _strip_fence(s: str, fixes: List[str]) -> str:
+    if s.startswith("```"):
+        fixes.append("fence")
+        s = _FENCE_CLOSE_RE.sub("", _FENCE_OPEN_RE.sub("", s, count=1))
+    return s
+
+
+def _normalize(s: str, fixes: List[str]) -> str:
+    """Python literals → JSON, drop trailing commas and anything after the root value."""
+    out: List[str] = []
+    depth = 0
+    in_string = escape = False
+    i, n = 0, len(s)
+    while i < n:
+        c = s[i]
+        if in_string:
+            out.append(c)
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+            i += 1
+            continue
+        if c == '"':
+            in_string = True
+        elif c in "{[":
+            depth += 1
+        elif c in "}]":
+            depth -= 1
+            if depth == 0:
+                out.append(c)
+                if s[i + 1:].strip():
+                    fixes.append("prose")
+                break
+        elif c == ",":
+            j = i + 1
+            while j < n and s[j] in " \t\r\n":
+                j += 1
+            if j < n and s[j] in "}]":
+                fixes.append("trailing_comma")
+                i += 1
+                continue
+        elif c.isalpha():
+            j = i
+            while j < n and (s[j].isalnum() or s[j] == "_"):
+                j += 1
+            word = s[i:j]
+            if word in _LITERALS:
+                fixes.append("python_literals")
+                word = _LITERALS[word]
+            out.append(word)
+            i = j
+            continue
+        out.append(c)
+        i += 1
+    return "".join(out)
+
+
+def _close_truncated(s: str) -> Any:
+    """
+    Parse `s` as a reply cut off mid-way. Candidate cut points are element
+    boundaries outside array elements, so an unfinished array element (e.g. a
+    link whose URL was cut) is dropped whole rather than kept half-written;
+    the latest boundary that parses wins after closing the open containers.
+    Raises json.JSONDecodeError if nothing parses.
+    """
+    stack: List[str] = []
+    cuts: List[Tuple[int, str]] = []      # (cut index, closers needed there)
+
+    def _cut(i: int) -> None:
+        if "[" not in stack[:-1]:
+            cuts.append((i, "".join(_CLOSERS[o] for o in reversed(stack))))
+
+    in_string = escape = False
+    for i, c in enumerate(s):
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+            continue
+        if c == '"':
+            in_string = True
+        elif c in "{[":
+            if stack and stack[-1] == "[":
+                _cut(i)                    # before an array element
+            stack.append(c)
+            _cut(i + 1)                    # just inside the new container
+        elif c in "}]":
+            if stack:
+                stack.pop()
+        elif c == ",":
+            _cut(i)
+
+    candidates = []
+    tail = s.rstrip().rstrip(",")
+    if not in_string and tail.endswith(("}", "]")):
+        candidates.append(tail + "".join(_CLOSERS[o] for o in reversed(stack)))
+    candidates += [s[:i].rstrip().rstrip(",") + closers for i, closers in reversed(cuts[-MAX_TRUNCATION_ATTEMPTS:])]
+    error: json.JSONDecodeError | None = None
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError as e:
+            error = error or e
+    raise error or json.JSONDecodeError("unrecoverable truncated reply", s, 0)
+
+
+def repair_json(text: str) -> Tuple[Any, List[str]]:
+    """
+    Parse `text`, repairing the defects listed in the module docstring.
+    Returns (value, fixes applied); raises json.JSONDecodeError if unrecoverable.
+    """
+    fixes: List[str] = []
+    s = _strip_fence(text.strip(), fixes)
+    starts = [i for i in (s.find("{"), s.find("[")) if i != -1]
+    if not starts:
+        raise json.JSONDecodeError("no JSON object in reply", text, 0)
+    if min(starts) > 0:
+        fixes.append("prose")
+        s = s[min(starts):]
+    s = _normalize(s, fixes)
+    try:
+        return json.loads(s), list(dict.fromkeys(fixes))
+    except json.JSONDecodeError:
+        value = _close_truncated(s)
+        fixes.append("truncated")
+        return value, list(dict.fromkeys(fixes))
+
+
+class RecoveryMetrics:
+    """Thread-safe per-agent counters of recovery paths, fixes and retries."""
+
+    PATHS = ("clean", "repaired", "continued", "repair_request", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, agent_name: str, event: str, n: int = 1) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(agent_name, {p: 0 for p in self.PATHS})
+            counts[event] = counts.get(event, 0) + n
+
+    def snapshot(self, agent_name: str | None = None) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            names = [agent_name] if agent_name else list(self._counts)
+            return {name: dict(self._counts.get(name, {})) for name in names}
+
+
+# one registry per process, shared by every agent
+default_recovery_metrics = RecoveryMetrics()
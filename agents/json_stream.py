@@ -0,0 +1,130 @@
+"""
+Incremental parsing of a streamed JSON reply.
+
+Agents reply with one JSON object whose interesting parts are top-level
+arrays (links, to_clarifier, to_knowledge_base, results …). JSONArrayStream
+is fed the reply text chunk by chunk and hands back every element of such an
+array as soon as its closing brace/bracket (or delimiter, for scalars) has
+arrived, so callers can act on the first link while the rest is generated.
+
+    parser = JSONArrayStream()
+    for chunk in chunks:
+        for key, element in parser.feed(chunk):
+            ...                       # e.g. ("links", {"link": ..., ...})
+    reply = parser.close()            # the whole object, json.loads'ed
+"""
+import json
+from typing import List, Dict, Any, Iterator, Tuple
+
+_WS = " \t\r\n"
+
+
+class JSONArrayStream:
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._stack: List[str] = []        # open containers, "{" or "["
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False           # next string in the root object is a key
+        self._key_chars: List[str] | None = None
+        self._pending_key: str | None = None
+        self._array_key: str | None = None # key of the top-level array we are in
+        self._element: List[str] | None = None
+        self.emitted: Dict[str, int] = {}   # elements handed out per key
+        self.failed = False                 # malformed text seen; only collecting from now on
+
+    def _in_top_array(self) -> bool:
+        # an array directly under the root object, or the root itself being an array
+        return self._stack in (["{", "["], ["["])
+
+    def _emit(self, out: List[Tuple[str, Any]]) -> None:
+        text = "".join(self._element).strip()
+        self._element = None
+        if text:
+            key = self._array_key or ""
+            out.append((key, json.loads(text)))
+            self.emitted[key] = self.emitted.get(key, 0) + 1
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Consume `chunk`; return the (key, element) pairs completed by it. Once
+        an element fails to parse, nothing more is emitted (the text is still
+        collected for close() / repair).
+        """
+        self._chunks.append(chunk)
+        out: List[Tuple[str, Any]] = []
+        if self.failed:
+            return out
+        try:
+            self._scan(chunk, out)
+        except json.JSONDecodeError:
+            self.failed = True
+        return out
+
+    def _scan(self, chunk: str, out: List[Tuple[str, Any]]) -> None:
+        for c in chunk:
+            if self._in_string:
+                if self._element is not None:
+                    self._element.append(c)
+                elif self._key_chars is not None:
+                    self._key_chars.append(c)
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        self._pending_key = json.loads('"' + "".join(self._key_chars))
+                        self._key_chars = None
+                continue
+
+            top = self._in_top_array()
+            if top and self._element is None and c not in _WS and c not in ",]":
+                self._element = []
+            if self._element is not None:
+                if top and c in ",]":
+                    # a scalar element ends at its delimiter
+                    self._emit(out)
+                else:
+                    self._element.append(c)
+
+            if c == '"':
+                self._in_string = True
+                if self._stack == ["{"] and self._expect_key:
+                    self._key_chars = []
+            elif c in "{[":
+                if self._stack == ["{"]:
+                    self._array_key = self._pending_key
+                self._stack.append(c)
+                if self._stack == ["{"]:
+                    self._expect_key = True
+            elif c in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if self._element is not None and self._in_top_array():
+                    self._emit(out)
+            elif self._stack == ["{"]:
+                if c == ":":
+                    self._expect_key = False
+                elif c == ",":
+                    self._expect_key = True
+
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def close(self) -> Any:
+        """The complete reply parsed as JSON (json.JSONDecodeError if invalid)."""
+        return json.loads(self.text())
+
+
+def array_elements(reply: Any) -> Iterator[Tuple[str, Any]]:
+    """(key, element) for every element of the top-level arrays of an already parsed reply."""
+    if isinstance(reply, list):
+        for element in reply:
+            yield "", element
+    elif isinstance(reply, dict):
+        for key, value in reply.items():
+            if isinstance(value, list):
+                for element in value:
+                    yield key, element
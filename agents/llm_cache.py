@@ -0,0 +1,146 @@
+"""
+LLMCache: opt-in on-disk cache of parsed agent replies.
+
+The key is a SHA-256 over (agent_name, model, temperature, max_tokens, full
+message list), so a hit means the exact same request was sent before. Each
+entry is one small JSON file; total entries/bytes are bounded with LRU
+eviction, and hit/miss counters are kept per agent.
+
+Enable it per agent with `BaseAgent(..., use_cache=True)` or for every
+agent listed in LLM_CACHE_AGENTS (comma-separated names, or "*").
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any
+
+from executor.link_index import write_json_atomic
+
+dirname = os.path.dirname(__file__)
+default_cache_dir = os.path.join(dirname, "..", "data/cache/llm")
+
+
+def cache_enabled_for(agent_name: str) -> bool:
+    """True if LLM_CACHE_AGENTS lists `agent_name` (or is "*")."""
+    names = {n.strip() for n in os.getenv("LLM_CACHE_AGENTS", "").split(",") if n.strip()}
+    return "*" in names or agent_name in names
+
+
+class LLMCache:
+    def __init__(
+        self,
+        cache_dir: str = default_cache_dir,
+        max_entries: int = 5000,
+        max_bytes: int = 64 * 1024 * 1024
+    ):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._load_existing()
+
+    @staticmethod
+    def key(agent_name: str, model: str, temperature: float, max_tokens: int, messages: List[Dict[str, str]]) -> str:
+        payload = json.dumps(
+            [agent_name, model, temperature, max_tokens, messages],
+            ensure_ascii=False, sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, agent_name: str = "") -> Any | None:
+        with self._lock:
+            stats = self._stats.setdefault(agent_name, {"hits": 0, "misses": 0, "stores": 0})
+            if key not in self._lru:
+                stats["misses"] += 1
+                return None
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._drop(key)
+                stats["misses"] += 1
+                return None
+            self._lru.move_to_end(key)
+            # bump mtime so LRU order survives restarts
+            os.utime(self._path(key))
+            stats["hits"] += 1
+            return entry["response"]
+
+    def put(self, key: str, response: Any, agent_name: str = "") -> None:
+        entry = {"agent_name": agent_name, "stored_at": time.time(), "response": response}
+        with self._lock:
+            path = self._path(key)
+            # unique temp file: other processes may store the same key
+            write_json_atomic(path, entry, indent=None)
+            size = os.path.getsize(path)
+            self._bytes -= self._lru.pop(key, 0)
+            self._lru[key] = size
+            self._bytes += size
+            self._stats.setdefault(agent_name, {"hits": 0, "misses": 0, "stores": 0})["stores"] += 1
+            self._evict()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_agent = {}
+            for name, s in self._stats.items():
+                lookups = s["hits"] + s["misses"]
+                per_agent[name] = {**s, "hit_rate": round(s["hits"] / lookups, 3) if lookups else 0.0}
+            return {"entries": len(self._lru), "bytes": self._bytes, "agents": per_agent}
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._lru):
+                self._drop(key)
+
+    # ------------------------------------------------------------------ #
+    # helpers
+    # ------------------------------------------------------------------ #
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_existing(self) -> None:
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            found.append((stat.st_mtime, name[:-len(".json")], stat.st_size))
+        with self._lock:
+            for _, key, size in sorted(found):
+                self._lru[key] = size
+                self._bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._lru and (len(self._lru) > self.max_entries or self._bytes > self.max_bytes):
+            self._drop(next(iter(self._lru)))
+
+    def _drop(self, key: str) -> None:
+        self._bytes -= self._lru.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+_shared_cache: LLMCache | None = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache() -> LLMCache:
+    """Process-wide cache instance, created on first use."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMCache()
+        return _shared_cache
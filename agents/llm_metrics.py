@@ -0,0 +1,142 @@
+"""
+LLMMetrics: per-call instrumentation of agent LLM requests.
+
+BaseAgent records one entry per `_chat` / `_achat` / `_chat_stream` /
+`_achat_stream` call:
+
+  agent, model, mode (sync | async | stream | astream), turn, cache (hit |
+  miss | off), wall_ms, ttft_ms (streams), prompt/completion/total tokens
+  (follow-up recovery requests included), requests sent, retries, parse path
+  (clean | repaired | continued | repair_request | failed), cost_usd,
+  prompt_chars, prompt_hash (groups identical prompts), error
+
+Entries are aggregated per turn (see begin_turn) and per session, per agent:
+    default_llm_metrics.turn_summary()
+    default_llm_metrics.session_summary()
+    default_llm_metrics.top_calls(5)        # most expensive calls / prompts
+and appended to the JSONL file named by LLM_METRICS_FILE when it is set.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import List, Dict, Any
+
+# USD per 1M tokens: (input, output)
+MODEL_PRICES: Dict[str, tuple[float, float]] = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float | None:
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return round((prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000, 6)
+
+
+def prompt_hash(messages: List[Dict[str, str]]) -> str:
+    payload = json.dumps(messages, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def _aggregate(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _totals(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        wall = sorted(r["wall_ms"] for r in rows)
+        ttft = [r["ttft_ms"] for r in rows if r.get("ttft_ms") is not None]
+        return {
+            "calls": len(rows),
+            "cache_hits": sum(1 for r in rows if r["cache"] == "hit"),
+            "errors": sum(1 for r in rows if r.get("error")),
+            "requests": sum(r["requests"] for r in rows),
+            "retries": sum(r["retries"] for r in rows),
+            "wall_ms": round(sum(wall), 1),
+            "p50_wall_ms": wall[len(wall) // 2] if wall else None,
+            "max_wall_ms": wall[-1] if wall else None,
+            "avg_ttft_ms": round(sum(ttft) / len(ttft), 1) if ttft else None,
+            "prompt_tokens": sum(r["prompt_tokens"] for r in rows),
+            "completion_tokens": sum(r["completion_tokens"] for r in rows),
+            "cost_usd": round(sum(r["cost_usd"] or 0.0 for r in rows), 6),
+        }
+
+    by_agent: Dict[str, List[Dict[str, Any]]] = {}
+    for r in records:
+        by_agent.setdefault(r["agent"], []).append(r)
+    return {
+        "total": _totals(records),
+        "agents": {name: _totals(rows) for name, rows in sorted(by_agent.items())},
+    }
+
+
+class LLMMetrics:
+    def __init__(self, path: str | None = None, max_records: int = 10000):
+        self.path = path if path is not None else os.getenv("LLM_METRICS_FILE")
+        self.max_records = max_records
+        self._lock = threading.Lock()
+        self._records: List[Dict[str, Any]] = []
+        self.turn = 0
+        self.session_started = time.time()
+
+    def begin_turn(self) -> int:
+        """Start a new turn; calls recorded from now on belong to it."""
+        with self._lock:
+            self.turn += 1
+            return self.turn
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            entry = {"ts": round(time.time(), 3), "turn": self.turn, **entry}
+            self._records.append(entry)
+            if len(self._records) > self.max_records:
+                del self._records[: len(self._records) - self.max_records]
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def records(self, turn: int | None = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(r) for r in self._records if turn is None or r["turn"] == turn]
+
+    def turn_summary(self, turn: int | None = None) -> Dict[str, Any]:
+        """Totals and per-agent breakdown of one turn (default: the current one)."""
+        turn = self.turn if turn is None else turn
+        return {"turn": turn, **_aggregate(self.records(turn))}
+
+    def session_summary(self) -> Dict[str, Any]:
+        return {
+            "turns": self.turn,
+            "elapsed_s": round(time.time() - self.session_started, 1),
+            **_aggregate(self.records()),
+        }
+
+    def top_calls(self, n: int = 5, key: str = "cost_usd", turn: int | None = None) -> List[Dict[str, Any]]:
+        """The `n` most expensive calls by `key` (cost_usd, wall_ms, prompt_tokens …)."""
+        return sorted(self.records(turn), key=lambda r: r.get(key) or 0, reverse=True)[:n]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._records.clear()
+            self.turn = 0
+            self.session_started = time.time()
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """One line for the CLI, e.g. `LLM turn 3: 5 calls (0 cached), 3.2s, 4512 tok, $0.0121 | …`."""
+    total = summary["total"]
+    label = f"turn {summary['turn']}" if "turn" in summary else f"session, {summary['turns']} turns"
+    line = (f"LLM {label}: {total['calls']} calls ({total['cache_hits']} cached), "
+            f"{total['wall_ms'] / 1000:.1f}s, "
+            f"{total['prompt_tokens'] + total['completion_tokens']} tok, ${total['cost_usd']:.4f}")
+    if total["cost_usd"] and summary["agents"]:
+        name, top = max(summary["agents"].items(), key=lambda kv: kv[1]["cost_usd"])
+        line += f" | most expensive: {name} {100 * top['cost_usd'] / total['cost_usd']:.0f}%"
+    return line
+
+
+# one collector per process, shared by every agent
+default_llm_metrics = LLMMetrics()
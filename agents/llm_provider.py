@@ -0,0 +1,95 @@
+"""
+LLM backends behind one small interface.
+
+A provider hands out OpenAI-shaped clients (``client.chat.completions.create``)
+per agent, created lazily on first use. The provider is picked by the
+LLM_PROVIDER environment variable:
+
+  • openai  (default) – the real OpenAI API; needs OPENAI_API_KEY
+  • offline           – deterministic local replies, see agents.offline_provider
+
+Register extra backends with ``register_provider(name, factory)``.
+"""
+import os
+import asyncio
+import weakref
+import threading
+from typing import Callable, Dict, Any
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class LLMProvider:
+    """Base class: return sync / async chat clients for an agent."""
+
+    name = "base"
+
+    def client(self, agent_name: str) -> Any:
+        raise NotImplementedError
+
+    def async_client(self, agent_name: str) -> Any:
+        raise NotImplementedError
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        # one AsyncOpenAI per event loop: its connection pool is bound to the
+        # loop, and main.py runs a fresh asyncio.run() every turn
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+    def _api_key(self) -> str:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise RuntimeError("Missing OPENAI_API_KEY in environment")
+        return api_key
+
+    def client(self, agent_name: str) -> Any:
+        with self._lock:
+            if self._client is None:
+                from openai import OpenAI
+                self._client = OpenAI(api_key=self._api_key())
+            return self._client
+
+    def async_client(self, agent_name: str) -> Any:
+        """The async client of the running event loop (created on first use in that loop)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._async_clients:
+                from openai import AsyncOpenAI
+                self._async_clients[loop] = AsyncOpenAI(api_key=self._api_key())
+            return self._async_clients[loop]
+
+
+def _offline_factory() -> LLMProvider:
+    from agents.offline_provider import OfflineProvider
+    return OfflineProvider()
+
+
+_factories: Dict[str, Callable[[], LLMProvider]] = {
+    "openai": OpenAIProvider,
+    "offline": _offline_factory,
+}
+_providers: Dict[str, LLMProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def register_provider(name: str, factory: Callable[[], LLMProvider]) -> None:
+    with _providers_lock:
+        _factories[name] = factory
+        _providers.pop(name, None)
+
+
+def get_provider(name: str | None = None) -> LLMProvider:
+    """The provider named `name` (default: $LLM_PROVIDER or "openai"), created once."""
+    name = (name or os.getenv("LLM_PROVIDER") or "openai").strip().lower()
+    with _providers_lock:
+        if name not in _providers:
+            if name not in _factories:
+                raise ValueError(f"Unknown LLM_PROVIDER: {name} (known: {', '.join(sorted(_factories))})")
+            _providers[name] = _factories[name]()
+        return _providers[name]
@@ -0,0 +1,372 @@
+"""
+OfflineProvider: deterministic, network-free stand-in for the OpenAI API.
+
+Selected with LLM_PROVIDER=offline. Every agent gets an OpenAI-shaped client
+whose `chat.completions.create(...)` returns a ChatCompletion-like object:
+
+  • canned replies – if LLM_OFFLINE_FIXTURES names a directory containing
+                     `<agent_name>.json`, that JSON is returned (a JSON list is
+                     replayed round-robin, one element per call)
+  • rule replies   – otherwise a small rule set per agent builds a reply with
+                     the schema its system prompt asks for, from the request
+
+Latency is simulated as LLM_OFFLINE_LATENCY seconds per call plus
+LLM_OFFLINE_TOKEN_LATENCY seconds per completion token, so the full pipeline
+can be benchmarked with realistic pacing and no network. `stream=True`
+returns the reply as ChatCompletionChunk-like deltas paced the same way.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import itertools
+import threading
+from types import SimpleNamespace
+from typing import List, Dict, Any, Callable, Iterator, AsyncIterator
+from urllib.parse import urlsplit, urlencode
+
+from agents.llm_provider import LLMProvider
+from agents.context import count_tokens, compact_json
+from utils.platforms import extract_urls, classify_platform
+
+_FULL_NAME_RE = re.compile(r'"full_name":\s*"([^"]*)"')
+_HEADLINE_RE = re.compile(r'"headline":\s*"([^"]*)"')
+
+# paths that look like a single page: fetch the content instead of mapping links
+CONTENT_PATH_HINTS = ("/watch", "/status/", "/posts/", "/p/", "/pulse/", ".pdf")
+
+CLARIFIER_TO_USER = (
+    "Please review each row, toggle Is Confirmed to Yes/No, adjust Add to personal "
+    "database, and edit any mistakes in link or Platform. Please press Submit when finished."
+)
+
+
+# ---------------------------------------------------------------------- #
+# request helpers
+# ---------------------------------------------------------------------- #
+def _profile_field(messages: List[Dict[str, str]], pattern: re.Pattern) -> str:
+    match = pattern.search(messages[0]["content"]) if messages else None
+    return match.group(1) if match else ""
+
+
+def _retrieved_context(messages: List[Dict[str, str]]) -> Any:
+    for msg in messages:
+        if msg.get("name") == "retrieved_context":
+            try:
+                return json.loads(msg["content"])
+            except (json.JSONDecodeError, TypeError):
+                return msg["content"]
+    return None
+
+
+def _user_query(messages: List[Dict[str, str]]) -> str:
+    return messages[-1]["content"] if messages else ""
+
+
+def _embedded_json(text: str) -> Any:
+    """First JSON array/object embedded in `text` (tolerates Python True/False), or None."""
+    decoder = json.JSONDecoder()
+    for candidate in (text, text.replace("True", "true").replace("False", "false").replace("None", "null")):
+        for i, c in enumerate(candidate):
+            if c not in "[{":
+                continue
+            try:
+                return decoder.raw_decode(candidate, i)[0]
+            except json.JSONDecodeError:
+                continue
+    return None
+
+
+def _links_in(data: Any) -> List[Dict[str, Any]]:
+    """Link items inside a list or {"<key>": [...]} payload (nested one level)."""
+    while isinstance(data, dict):
+        lists = [v for v in data.values() if isinstance(v, (list, dict))]
+        if not lists:
+            return []
+        data = lists[0]
+    return [item for item in data or [] if isinstance(item, dict) and item.get("link")]
+
+
+# ---------------------------------------------------------------------- #
+# rule replies per agent
+# ---------------------------------------------------------------------- #
+def rule_query_handler(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    query = _user_query(messages)
+    items = _links_in(_embedded_json(query))
+    if items:
+        links = [
+            {"link": i["link"], "platform": i.get("platform") or classify_platform(i["link"]),
+             "is_confirmed": bool(i.get("is_confirmed"))}
+            for i in items
+        ]
+    else:
+        links = [
+            {"link": url, "platform": classify_platform(url), "is_confirmed": False}
+            for url in extract_urls(query)
+        ]
+    return {
+        "links": links,
+        "user_info": {
+            "name": _profile_field(messages, _FULL_NAME_RE),
+            "info": _profile_field(messages, _HEADLINE_RE),
+        },
+        "feedback_info": {},
+        "to_clarifier": [l for l in links if not l["is_confirmed"]],
+        "to_tool_selector": [l for l in links if l["is_confirmed"]],
+    }
+
+
+def rule_clarifier(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    name = _profile_field(messages, _FULL_NAME_RE)
+    return {
+        "to_user": CLARIFIER_TO_USER,
+        "clarified_links": [
+            {
+                "link": item["link"],
+                "platform": item.get("platform") or classify_platform(item["link"]),
+                "search_info": item.get("search_info") or name,
+                "is_confirmed": bool(item.get("is_confirmed")),
+                "add_to_db": "Waiting for confirm",
+                "agent_notes": item.get("agent_notes") or "Confirmation needed to verify the accuracy of the link.",
+            }
+            for item in _links_in(_embedded_json(_user_query(messages)))
+        ],
+    }
+
+
+def rule_tool_selector(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    name = _profile_field(messages, _FULL_NAME_RE)
+    context = _retrieved_context(messages)
+    context = context if isinstance(context, dict) else {}
+    results = []
+    for item in _links_in(_embedded_json(_user_query(messages))):
+        link = item["link"]
+        keyword = item.get("search_info") or name
+        path = urlsplit(link).path
+        deep_page = classify_platform(link) == "Unknown"
+        if deep_page or any(hint in path for hint in CONTENT_PATH_HINTS):
+            tool, params = "crawl_external_content", {
+                "url": link, "search": keyword, "user_id": context.get("default_user_id", 1),
+            }
+        else:
+            tool, params = "crawl_get_site_links", {
+                "matrix_user_id": context.get("default_matrix_user_id", ""), "search": keyword, "url": link,
+            }
+        results.append({
+            "link": link,
+            "reasoning": f"{tool} chosen by offline rules for a {classify_platform(link)} link.",
+            "tool_name": tool,
+            "parameters": {"endpoint": "?" + urlencode(params)},
+        })
+    return {"results": results}
+
+
+def _info_for_record(record: Dict[str, Any], name: str, confirmed: set) -> Dict[str, Any]:
+    def _matches(*texts: Any) -> bool:
+        return bool(name) and any(name in str(t).lower() for t in texts if t)
+
+    out: Dict[str, Any] = {"thinking_process": "", "to_knowledge_base": [], "to_clarifier": []}
+    if record.get("source") == "crawl_get_site_links":
+        metadata = record.get("metadata") if isinstance(record.get("metadata"), dict) else {}
+        for link in record.get("links") or []:
+            if not isinstance(link, str) or link in confirmed:
+                continue
+            meta = metadata.get(link)
+            confidence = 4 if isinstance(meta, dict) and _matches(*meta.values()) else 1
+            out["to_clarifier"].append({
+                "link": link, "platform": classify_platform(link), "confidence": confidence,
+                "is_confirmed": False, "add_to_db": "waiting_for_confirm",
+                "agent_notes": "Child link found by site crawl; needs user review.",
+            })
+        out["thinking_process"] = "Site links: every child link goes to the clarifier."
+    else:
+        link = record.get("url") or record.get("source_url") or ""
+        confidence = 5 if _matches(record.get("title"), record.get("author"), record.get("content")) else 2
+        item = {
+            "link": link, "platform": classify_platform(link), "confidence": confidence,
+            "is_confirmed": link in confirmed, "add_to_db": link in confirmed and confidence >= 4,
+            "agent_notes": "Name match in page content." if confidence >= 4 else "No clear identity match.",
+        }
+        out["to_knowledge_base" if item["add_to_db"] else "to_clarifier"].append(item)
+        out["thinking_process"] = f"External content scored {confidence} by name match."
+    return out
+
+
+def rule_info_retriever(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+    name = _profile_field(messages, _FULL_NAME_RE).lower()
+    context = _retrieved_context(messages)
+    confirmed = {
+        i["link"] for i in _links_in(_embedded_json(_user_query(messages))) if i.get("is_confirmed") is True
+    }
+    if isinstance(context, list):
+        # batched request: one output per record, tagged with its link_id
+        return {"results": [
+            {"link_id": rec.get("link_id"), **_info_for_record(rec, name, confirmed)}
+            for rec in context if isinstance(rec, dict)
+        ]}
+    return _info_for_record(context if isinstance(context, dict) else {}, name, confirmed)
+
+
+RULES: Dict[str, Callable[[List[Dict[str, str]]], Dict[str, Any]]] = {
+    "query_handler": rule_query_handler,
+    "clarifier": rule_clarifier,
+    "tool_selector": rule_tool_selector,
+    "info_retriever": rule_info_retriever,
+}
+
+
+# ---------------------------------------------------------------------- #
+# provider and OpenAI-shaped clients
+# ---------------------------------------------------------------------- #
+class OfflineProvider(LLMProvider):
+    name = "offline"
+    STREAM_CHUNK_CHARS = 16       # size of each streamed delta
+
+    def __init__(
+        self,
+        fixtures_dir: str | None = None,
+        latency: float | None = None,
+        token_latency: float | None = None
+    ):
+        self.fixtures_dir = fixtures_dir if fixtures_dir is not None else os.getenv("LLM_OFFLINE_FIXTURES")
+        self.latency = float(os.getenv("LLM_OFFLINE_LATENCY", "0")) if latency is None else latency
+        self.token_latency = float(os.getenv("LLM_OFFLINE_TOKEN_LATENCY", "0")) if token_latency is None else token_latency
+        self._lock = threading.Lock()
+        self._fixtures: Dict[str, Any] = {}
+        self._counter = itertools.count(1)
+
+    def client(self, agent_name: str) -> Any:
+        return SimpleNamespace(chat=SimpleNamespace(completions=_Completions(self, agent_name)))
+
+    def async_client(self, agent_name: str) -> Any:
+        return SimpleNamespace(chat=SimpleNamespace(completions=_AsyncCompletions(self, agent_name)))
+
+    def _fixture(self, agent_name: str) -> Any | None:
+        if not self.fixtures_dir:
+            return None
+        with self._lock:
+            if agent_name not in self._fixtures:
+                path = os.path.join(self.fixtures_dir, f"{agent_name}.json")
+                replies = None
+                if os.path.isfile(path):
+                    with open(path, encoding="utf-8") as f:
+                        data = json.load(f)
+                    replies = itertools.cycle(data) if isinstance(data, list) and data else itertools.repeat(data)
+                self._fixtures[agent_name] = replies
+            replies = self._fixtures[agent_name]
+            return next(replies) if replies is not None else None
+
+    def reply(self, agent_name: str, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        canned = self._fixture(agent_name)
+        if canned is not None:
+            return canned
+        rule = RULES.get(agent_name)
+        return rule(messages) if rule else {}
+
+    def complete(self, agent_name: str, model: str, messages: List[Dict[str, str]]) -> tuple[Any, float]:
+        """Build the ChatCompletion-like response and the latency to simulate."""
+        content = compact_json(self.reply(agent_name, messages))
+        usage = self._usage(model, messages, content)
+        resp = SimpleNamespace(
+            id=f"offline-{next(self._counter)}",
+            object="chat.completion",
+            created=int(time.time()),
+            model=model,
+            choices=[SimpleNamespace(
+                index=0,
+                message=SimpleNamespace(role="assistant", content=content),
+                finish_reason="stop",
+            )],
+            usage=usage,
+        )
+        return resp, self.latency + self.token_latency * usage.completion_tokens
+
+    def stream(
+        self,
+        agent_name: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        include_usage: bool = False
+    ) -> List[tuple[Any, float]]:
+        """
+        ChatCompletionChunk-like pieces of the reply, each with the delay to
+        wait before it: LLM_OFFLINE_LATENCY before the first, then
+        LLM_OFFLINE_TOKEN_LATENCY per token of each piece.
+        """
+        content = compact_json(self.reply(agent_name, messages))
+        usage = self._usage(model, messages, content)
+        resp_id, created = f"offline-{next(self._counter)}", int(time.time())
+
+        def _chunk(delta: str | None, finish_reason: str | None = None, with_usage: bool = False) -> Any:
+            choices = [] if with_usage else [SimpleNamespace(
+                index=0,
+                delta=SimpleNamespace(role="assistant", content=delta),
+                finish_reason=finish_reason,
+            )]
+            return SimpleNamespace(
+                id=resp_id, object="chat.completion.chunk", created=created, model=model,
+                choices=choices, usage=usage if with_usage else None,
+            )
+
+        pieces = [content[i:i + self.STREAM_CHUNK_CHARS] for i in range(0, len(content), self.STREAM_CHUNK_CHARS)]
+        out = [
+            (_chunk(piece), (self.latency if i == 0 else 0.0) + self.token_latency * count_tokens(piece, model))
+            for i, piece in enumerate(pieces)
+        ]
+        out.append((_chunk(None, "stop"), 0.0))
+        if include_usage:
+            out.append((_chunk(None, with_usage=True), 0.0))
+        return out
+
+    @staticmethod
+    def _usage(model: str, messages: List[Dict[str, str]], content: str) -> Any:
+        prompt_tokens = sum(count_tokens(m.get("content", ""), model) for m in messages)
+        completion_tokens = count_tokens(content, model)
+        return SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        )
+
+
+def _include_usage(kwargs: Dict[str, Any]) -> bool:
+    return bool((kwargs.get("stream_options") or {}).get("include_usage"))
+
+
+class _Completions:
+    def __init__(self, provider: OfflineProvider, agent_name: str):
+        self._provider = provider
+        self._agent_name = agent_name
+
+    def create(self, *, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs) -> Any:
+        if stream:
+            return self._iter(self._provider.stream(self._agent_name, model, messages, _include_usage(kwargs)))
+        resp, delay = self._provider.complete(self._agent_name, model, messages)
+        if delay > 0:
+            time.sleep(delay)
+        return resp
+
+    @staticmethod
+    def _iter(chunks: List[tuple[Any, float]]) -> Iterator[Any]:
+        for chunk, delay in chunks:
+            if delay > 0:
+                time.sleep(delay)
+            yield chunk
+
+
+class _AsyncCompletions(_Completions):
+    async def create(self, *, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs) -> Any:
+        if stream:
+            return self._aiter(self._provider.stream(self._agent_name, model, messages, _include_usage(kwargs)))
+        resp, delay = self._provider.complete(self._agent_name, model, messages)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return resp
+
+    @staticmethod
+    async def _aiter(chunks: List[tuple[Any, float]]) -> AsyncIterator[Any]:
+        for chunk, delay in chunks:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield chunk
@@ -3,14 +3,130 @@ QueryHandlerAgent: parses raw user input + profile + history,
 returns JSON with:
   links[{link, platform, is_confirmed}], user_info{}, feedback_info{},
   to_clarifier[], to_tool_selector[].
+
+Unambiguous queries are answered locally, without an LLM call (fast path):
+  • URLs plus filler words only, e.g. "Find all my social profiles: <url> <url>"
+    – URLs extracted and tagged with utils.platforms, all unconfirmed
+  • a pasted list of link items (clarifier rows) – split by is_confirmed
+Anything else (free-form intent, feedback, negations, retrieved_data) goes to
+the model. Set QUERY_FAST_PATH=0 to always use the model.
 """
+import os
+import re
 import json
 from typing import List, Dict, Any
-from agents.base_agent import BaseAgent
+from agents.base_agent import BaseAgent, ChatStream
+from agents.json_recovery import repair_json
+from utils.platforms import extract_urls, classify_platform
+
+# words that may surround the URLs of a query answered locally; any other word
+# (e.g. "not", "only", "wrong", "medium") means free-form intent
+FILLER_WORDS = frozenset("""
+    a add all also an and are at can could crawl find for get hello here hi i
+    is it look me mine my of on online page pages please presence profile
+    profiles search see site sites social the these this those to up url urls
+    website websites with you account accounts link links check collect
+""".split())
+_WORD_RE = re.compile(r"[a-z']+")
+# repairs that do not change what a pasted link list means ("truncated" is left
+# out: a cut-off list would silently lose its last item)
+_BENIGN_FIXES = {"python_literals", "trailing_comma", "fence"}
+
 
 class QueryHandlerAgent(BaseAgent):
-    def __init__(self):
+    def __init__(self, fast_path: bool | None = None):
         super().__init__(agent_name="query_handler")
+        self.fast_path = os.getenv("QUERY_FAST_PATH", "1") != "0" if fast_path is None else fast_path
+        self.fast_path_stats: Dict[str, int] = {"local": 0, "llm": 0}
+
+    # ------------------------------------------------------------------ #
+    # fast path
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _pasted_links(user_query: str) -> List[Dict[str, Any]] | None:
+        """Link items of a query that is nothing but a JSON list (or {"key": [...]}) of them."""
+        text = user_query.strip()
+        if not text.startswith(("[", "{")):
+            return None
+        try:
+            data, fixes = repair_json(text)
+        except json.JSONDecodeError:
+            return None
+        if not set(fixes) <= _BENIGN_FIXES:
+            return None
+        if isinstance(data, dict) and len(data) == 1:
+            data = next(iter(data.values()))
+        if not isinstance(data, list) or not data:
+            return None
+        if not all(isinstance(i, dict) and isinstance(i.get("link"), str) for i in data):
+            return None
+        return [
+            {
+                "link": i["link"],
+                "platform": i.get("platform") or classify_platform(i["link"]),
+                "is_confirmed": i.get("is_confirmed") is True,
+            }
+            for i in data
+        ]
+
+    @staticmethod
+    def _listed_links(user_query: str) -> List[Dict[str, Any]] | None:
+        """URLs of a query whose remaining words are all FILLER_WORDS."""
+        urls = extract_urls(user_query)
+        if not urls:
+            return None
+        rest = user_query
+        for url in urls:
+            rest = rest.replace(url, " ")
+        rest = re.sub(r"(?:https?://|www\.)\S+", " ", rest.lower())
+        if any(word not in FILLER_WORDS for word in _WORD_RE.findall(rest)):
+            return None
+        return [{"link": url, "platform": classify_platform(url), "is_confirmed": False} for url in urls]
+
+    def local_reply(
+        self,
+        user_query: str,
+        user_profile: Dict[str, Any],
+        retrieved_data: Dict[str, Any] | None = None,
+    ) -> Dict[str, Any] | None:
+        """The reply the model would give for an unambiguous query, or None to ask the model."""
+        if not self.fast_path or retrieved_data:
+            return None
+        links = self._pasted_links(user_query)
+        if links is None:
+            links = self._listed_links(user_query)
+        if links is None:
+            return None
+        return {
+            "links": links,
+            "user_info": {
+                "name": user_profile.get("full_name", ""),
+                "info": user_profile.get("headline", ""),
+            },
+            "feedback_info": {},
+            "to_clarifier": [l for l in links if not l["is_confirmed"]],
+            "to_tool_selector": [l for l in links if l["is_confirmed"]],
+        }
+
+    def _try_local(self, kwargs: Dict[str, Any]) -> Dict[str, Any] | None:
+        reply = self.local_reply(kwargs["user_query"], kwargs["user_profile"] or {}, kwargs["retrieved_data"])
+        self.fast_path_stats["local" if reply is not None else "llm"] += 1
+        return reply
+
+    def _chat_kwargs(
+        self,
+        user_query: str,
+        user_profile: Dict[str, Any],
+        history_summary: str | None,
+        retrieved_data: Dict[str, Any] | None,
+    ) -> Dict[str, Any]:
+        return dict(
+            user_query=user_query,
+            user_profile=user_profile,
+            history_summary=history_summary,
+            retrieved_data=retrieved_data,
+            temperature=0.0,
+        )
 
     def run(
         self,
@@ -25,13 +141,39 @@ class QueryHandlerAgent(BaseAgent):
         • history_summary  – one-paragraph recap of prior turns for {{history_summary}}
         • retrieved_data   – optional context passed in if upstream search has run
         """
-        return self._chat(
-            user_query=user_query,
-            user_profile=user_profile,
-            history_summary=history_summary,
-            retrieved_data=retrieved_data,
-            temperature=0.0,
-        )
+        kwargs = self._chat_kwargs(user_query, user_profile, history_summary, retrieved_data)
+        local = self._try_local(kwargs)
+        return local if local is not None else self._chat(**kwargs)
+
+    def run_stream(
+        self,
+        *,
+        user_query: str,
+        user_profile: Dict[str, Any],
+        history_summary: str | None = None,
+        retrieved_data: Dict[str, Any] | None = None,
+    ) -> ChatStream:
+        """
+        Streaming `run`: iterate for ("links" | "to_clarifier" | …, link) pairs
+        as each one is generated; the full reply is `stream.result` afterwards.
+        """
+        kwargs = self._chat_kwargs(user_query, user_profile, history_summary, retrieved_data)
+        local = self._try_local(kwargs)
+        return ChatStream.from_reply(local) if local is not None else self._chat_stream(**kwargs)
+
+    async def arun(
+        self,
+        *,
+        user_query: str,
+        user_profile: Dict[str, Any],
+        history_summary: str | None = None,
+        retrieved_data: Dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> Dict[str, Any]:
+        """Async `run`; `timeout` is a per-call deadline in seconds."""
+        kwargs = self._chat_kwargs(user_query, user_profile, history_summary, retrieved_data)
+        local = self._try_local(kwargs)
+        return local if local is not None else await self._achat(**kwargs, timeout=timeout)
 
 if __name__ == "__main__":
     example_profile = {
@@ -80,6 +222,8 @@ if __name__ == "__main__":
     # response = agent.run(user_profile=example_profile,user_query=example_user_query, history_summary="")
     response = agent.run(user_profile=example_profile,user_query=example_confirmed_links, history_summary="")
     print("Response from agent:", json.dumps(response, indent=2))
+    # both example queries are answered by the local fast path
+    print("Fast path:", agent.fast_path_stats)
     # Expected output for example_user_query:
     expected_output = {
   "links": [
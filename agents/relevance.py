@@ -0,0 +1,139 @@
+"""
+Local relevance pre-scoring of crawl_get_site_links child links.
+
+A site-links record can carry hundreds of child links with metadata
+(channel, title, description, author). RelevanceScorer scores each one
+against the user profile without the model:
+
+  owner    – the full name is the channel / author            (weight 0.55)
+  mention  – the full name, or part of it, appears in the text (weight 0.25)
+  context  – character-trigram cosine between the text and the
+             profile's headline / position / organization       (weight 0.20)
+
+and split() sorts the links into three bands:
+
+  score <  RELEVANCE_DROP (0.15)  – dropped: no trace of the user
+  score >= RELEVANCE_AUTO (0.75)  – answered locally: to_clarifier, confidence 4
+  in between                      – sent to the model
+
+Links without metadata carry no signal for the model either and go straight
+to the clarifier with confidence 1, as the prompt's example does.
+"""
+import os
+import re
+import math
+from collections import Counter
+from typing import List, Dict, Any, Tuple
+
+from agents.context import CHILD_LINK_FIELDS
+from utils.platforms import classify_platform
+
+RELEVANCE_DROP = float(os.getenv("RELEVANCE_DROP", "0.15"))
+RELEVANCE_AUTO = float(os.getenv("RELEVANCE_AUTO", "0.75"))
+
+OWNER_FIELDS = ("channel", "author")
+_WORD_RE = re.compile(r"\w+")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def _trigrams(text: str) -> Counter:
+    padded = f" {_normalize(text)} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[gram] for gram, count in a.items() if gram in b)
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+class RelevanceScorer:
+    def __init__(
+        self,
+        user_profile: Dict[str, Any],
+        drop: float | None = None,
+        auto: float | None = None,
+    ):
+        self.drop = RELEVANCE_DROP if drop is None else drop
+        self.auto = RELEVANCE_AUTO if auto is None else auto
+        profile = user_profile or {}
+        self.full_name = str(profile.get("full_name") or "")
+        self.name = _normalize(self.full_name)
+        self.name_tokens = [t for t in self.name.split() if len(t) > 1]
+        position = profile.get("current_position") if isinstance(profile.get("current_position"), dict) else {}
+        context = " ".join(str(v) for v in (
+            profile.get("headline"), position.get("title"), position.get("organization"),
+        ) if v)
+        self.context = _trigrams(context)
+
+    def score(self, meta: Dict[str, Any]) -> float:
+        """Relevance of one child link's metadata to the user, in [0, 1]."""
+        if not self.name_tokens:
+            return 0.0
+        text = _normalize(" ".join(str(meta.get(k) or "") for k in CHILD_LINK_FIELDS))
+        owners = [_normalize(str(meta.get(k) or "")) for k in OWNER_FIELDS]
+        owner = 1.0 if any(self.name and self.name in o for o in owners) else 0.0
+        words = set(text.split())
+        mention = 1.0 if self.name in text else sum(t in words for t in self.name_tokens) / len(self.name_tokens)
+        context = _cosine(_trigrams(text), self.context)
+        return round(0.55 * owner + 0.25 * mention + 0.20 * context, 3)
+
+    def split(
+        self,
+        record: Dict[str, Any],
+        skip: set | None = None,
+    ) -> Tuple[Dict[str, Any] | None, List[Dict[str, Any]], int]:
+        """
+        Split a site-links record into (record holding only the ambiguous
+        links, or None if none are left; to_clarifier items decided locally;
+        number of links dropped). Links in `skip` (e.g. already confirmed)
+        are left out entirely.
+        """
+        metadata = record.get("metadata") if isinstance(record.get("metadata"), dict) else {}
+        links = [l for l in record.get("links") or [] if isinstance(l, str)]
+        # metadata-only records list their links as metadata keys
+        listed = set(links)
+        links += [l for l in metadata if l not in listed]
+        skip = skip or set()
+
+        ambiguous: List[str] = []
+        local: List[Dict[str, Any]] = []
+        dropped = 0
+        for link in links:
+            if link in skip:
+                continue
+            meta = metadata.get(link)
+            if not isinstance(meta, dict) or not any(meta.get(k) for k in CHILD_LINK_FIELDS):
+                local.append(self._item(link, 1, "No metadata available to confirm identity. Needs user review."))
+                continue
+            score = self.score(meta)
+            if score < self.drop:
+                dropped += 1
+            elif score >= self.auto:
+                local.append(self._item(
+                    link, 4, f"Strong name match in link metadata (local score {score}); needs user confirmation."
+                ))
+            else:
+                ambiguous.append(link)
+
+        if not ambiguous:
+            return None, local, dropped
+        pruned = dict(record)
+        pruned["links"] = ambiguous
+        pruned["metadata"] = {l: metadata[l] for l in ambiguous if l in metadata}
+        return pruned, local, dropped
+
+    def _item(self, link: str, confidence: int, notes: str) -> Dict[str, Any]:
+        return {
+            "link": link,
+            "platform": classify_platform(link),
+            "confidence": confidence,
+            "search_info": self.full_name,
+            "is_confirmed": False,
+            "add_to_db": False,
+            "agent_notes": notes,
+        }
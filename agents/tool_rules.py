@@ -0,0 +1,218 @@
+"""
+Rule-compiled tool selection for links whose shape is known.
+
+prompts/tool_selector_sys.txt already states the decision: a profile, bio,
+channel or homepage is mapped with crawl_get_site_links, a concrete content
+page (post, video, article, PDF) is fetched with crawl_external_content.
+For hosts in utils.platforms the decision is compiled into per-platform path
+patterns, and the endpoint is built here with every value URL-encoded, so the
+item is ready for ToolExecutor without an LLM round trip:
+
+    select_tool(item, keyword, matrix_user_id, user_id)   # executor item or None
+
+None means the URL shape is unknown (any page of a host without rules – a
+personal website's home page may well be the content itself – or a path no
+rule covers); ToolSelectorAgent sends those links to the model and
+passes its replies through normalize_item(), which rebuilds the endpoint from
+the item's link with the same encoding.
+"""
+import re
+from typing import List, Dict, Any, Tuple
+from urllib.parse import urlsplit, parse_qsl, urlencode, quote
+
+from utils.platforms import classify_platform
+from utils.url_canon import canonicalize_url
+
+SITE_LINKS = "crawl_get_site_links"
+EXTERNAL_CONTENT = "crawl_external_content"
+
+# first path segments that are site pages, not user handles; such links are
+# left to the model
+_RESERVED = {
+    "X": "search|home|explore|i|settings|hashtag|notifications|messages|compose|login|signup|tos|privacy|"
+         "intent|share|lists|topics|communities|jobs|bookmarks|premium|about",
+    "GitHub": "features|pricing|about|login|join|signup|settings|explore|topics|trending|collections|"
+              "marketplace|sponsors|orgs|organizations|notifications|search|new|enterprise|team|customer-stories|"
+              "security|readme|apps|codespaces|pulls|issues|site|contact|events|home|dashboard",
+}
+
+# platform → [(path pattern, tool)], first match wins; "/" (the home page of
+# a platform listed here) always maps site links
+_PATH_RULES: Dict[str, List[Tuple[str, str]]] = {
+    "X": [
+        (r"/[^/]+/status/\d+", EXTERNAL_CONTENT),
+        (rf"/(?!(?i:{_RESERVED['X']})(?:/|$))\w{{1,15}}(/(with_replies|media|highlights))?", SITE_LINKS),
+    ],
+    "YouTube": [
+        (r"/(watch|shorts/[\w-]+|live/[\w-]+|embed/[\w-]+)", EXTERNAL_CONTENT),
+        (r"/(@[\w.-]+|c/[^/]+|channel/[\w-]+|user/[^/]+)"
+         r"(/(videos|featured|about|shorts|streams|playlists|community))?", SITE_LINKS),
+    ],
+    "GitHub": [
+        (rf"/(?!(?i:{_RESERVED['GitHub']})/)[\w.-]+/[\w.-]+/(blob|issues|pull|releases|wiki)(/.*)?", EXTERNAL_CONTENT),
+        (rf"/(?!(?i:{_RESERVED['GitHub']})(?:/|$))[\w.-]+(/[\w.-]+)?", SITE_LINKS),
+    ],
+    "GitLab": [
+        (r"/[\w.-]+(/[\w.-]+)?", SITE_LINKS),
+    ],
+    "LinkedIn": [
+        (r"/(pulse|posts|feed/update)/.+", EXTERNAL_CONTENT),
+        (r"/(in|company|school)/[^/]+(/(details/.+|recent-activity/.*))?", SITE_LINKS),
+    ],
+    "Instagram": [
+        (r"/(p|reel|tv)/[\w-]+", EXTERNAL_CONTENT),
+        (r"/[\w.]+", SITE_LINKS),
+    ],
+    "Facebook": [
+        (r"/[^/]+/(posts|videos)/.+|/watch", EXTERNAL_CONTENT),
+        (r"/(profile\.php|people/.+|[\w.-]+)", SITE_LINKS),
+    ],
+    "TikTok": [
+        (r"/@[\w.-]+/video/\d+", EXTERNAL_CONTENT),
+        (r"/@[\w.-]+", SITE_LINKS),
+    ],
+    "Threads": [
+        (r"/@[\w.-]+/post/[\w-]+", EXTERNAL_CONTENT),
+        (r"/@[\w.-]+", SITE_LINKS),
+    ],
+    "Bluesky": [
+        (r"/profile/[^/]+/post/\w+", EXTERNAL_CONTENT),
+        (r"/profile/[^/]+", SITE_LINKS),
+    ],
+    "Reddit": [
+        (r"/r/[^/]+/comments/.+", EXTERNAL_CONTENT),
+        (r"/(u|user)/[^/]+(/(submitted|comments|overview))?", SITE_LINKS),
+    ],
+    "Medium": [
+        (r"/@[\w.-]+/.+|/p/\w+", EXTERNAL_CONTENT),
+        (r"/@[\w.-]+", SITE_LINKS),
+    ],
+    "Substack": [
+        (r"/p/.+", EXTERNAL_CONTENT),
+        (r"/(archive|about)", SITE_LINKS),
+    ],
+    "Dribbble": [
+        (r"/shots/.+", EXTERNAL_CONTENT),
+        (r"/[\w-]+", SITE_LINKS),
+    ],
+    "Behance": [
+        (r"/gallery/.+", EXTERNAL_CONTENT),
+        (r"/[\w-]+", SITE_LINKS),
+    ],
+    "Wikipedia": [
+        (r"/wiki/.+", SITE_LINKS),
+    ],
+    "IMDb": [
+        (r"/title/tt\d+.*", EXTERNAL_CONTENT),
+        (r"/name/nm\d+(/(bio|awards))?", SITE_LINKS),
+    ],
+    "Vimeo": [
+        (r"/\d+", EXTERNAL_CONTENT),
+        (r"/[\w-]+", SITE_LINKS),
+    ],
+    "Twitch": [
+        (r"/videos/\d+|/[\w-]+/clip/.+", EXTERNAL_CONTENT),
+        (r"/\w+", SITE_LINKS),
+    ],
+    "SoundCloud": [
+        (r"/[\w-]+/(sets/)?[\w-]+", EXTERNAL_CONTENT),
+        (r"/[\w-]+", SITE_LINKS),
+    ],
+    "Spotify": [
+        (r"/(episode|track|album)/\w+", EXTERNAL_CONTENT),
+        (r"/(artist|show|user)/\w+", SITE_LINKS),
+    ],
+    "ProductHunt": [
+        (r"/(posts|products)/.+", EXTERNAL_CONTENT),
+        (r"/@[\w-]+", SITE_LINKS),
+    ],
+    "StackOverflow": [
+        (r"/questions/\d+.*|/a/\d+", EXTERNAL_CONTENT),
+        (r"/users/\d+(/[^/]+)?", SITE_LINKS),
+    ],
+    "GoogleScholar": [
+        (r"/citations", SITE_LINKS),
+    ],
+}
+# an optional trailing slash is allowed after every pattern
+PATH_RULES: Dict[str, List[Tuple[re.Pattern, str]]] = {
+    platform: [(re.compile(rf"^(?:{pattern})/?$"), tool) for pattern, tool in rules]
+    for platform, rules in _PATH_RULES.items()
+}
+# single documents, whatever the host
+_DOCUMENT_RE = re.compile(r"\.(pdf|docx?|pptx?|txt)$", re.IGNORECASE)
+
+
+def tool_for(url: str) -> str | None:
+    """The tool the prompt's rules pick for `url`, or None if its shape is unknown."""
+    # canonical form: youtu.be/<id> → /watch, mobile hosts → main host …
+    canonical = canonicalize_url(url)
+    path = urlsplit(canonical).path
+    if _DOCUMENT_RE.search(path):
+        return EXTERNAL_CONTENT
+    rules = PATH_RULES.get(classify_platform(canonical))
+    if not rules:
+        return None
+    if path in ("", "/"):
+        return SITE_LINKS
+    for pattern, tool in rules:
+        if pattern.match(path):
+            return tool
+    return None
+
+
+def build_endpoint(tool: str, url: str, keyword: str, matrix_user_id: str, user_id: int | str) -> str:
+    """`?…` query string in the prompt's parameter order, every value percent-encoded."""
+    if tool == SITE_LINKS:
+        params = [("matrix_user_id", matrix_user_id), ("search", keyword), ("url", url)]
+    else:
+        params = [("url", url), ("search", keyword), ("user_id", user_id)]
+    return "?" + urlencode(params, quote_via=quote, safe="")
+
+
+def select_tool(
+    item: Dict[str, Any],
+    keyword: str,
+    matrix_user_id: str,
+    user_id: int | str,
+) -> Dict[str, Any] | None:
+    """Executor item for one confirmed link, or None to leave the link to the model."""
+    link = item.get("link")
+    tool = tool_for(link) if isinstance(link, str) else None
+    if tool is None:
+        return None
+    keyword = item.get("search_info") or keyword
+    return {
+        "link": link,
+        "reasoning": f"Rule: {'profile or home page' if tool == SITE_LINKS else 'content page'} "
+                     f"on {classify_platform(link)}.",
+        "tool_name": tool,
+        "parameters": {"endpoint": build_endpoint(tool, link, keyword, matrix_user_id, user_id)},
+    }
+
+
+def normalize_item(
+    item: Dict[str, Any],
+    keyword: str,
+    matrix_user_id: str,
+    user_id: int | str,
+) -> Dict[str, Any]:
+    """
+    Rebuild the endpoint of a model-written item from its link: the search
+    keyword (and ids) the model chose are kept, but `url` is always the link,
+    encoded, so a raw "?" or "&" inside the URL cannot split the query.
+    """
+    tool = item.get("tool_name")
+    link = item.get("link")
+    if tool not in (SITE_LINKS, EXTERNAL_CONTENT) or not isinstance(link, str):
+        return item
+    endpoint = (item.get("parameters") or {}).get("endpoint") or ""
+    query = endpoint.split("?", 1)[1] if "?" in endpoint else endpoint
+    given = dict(parse_qsl(query))
+    endpoint = build_endpoint(
+        tool, link,
+        given.get("search") or keyword,
+        given.get("matrix_user_id") or matrix_user_id,
+        given.get("user_id") or user_id,
+    )
+    return {**item, "parameters": {**(item.get("parameters") or {}), "endpoint": endpoint}}
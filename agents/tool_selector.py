@@ -1,7 +1,9 @@
 # src/agents/tool_selector_agent.py
+import os
 import json
-from typing import List, Dict, Any
-from agents.base_agent import BaseAgent   
+from typing import List, Dict, Any, Iterator, Tuple
+from agents.base_agent import BaseAgent, ChatStream
+from agents.tool_rules import select_tool, normalize_item
 
 class ToolSelectorAgent(BaseAgent):
     """
@@ -17,10 +19,63 @@ class ToolSelectorAgent(BaseAgent):
         default_user_id=1
     )
     print(result)   # JSON array ready for the executor
+
+    Links of a known shape (see agents.tool_rules) are answered by rules
+    without the model; only the rest is sent to it, and every endpoint the
+    model writes is re-encoded from its link. TOOL_RULES=0 sends everything
+    to the model.
     """
 
-    def __init__(self):
+    def __init__(self, rules: bool | None = None):
         super().__init__(agent_name="tool_selector")
+        self.rules = os.getenv("TOOL_RULES", "1") != "0" if rules is None else rules
+        self.rule_stats: Dict[str, int] = {"rules": 0, "llm": 0}
+
+    # ------------------------------------------------------------------ #
+    # rule engine
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _links(to_tool_selector: Any) -> List[Dict[str, Any]]:
+        # callers pass either the list or the upstream {"to_tool_selector": [...]}
+        if isinstance(to_tool_selector, dict):
+            to_tool_selector = to_tool_selector.get("to_tool_selector") or []
+        return list(to_tool_selector or [])
+
+    def _split(
+        self,
+        to_tool_selector: Any,
+        user_profile: Dict[str, Any],
+        default_matrix_user_id: str,
+        default_user_id: int,
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """(executor items built by rules, links left for the model)."""
+        keyword = (user_profile or {}).get("full_name", "")
+        local: List[Dict[str, Any]] = []
+        pending: List[Dict[str, Any]] = []
+        for link in self._links(to_tool_selector):
+            item = select_tool(link, keyword, default_matrix_user_id, default_user_id) if self.rules else None
+            if item is None:
+                pending.append(link)
+            else:
+                local.append(item)
+        self.rule_stats["rules"] += len(local)
+        self.rule_stats["llm"] += len(pending)
+        return local, pending
+
+    def _merge(
+        self,
+        local: List[Dict[str, Any]],
+        reply: Any,
+        user_profile: Dict[str, Any],
+        default_matrix_user_id: str,
+        default_user_id: int,
+    ) -> Dict[str, Any]:
+        keyword = (user_profile or {}).get("full_name", "")
+        results = reply.get("results", []) if isinstance(reply, dict) else reply or []
+        return {"results": local + [
+            normalize_item(i, keyword, default_matrix_user_id, default_user_id) if isinstance(i, dict) else i
+            for i in results
+        ]}
 
     # ------------------------------------------------------------------ #
     # public entry-point
@@ -40,7 +95,82 @@ class ToolSelectorAgent(BaseAgent):
         to_tool_selector  – list from upstream JSON
         user_profile      – dict used to fill {{user_profile}} in the system prompt
         """
+        local, pending = self._split(to_tool_selector, user_profile, default_matrix_user_id, default_user_id)
+        if not pending:
+            return {"results": local}
+        # Send the rest to OpenAI – we expect a pure-JSON array back
+        reply = self._chat(**self._chat_kwargs(
+            pending, user_profile, default_matrix_user_id, default_user_id, history_summary
+        ))
+        return self._merge(local, reply, user_profile, default_matrix_user_id, default_user_id)
 
+    def run_stream(
+        self,
+        *,
+        to_tool_selector: List[Dict[str, Any]],
+        user_profile: Dict[str, Any],
+        default_matrix_user_id: str = "@ludoa:superme.etke.host",
+        default_user_id: int = 1,
+        history_summary: str | None = None
+    ) -> ChatStream:
+        """
+        Streaming `run`: yields ("results", item) as each executor instruction
+        is generated, so crawls can start before the reply is complete.
+        Rule-built items come first, before the model request is sent.
+        """
+        local, pending = self._split(to_tool_selector, user_profile, default_matrix_user_id, default_user_id)
+        if not pending:
+            return ChatStream.from_reply({"results": local})
+        llm_stream = self._chat_stream(**self._chat_kwargs(
+            pending, user_profile, default_matrix_user_id, default_user_id, history_summary
+        ))
+        keyword = (user_profile or {}).get("full_name", "")
+        stream = ChatStream()
+
+        def _events() -> Iterator[Tuple[str, Any]]:
+            for item in local:
+                yield "results", item
+            for key, element in llm_stream:
+                if key == "results" and isinstance(element, dict):
+                    element = normalize_item(element, keyword, default_matrix_user_id, default_user_id)
+                yield key, element
+            stream.result = self._merge(
+                local, llm_stream.result, user_profile, default_matrix_user_id, default_user_id
+            )
+
+        stream._events = _events()
+        return stream
+
+    async def arun(
+        self,
+        *,
+        to_tool_selector: List[Dict[str, Any]],
+        user_profile: Dict[str, Any],
+        default_matrix_user_id: str = "@ludoa:superme.etke.host",
+        default_user_id: int = 1,
+        history_summary: str | None = None,
+        timeout: float | None = None
+    ) -> List[Dict[str, Any]]:
+        """Async `run`; `timeout` is a per-call deadline in seconds."""
+        local, pending = self._split(to_tool_selector, user_profile, default_matrix_user_id, default_user_id)
+        if not pending:
+            return {"results": local}
+        reply = await self._achat(
+            **self._chat_kwargs(
+                pending, user_profile, default_matrix_user_id, default_user_id, history_summary
+            ),
+            timeout=timeout,
+        )
+        return self._merge(local, reply, user_profile, default_matrix_user_id, default_user_id)
+
+    def _chat_kwargs(
+        self,
+        to_tool_selector: List[Dict[str, Any]],
+        user_profile: Dict[str, Any],
+        default_matrix_user_id: str,
+        default_user_id: int,
+        history_summary: str | None
+    ) -> Dict[str, Any]:
         # The LLM sees `user_query` only; provide the payload verbatim.
         user_query = json.dumps(
             { "to_tool_selector": to_tool_selector },
@@ -53,16 +183,13 @@ class ToolSelectorAgent(BaseAgent):
             "default_user_id": default_user_id
         }
 
-        # Send to OpenAI – we expect a pure-JSON array back
-        response = self._chat(
+        return dict(
             user_query=user_query,
             user_profile=user_profile,
             history_summary=history_summary,
             retrieved_data=retrieved_context
         )
 
-        return response
-
 
 if __name__ == "__main__":
     example_input_to_tool_selector  = [
@@ -126,4 +253,5 @@ if __name__ == "__main__":
     response = agent.run(to_tool_selector=example_input_to_tool_selector, 
                          user_profile=example_user_profile)
     print("Response from ClarifierAgent:", json.dumps(response, indent=2))
+    print("Rule stats:", agent.rule_stats)
     
\ No newline at end of file
@@ -0,0 +1,144 @@
+# crawl_store.py
+"""
+On-disk layout of one crawl result:
+
+    {link_id}.json      – small uncompressed sidecar:
+                          { "status_code", "content_type", "body_file",
+                            "compression", "raw_bytes", "truncated", ... }
+                          or { "error": "..." } when the request failed
+    {link_id}.body.gz   – the raw response body, gzip-compressed, capped at
+                          `max_body_bytes` (a truncation marker is appended)
+
+Older results that keep the parsed body inline (`{"status_code", "body"}`)
+are still read transparently by `load_record`.
+
+With `fields=`, JSON bodies above STREAM_BODY_BYTES are parsed incrementally
+(ijson, when installed) keeping only those top-level fields, so a huge body
+is never held in memory as a whole.
+"""
+import os
+import json
+import gzip
+from typing import Dict, Any, List
+
+from executor.link_index import write_json_atomic, copy_file_atomic
+
+try:
+    import ijson
+except ImportError:          # optional; large bodies are then parsed in one go
+    ijson = None
+
+BODY_SUFFIX = ".body.gz"
+TRUNCATION_MARKER = "\n[TRUNCATED after {limit} bytes]"
+# raw body size above which `fields=` reads stream the JSON
+STREAM_BODY_BYTES = 4 * 1024 * 1024
+
+
+def sidecar_path(folder: str, link_id: str) -> str:
+    return os.path.join(folder, f"{link_id}.json")
+
+
+def body_path(folder: str, link_id: str) -> str:
+    return os.path.join(folder, f"{link_id}{BODY_SUFFIX}")
+
+
+def stream_to_gzip(chunks, dest: str, max_bytes: int) -> Dict[str, Any]:
+    """
+    Write an iterable of byte chunks to `dest` gzip-compressed, stopping once
+    `max_bytes` raw bytes have been written. Returns {"raw_bytes", "truncated"}.
+    """
+    written = 0
+    truncated = False
+    with gzip.open(dest, "wb", compresslevel=6) as out:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            room = max_bytes - written
+            if len(chunk) > room:
+                out.write(chunk[:room])
+                written += room
+                truncated = True
+                break
+            out.write(chunk)
+            written += len(chunk)
+        if truncated:
+            out.write(TRUNCATION_MARKER.format(limit=max_bytes).encode("utf-8"))
+    return {"raw_bytes": written, "truncated": truncated}
+
+
+def save_record(folder: str, link_id: str, meta: Dict[str, Any], body_src: str | None = None, move: bool = True) -> str:
+    """
+    Install `body_src` (a gzip file) as the record body and write the sidecar
+    atomically. Returns the sidecar path.
+    """
+    meta = dict(meta)
+    if body_src:
+        dest = body_path(folder, link_id)
+        if move:
+            os.replace(body_src, dest)
+        else:
+            copy_file_atomic(body_src, dest)
+        meta["body_file"] = os.path.basename(dest)
+        meta["compression"] = "gzip"
+        meta["stored_bytes"] = os.path.getsize(dest)
+    elif "error" in meta and os.path.exists(body_path(folder, link_id)):
+        # a failed refetch must not leave an older body looking current
+        os.remove(body_path(folder, link_id))
+    path = sidecar_path(folder, link_id)
+    write_json_atomic(path, meta)
+    return path
+
+
+def _stream_fields(path: str, fields: List[str]) -> Dict[str, Any] | None:
+    """Top-level `fields` of a gzip JSON object body, parsed incrementally; None if none found."""
+    wanted = set(fields)
+    out: Dict[str, Any] = {}
+    try:
+        with gzip.open(path, "rb") as f:
+            for key, value in ijson.kvitems(f, "", use_float=True):
+                if key in wanted:
+                    out[key] = value
+    except ijson.JSONError:
+        return None
+    return out or None
+
+
+def read_body(folder: str, meta: Dict[str, Any], fields: List[str] | None = None) -> Any:
+    """
+    Decode the body referenced by a sidecar: parsed JSON when possible, else
+    text. `fields` (top-level keys to keep) lets large JSON bodies be streamed.
+    """
+    path = os.path.join(folder, meta["body_file"])
+    is_json = meta.get("content_type", "").startswith("application/json") and not meta.get("truncated")
+    if fields is not None and is_json and ijson is not None and meta.get("raw_bytes", 0) > STREAM_BODY_BYTES:
+        body = _stream_fields(path, fields)
+        if body is not None:
+            return body
+    with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    if is_json:
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+    return text
+
+
+def load_record(folder: str, link_id: str, fields: List[str] | None = None) -> Dict[str, Any] | None:
+    """
+    Return `{"status_code", "body", ...}` for one stored result (or the
+    stored error dict), whatever the storage format. None if missing.
+    `fields` is passed to read_body.
+    """
+    path = sidecar_path(folder, link_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict) and data.get("body_file") and "body" not in data:
+        try:
+            data["body"] = read_body(folder, data, fields)
+        except (OSError, EOFError):
+            # body deleted or partially written – treat as missing
+            data["body"] = None
+    return data
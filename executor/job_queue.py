@@ -0,0 +1,363 @@
+# job_queue.py
+"""
+Durable crawl queue on a local SQLite file.
+
+Producers (e.g. main.py) enqueue tool-selector items; any number of worker
+processes — on one machine or several sharing the DB file — claim jobs with
+time-limited leases, heartbeat while the ToolExecutor runs them, and mark
+them done. A job whose lease expires (worker crashed or hung) becomes
+claimable again, so unfinished work resumes automatically.
+
+Run workers:
+    python -m executor.job_queue --db data/crawl_queue.db --workers 4
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator
+
+dirname = os.path.dirname(__file__)
+default_db_path = os.path.join(dirname, "..", "data/crawl_queue.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id       TEXT    NOT NULL,
+    item          TEXT    NOT NULL,
+    status        TEXT    NOT NULL DEFAULT 'queued',   -- queued | leased | done | failed
+    lease_owner   TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    result        TEXT,
+    error         TEXT,
+    created_at    REAL    NOT NULL,
+    updated_at    REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claimable ON jobs (status, lease_expires, id);
+-- politeness token buckets shared by every worker (see SharedTokenBucket)
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    domain  TEXT PRIMARY KEY,
+    tokens  REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+class CrawlQueue:
+    """
+    Lease-based job queue. Every state change runs in a short IMMEDIATE
+    transaction, so concurrent claimers never receive the same job.
+
+    Usage:
+        queue = CrawlQueue("data/crawl_queue.db")
+        queue.enqueue("001", ts_output_results)
+        jobs = queue.claim("worker-1", limit=8, lease_seconds=120)
+        queue.heartbeat("worker-1", [j["id"] for j in jobs])
+        queue.complete(jobs[0]["id"], "worker-1", result_record)
+    """
+
+    def __init__(self, db_path: str = default_db_path, max_attempts: int = 3, busy_timeout: float = 30.0):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.busy_timeout = busy_timeout
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _tx(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------ #
+    # producer side
+    # ------------------------------------------------------------------ #
+    def enqueue(self, user_id: str, items: List[Dict[str, Any]]) -> List[int]:
+        """Add one job per item; returns the job IDs."""
+        now = time.time()
+        with self._tx() as conn:
+            return [
+                conn.execute(
+                    "INSERT INTO jobs (user_id, item, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (user_id, json.dumps(item, ensure_ascii=False), now, now),
+                ).lastrowid
+                for item in items
+            ]
+
+    # ------------------------------------------------------------------ #
+    # worker side
+    # ------------------------------------------------------------------ #
+    def claim(self, worker_id: str, limit: int = 1, lease_seconds: float = 120,
+              user_id: str | None = None) -> List[Dict[str, Any]]:
+        """
+        Lease up to `limit` jobs that are queued or whose lease has expired,
+        oldest first (optionally only for one user). Jobs whose worker keeps
+        dying are not re-leased after max_attempts; their expired leases are
+        marked failed in the same transaction, so they do not stay leased.
+        """
+        now = time.time()
+        sql = ("SELECT id FROM jobs WHERE (status = 'queued' OR "
+               "(status = 'leased' AND lease_expires < ? AND attempts < ?))"
+               + (" AND user_id = ?" if user_id else "") + " ORDER BY id LIMIT ?")
+        params = (now, self.max_attempts, user_id, limit) if user_id else (now, self.max_attempts, limit)
+        with self._tx() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'lease expired'), "
+                "lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            ids = [row["id"] for row in conn.execute(sql, params)]
+            if not ids:
+                return []
+            marks = ",".join("?" * len(ids))
+            conn.execute(
+                f"UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                f"attempts = attempts + 1, updated_at = ? WHERE id IN ({marks})",
+                (worker_id, now + lease_seconds, now, *ids),
+            )
+            rows = conn.execute(f"SELECT * FROM jobs WHERE id IN ({marks}) ORDER BY id", ids).fetchall()
+        return [self._row(row) for row in rows]
+
+    def heartbeat(self, worker_id: str, job_ids: List[int], lease_seconds: float = 120) -> int:
+        """Extend the leases this worker still holds; returns how many were extended."""
+        if not job_ids:
+            return 0
+        now = time.time()
+        marks = ",".join("?" * len(job_ids))
+        with self._tx() as conn:
+            return conn.execute(
+                f"UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                f"WHERE status = 'leased' AND lease_owner = ? AND id IN ({marks})",
+                (now + lease_seconds, now, worker_id, *job_ids),
+            ).rowcount
+
+    def complete(self, job_id: int, worker_id: str, result: Dict[str, Any]) -> bool:
+        """Mark a leased job done. False if the lease was lost to another worker."""
+        with self._tx() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (json.dumps(result, ensure_ascii=False), time.time(), job_id, worker_id),
+            ).rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        """Release a job after an error: requeue it, or mark it failed after max_attempts."""
+        with self._tx() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (self.max_attempts, error, time.time(), job_id, worker_id),
+            ).rowcount == 1
+
+    def release_expired(self) -> int:
+        """
+        Requeue jobs whose lease ran out (claim() also picks these up), or mark
+        them failed once they have used up max_attempts.
+        """
+        now = time.time()
+        with self._tx() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "error = COALESCE(error, 'lease expired'), lease_owner = NULL, lease_expires = NULL, "
+                "updated_at = ? WHERE status = 'leased' AND lease_expires < ?",
+                (self.max_attempts, now, now),
+            ).rowcount
+
+    def take_token(self, domain: str, rate: float, burst: float) -> float:
+        """
+        Token-bucket step on the shared bucket of `domain`: take a token and
+        return 0, or return the seconds until one is free.
+        """
+        burst = max(1.0, burst)
+        now = time.time()
+        with self._tx() as conn:
+            row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE domain = ?", (domain,)).fetchone()
+            tokens = burst if row is None else min(burst, row["tokens"] + max(0.0, now - row["updated"]) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate if rate > 0 else float("inf")
+            conn.execute(
+                "INSERT INTO rate_buckets (domain, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(domain) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (domain, tokens - 1, now),
+            )
+            return 0.0
+
+    # ------------------------------------------------------------------ #
+    # inspection
+    # ------------------------------------------------------------------ #
+    def get(self, job_id: int) -> Dict[str, Any] | None:
+        with self._tx() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._tx() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {"queued": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["item"] = json.loads(job["item"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+class SharedTokenBucket:
+    """
+    PolitenessScheduler bucket kept in the queue DB, so every worker process
+    (and machine) sharing the DB draws from one bucket per domain and a
+    target host sees the configured rate, not workers × rate.
+    """
+
+    def __init__(self, queue: CrawlQueue, domain: str, rate: float, burst: float):
+        self.queue = queue
+        self.domain = domain
+        self.rate = rate
+        self.burst = max(1.0, burst)
+
+    def try_take(self) -> float:
+        return self.queue.take_token(self.domain, self.rate, self.burst)
+
+
+def run_worker(
+    db_path: str = default_db_path,
+    worker_id: str | None = None,
+    batch_size: int = 8,
+    lease_seconds: float = 120,
+    idle_sleep: float = 2.0,
+    stop_when_empty: bool = False,
+    executor_kwargs: Dict[str, Any] | None = None
+) -> int:
+    """
+    Claim and execute jobs until stopped. Leases are renewed by a heartbeat
+    thread every lease_seconds / 3 while a batch runs; a failed renewal is
+    reported on stderr and retried at the next beat. A job whose crawl
+    record carries an error is failed (requeued until max_attempts), not
+    marked done. Returns jobs processed.
+    Politeness buckets are shared through the DB (SharedTokenBucket) unless
+    executor_kwargs brings its own scheduler.
+    """
+    from executor.tool_executor import ToolExecutor
+    from executor.scheduler import PolitenessScheduler
+
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    queue = CrawlQueue(db_path)
+    executor_kwargs = dict(executor_kwargs or {})
+    executor_kwargs.setdefault("scheduler", PolitenessScheduler(
+        bucket_factory=lambda domain, rate, burst: SharedTokenBucket(queue, domain, rate, burst)
+    ))
+    executors: Dict[str, ToolExecutor] = {}
+    processed = 0
+
+    while True:
+        jobs = queue.claim(worker_id, limit=batch_size, lease_seconds=lease_seconds)
+        if not jobs:
+            if stop_when_empty:
+                break
+            time.sleep(idle_sleep)
+            continue
+
+        # one batch per user so each ToolExecutor writes into its own folder
+        by_user: Dict[str, List[Dict[str, Any]]] = {}
+        for job in jobs:
+            by_user.setdefault(job["user_id"], []).append(job)
+
+        stop = threading.Event()
+        job_ids = [job["id"] for job in jobs]
+
+        def _beat():
+            while not stop.wait(lease_seconds / 3):
+                try:
+                    queue.heartbeat(worker_id, job_ids, lease_seconds)
+                except sqlite3.OperationalError as e:
+                    # keep beating: a locked or busy DB is usually transient
+                    print(f"Worker {worker_id}: heartbeat failed ({e}); leases may expire", file=sys.stderr)
+
+        beat = threading.Thread(target=_beat, daemon=True)
+        beat.start()
+        try:
+            for user_id, user_jobs in by_user.items():
+                if user_id not in executors:
+                    executors[user_id] = ToolExecutor(user_id=user_id, **executor_kwargs)
+                try:
+                    results = executors[user_id].execute([job["item"] for job in user_jobs])
+                except Exception as e:
+                    for job in user_jobs:
+                        queue.fail(job["id"], worker_id, f"Worker error: {e}")
+                    continue
+                for job, result in zip(user_jobs, results):
+                    if result.get("error"):
+                        held = queue.fail(job["id"], worker_id, result["error"])
+                    else:
+                        held = queue.complete(job["id"], worker_id, result)
+                    if not held:
+                        print(f"Worker {worker_id}: lease on job {job['id']} was lost; "
+                              f"its result was discarded", file=sys.stderr)
+                    processed += 1
+        finally:
+            stop.set()
+            beat.join()
+
+    for executor in executors.values():
+        executor.close()
+    return processed
+
+
+def run_workers(n: int, db_path: str = default_db_path, **kwargs) -> None:
+    """Start `n` worker processes and wait for them."""
+    procs = [
+        multiprocessing.Process(target=run_worker, kwargs={"db_path": db_path, **kwargs})
+        for _ in range(n)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run crawl queue workers.")
+    parser.add_argument("--db", default=default_db_path)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--lease-seconds", type=float, default=120)
+    parser.add_argument("--stop-when-empty", action="store_true")
+    parser.add_argument("--stats", action="store_true", help="print queue counts and exit")
+    args = parser.parse_args()
+
+    if args.stats:
+        print(json.dumps(CrawlQueue(args.db).stats(), indent=2))
+        sys.exit(0)
+    run_workers(
+        args.workers,
+        db_path=args.db,
+        batch_size=args.batch_size,
+        lease_seconds=args.lease_seconds,
+        stop_when_empty=args.stop_when_empty,
+    )
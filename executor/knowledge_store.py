@@ -0,0 +1,321 @@
+# knowledge_store.py
+"""
+Append-only JSONL knowledge base with compaction.
+
+knowledge_base.json used to be read, extended and rewritten (indent=2) on
+every update. KnowledgeStore keeps one knowledge item per line of
+knowledge_base.jsonl instead:
+
+  • append()   – one write of the new lines under an exclusive file lock,
+                 O(1) in the size of the file
+  • fsync      – KB_FSYNC=always (after every append), interval (at most
+                 every KB_FSYNC_INTERVAL seconds, and on close; default) or
+                 never (left to the OS)
+  • recovery   – a torn last line (crash mid-write) is cut off when the
+                 store is opened; unparsable lines elsewhere are skipped
+  • compact()  – rewrites the file atomically with one entry per canonical
+                 link, later entries merged over earlier ones; started in a
+                 background thread once the file holds more than
+                 KB_COMPACT_RATIO lines per link (and at least KB_COMPACT_MIN)
+
+Migrate an existing knowledge_base.json (nested lists are flattened; the old
+file is kept as knowledge_base.json.bak, never overwritten; a file that does
+not parse is left alone):
+    python -m executor.knowledge_store migrate data/user_data/001/knowledge_base.json
+Compact on demand:
+    python -m executor.knowledge_store compact data/user_data/001/knowledge_base.jsonl
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Iterator, Tuple
+
+from utils.url_canon import canonicalize_url
+
+try:
+    import fcntl
+except ImportError:          # non-POSIX: only the in-process lock applies
+    fcntl = None
+
+KB_FSYNC = os.getenv("KB_FSYNC", "interval")
+KB_FSYNC_INTERVAL = float(os.getenv("KB_FSYNC_INTERVAL", "1.0"))
+KB_COMPACT_RATIO = float(os.getenv("KB_COMPACT_RATIO", "2.0"))
+KB_COMPACT_MIN = int(os.getenv("KB_COMPACT_MIN", "64"))
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+def _key(item: Dict[str, Any]) -> str:
+    """Compaction key: the canonical link, or the whole item if it has none."""
+    link = item.get("link")
+    if isinstance(link, str) and link:
+        return canonicalize_url(link)
+    return json.dumps(item, sort_keys=True, ensure_ascii=False)
+
+
+def _flatten(data: Any) -> Iterator[Dict[str, Any]]:
+    """Knowledge items in a legacy knowledge_base.json (a list of lists of items, at any depth)."""
+    if isinstance(data, dict):
+        yield data
+    elif isinstance(data, list):
+        for entry in data:
+            yield from _flatten(entry)
+
+
+class KnowledgeStore:
+    def __init__(
+        self,
+        path: str,
+        fsync: str | None = None,
+        compact_ratio: float | None = None,
+        compact_min: int | None = None
+    ):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.fsync = KB_FSYNC if fsync is None else fsync
+        if self.fsync not in FSYNC_POLICIES:
+            raise ValueError(f"KB_FSYNC must be one of {FSYNC_POLICIES}, got {self.fsync!r}")
+        self.compact_ratio = KB_COMPACT_RATIO if compact_ratio is None else compact_ratio
+        self.compact_min = KB_COMPACT_MIN if compact_min is None else compact_min
+        self._lock = threading.RLock()
+        self._compactor: threading.Thread | None = None
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+        # line count and distinct keys, to decide when compaction pays off
+        self.lines = 0
+        self._keys: set = set()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._file_lock():
+            self._recover()
+            self._file = open(self.path, "ab")
+        for item in self._read():
+            self.lines += 1
+            self._keys.add(_key(item))
+
+    # ------------------------------------------------------------------ #
+    # locking / recovery
+    # ------------------------------------------------------------------ #
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _recover(self) -> int:
+        """Cut off a partial last line left by a crash; returns the bytes removed."""
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return 0
+            # find the end of the last complete line
+            pos = size
+            while pos > 0:
+                step = min(1 << 16, pos)
+                f.seek(pos - step)
+                block = f.read(step)
+                nl = block.rfind(b"\n")
+                if nl != -1:
+                    pos = pos - step + nl + 1
+                    break
+                pos -= step
+            if pos == size:
+                return 0
+            f.truncate(pos)
+            f.flush()
+            os.fsync(f.fileno())
+        print(f"Knowledge base {self.path}: dropped a partial last line ({size - pos} bytes)", file=sys.stderr)
+        return size - pos
+
+    def _reopen_if_replaced(self) -> None:
+        """Another process may have compacted the file: append to the new one."""
+        try:
+            same = os.stat(self.path).st_ino == os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            same = False
+        if not same:
+            self._file.close()
+            self._file = open(self.path, "ab")
+
+    # ------------------------------------------------------------------ #
+    # read side
+    # ------------------------------------------------------------------ #
+    def _read(self) -> Iterator[Dict[str, Any]]:
+        """Every stored entry in file order; lines that do not parse are skipped."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break            # partial line still being written
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(item, dict):
+                    yield item
+
+    def _merged(self) -> Dict[str, Dict[str, Any]]:
+        merged: Dict[str, Dict[str, Any]] = {}
+        for item in self._read():
+            key = _key(item)
+            if key in merged:
+                merged[key].update(item)
+            else:
+                merged[key] = dict(item)
+        return merged
+
+    def items(self) -> List[Dict[str, Any]]:
+        """The knowledge base with one entry per canonical link, in first-seen order."""
+        return list(self._merged().values())
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    # ------------------------------------------------------------------ #
+    # write side
+    # ------------------------------------------------------------------ #
+    def append(self, items: List[Dict[str, Any]]) -> None:
+        """Append knowledge items (e.g. an info-retriever to_knowledge_base list)."""
+        items = [item for item in items or [] if isinstance(item, dict)]
+        if not items:
+            return
+        data = b"".join(json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n" for item in items)
+        with self._file_lock():
+            self._reopen_if_replaced()
+            self._file.write(data)
+            self._file.flush()
+            self._unsynced = True
+            if self.fsync == "always" or (
+                self.fsync == "interval" and time.monotonic() - self._last_sync >= KB_FSYNC_INTERVAL
+            ):
+                self._sync()
+            self.lines += len(items)
+            self._keys.update(_key(item) for item in items)
+        if self.lines >= self.compact_min and self.lines > self.compact_ratio * len(self._keys):
+            self.compact(background=True)
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+
+    def compact(self, background: bool = False) -> Tuple[int, int] | None:
+        """
+        Rewrite the file with one entry per canonical link. Returns (lines
+        before, lines after), or None when started in the background.
+        """
+        if background:
+            with self._lock:
+                if self._compactor is not None and self._compactor.is_alive():
+                    return None
+                self._compactor = threading.Thread(target=self.compact, daemon=True)
+                self._compactor.start()
+            return None
+        with self._file_lock():
+            self._reopen_if_replaced()
+            self._file.flush()
+            before = sum(1 for _ in self._read())
+            merged = self._merged()
+            tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    for item in merged.values():
+                        f.write(json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._file.close()
+            self._file = open(self.path, "ab")
+            self._unsynced = False
+            self.lines = len(merged)
+            self._keys = set(merged)
+        return before, len(merged)
+
+    def flush(self) -> None:
+        """fsync pending appends, whatever the policy."""
+        with self._lock:
+            if self._unsynced:
+                self._file.flush()
+                self._sync()
+
+    def close(self) -> None:
+        if self._compactor is not None:
+            self._compactor.join()
+        with self._lock:
+            if self._file.closed:
+                return
+            if self._unsynced and self.fsync != "never":
+                self._file.flush()
+                self._sync()
+            self._file.close()
+
+
+def migrate(json_path: str, jsonl_path: str | None = None) -> Tuple[int, int]:
+    """
+    Convert a legacy knowledge_base.json into a compacted JSONL store next to
+    it (or at `jsonl_path`); the old file is renamed to `<json_path>.bak`
+    (`.bak.<timestamp>` if a backup already exists). Returns (items read,
+    entries kept). Raises ValueError, leaving every file untouched, if the
+    legacy file does not parse.
+    """
+    jsonl_path = jsonl_path or os.path.splitext(json_path)[0] + ".jsonl"
+    try:
+        with open(json_path, encoding="utf-8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{json_path} is not valid JSON ({e}); not migrated") from e
+    backup_path = f"{json_path}.bak"
+    if os.path.exists(backup_path):
+        backup_path = f"{backup_path}.{time.strftime('%Y%m%d-%H%M%S')}"
+        if os.path.exists(backup_path):
+            raise ValueError(f"backup {backup_path} already exists; not migrated")
+    items = list(_flatten(data))
+    store = KnowledgeStore(jsonl_path, fsync="never")
+    try:
+        store.append(items)
+        _, kept = store.compact()
+    finally:
+        store.close()
+    os.rename(json_path, backup_path)
+    return len(items), kept
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Knowledge-base maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_migrate = sub.add_parser("migrate", help="convert a knowledge_base.json to JSONL")
+    p_migrate.add_argument("json_path")
+    p_migrate.add_argument("--out", default=None, help="JSONL path (default: next to json_path)")
+    p_compact = sub.add_parser("compact", help="collapse a JSONL store to one entry per link")
+    p_compact.add_argument("jsonl_path")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        try:
+            read, kept = migrate(args.json_path, args.out)
+        except ValueError as e:
+            print(f"Migration failed: {e}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Migrated {read} items to {kept} entries.")
+    else:
+        kb = KnowledgeStore(args.jsonl_path)
+        before, after = kb.compact()
+        kb.close()
+        print(f"Compacted {before} lines to {after} entries.")
@@ -0,0 +1,185 @@
+# link_index.py
+import os
+import json
+import uuid
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator
+
+from utils.url_canon import canonicalize_url
+
+try:
+    import fcntl
+except ImportError:          # non-POSIX: only the in-process lock applies
+    fcntl = None
+
+
+def write_json_atomic(path: str, data: Any, indent: int | None = 2) -> None:
+    """
+    Write JSON to a sibling temp file, then rename it over `path` so readers
+    never observe a half-written file.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def copy_file_atomic(src: str, dest: str) -> None:
+    """
+    Copy `src` to a unique temp file beside `dest`, then rename it over
+    `dest`, so concurrent writers of the same dest never share a temp file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dest)),
+                                    prefix=os.path.basename(dest) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out, open(src, "rb") as f:
+            shutil.copyfileobj(f, out)
+        os.replace(tmp_path, dest)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class LinkIndex:
+    """
+    Bidirectional link_id ↔ url map backed by link_index.json. The reverse
+    map is keyed on the canonical url (see utils.url_canon), so variants of
+    the same page share one link_id; entries store the url as first given.
+
+    Lookups and ID creation are O(1) and purely in memory; new IDs are kept
+    pending until `flush()` is called (once per batch). `flush()` takes an
+    exclusive lock on `<index>.lock`, re-reads the file, merges pending IDs
+    and writes it back atomically, so several executors for the same user can
+    run at once. If another process indexed the same url first, its ID wins
+    and is returned from `flush()` as a remap.
+
+    Usage:
+        index = LinkIndex("data/user_data/001/link_index.json")
+        link_id = index.get_or_create("https://x.com/soren_iverson")
+        remap = index.flush()          # {pending_id: winning_id}
+        link_id = remap.get(link_id, link_id)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self.by_id: Dict[str, str] = {}
+        self.by_url: Dict[str, str] = {}
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self.reload()
+        if not os.path.exists(self.path):
+            with self._file_lock():
+                if not os.path.exists(self.path):
+                    write_json_atomic(self.path, {})
+
+    # ------------------------------------------------------------------ #
+    # read side
+    # ------------------------------------------------------------------ #
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def __contains__(self, url: str) -> bool:
+        return canonicalize_url(url) in self.by_url
+
+    def get_id(self, url: str) -> str | None:
+        return self.by_url.get(canonicalize_url(url))
+
+    def get_url(self, link_id: str) -> str | None:
+        return self.by_id.get(link_id)
+
+    def items(self):
+        return self.by_id.items()
+
+    def as_dict(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self.by_id)
+
+    def reload(self) -> None:
+        """Replace the in-memory maps with the file contents (pending IDs are kept)."""
+        with self._lock:
+            on_disk = self._read_file()
+            self.by_id = dict(on_disk)
+            self.by_url = {}
+            for lid, url in on_disk.items():
+                self.by_url.setdefault(canonicalize_url(url), lid)
+            for lid, url in self._pending.items():
+                key = canonicalize_url(url)
+                if key not in self.by_url:
+                    self.by_id[lid] = url
+                    self.by_url[key] = lid
+
+    # ------------------------------------------------------------------ #
+    # write side
+    # ------------------------------------------------------------------ #
+    def get_or_create(self, url: str) -> str:
+        """Return the ID for `url`, allocating a pending one if it is new."""
+        key = canonicalize_url(url)
+        with self._lock:
+            lid = self.by_url.get(key)
+            if lid is None:
+                lid = uuid.uuid4().hex
+                self.by_id[lid] = url
+                self.by_url[key] = lid
+                self._pending[lid] = url
+            return lid
+
+    def flush(self) -> Dict[str, str]:
+        """
+        Persist pending IDs. Returns {pending_id: existing_id} for urls that
+        another writer indexed in the meantime (empty dict otherwise).
+        """
+        with self._lock:
+            if not self._pending:
+                return {}
+            remap: Dict[str, str] = {}
+            with self._file_lock():
+                on_disk = self._read_file()
+                disk_by_url = {}
+                for lid, url in on_disk.items():
+                    disk_by_url.setdefault(canonicalize_url(url), lid)
+                for lid, url in self._pending.items():
+                    key = canonicalize_url(url)
+                    existing = disk_by_url.get(key)
+                    if existing and existing != lid:
+                        remap[lid] = existing
+                    else:
+                        on_disk[lid] = url
+                        disk_by_url[key] = lid
+                write_json_atomic(self.path, on_disk)
+            self._pending.clear()
+            # pick up entries written by other processes as well
+            self.by_id = dict(on_disk)
+            self.by_url = disk_by_url
+            return remap
+
+    # ------------------------------------------------------------------ #
+    # helpers
+    # ------------------------------------------------------------------ #
+    def _read_file(self) -> Dict[str, str]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a+") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,190 @@
+# resilience.py
+import time
+import bisect
+import threading
+from collections import deque
+from typing import Dict, Any, List
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while a tool's breaker is open."""
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent request latencies (seconds) with percentiles and
+    a fixed-bucket histogram of everything observed.
+    """
+
+    BUCKETS = [0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60]
+
+    def __init__(self, window: int = 200):
+        self.samples: deque = deque(maxlen=window)
+        self.histogram = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.histogram[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+
+    def percentile(self, p: float) -> float | None:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        idx = min(len(ordered) - 1, max(0, int(round(p / 100 * (len(ordered) - 1)))))
+        return ordered[idx]
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"<={b}s" for b in self.BUCKETS] + [f">{self.BUCKETS[-1]}s"]
+        return {
+            "count": self.count,
+            "window": len(self.samples),
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "histogram": dict(zip(labels, self.histogram)),
+        }
+
+
+class CircuitBreaker:
+    """
+    closed → open when, over the last `window` calls (at least `min_calls`),
+    the failure rate reaches `failure_threshold`; open → half_open after
+    `cooldown` seconds; half_open lets one probe through and closes on
+    success or re-opens on failure.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: float = 0.5, window: int = 20, min_calls: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.outcomes: deque = deque(maxlen=window)
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self.probe_in_flight:
+                self.rejected += 1
+                return False
+            self.probe_in_flight = True
+        return True
+
+    def record(self, success: bool) -> None:
+        if self.state == self.HALF_OPEN:
+            self.probe_in_flight = False
+            if success:
+                self.state = self.CLOSED
+                self.outcomes.clear()
+            else:
+                self._open()
+            return
+        self.outcomes.append(success)
+        failures = self.outcomes.count(False)
+        if len(self.outcomes) >= self.min_calls and failures / len(self.outcomes) >= self.failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        calls = len(self.outcomes)
+        return {
+            "state": self.state,
+            "error_rate": round(self.outcomes.count(False) / calls, 3) if calls else 0.0,
+            "window_calls": calls,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_in_s": round(max(0.0, self.cooldown - (time.monotonic() - self.opened_at)), 2)
+                          if self.state == self.OPEN else 0.0,
+        }
+
+
+class BackendHealth:
+    """
+    Per-tool circuit breakers and latency trackers for the crawler backend,
+    shared by every ToolExecutor in the process.
+
+    timeout_for(tool)  – adaptive timeout: p99 latency × `timeout_multiplier`,
+                         clamped to [min_timeout, max_timeout]; max_timeout
+                         until `min_samples` latencies have been seen.
+    hedge_delay(tool)  – when to fire a hedged duplicate request (p95), or None.
+    snapshot()         – breaker state and latency histogram per tool.
+    """
+
+    def __init__(
+        self,
+        min_timeout: float = 5.0,
+        timeout_multiplier: float = 3.0,
+        min_samples: int = 10,
+        breaker_kwargs: Dict[str, Any] | None = None
+    ):
+        self.min_timeout = min_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.min_samples = min_samples
+        self.breaker_kwargs = breaker_kwargs or {}
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latency: Dict[str, LatencyTracker] = {}
+
+    def _get(self, tool: str):
+        if tool not in self._breakers:
+            self._breakers[tool] = CircuitBreaker(**self.breaker_kwargs)
+            self._latency[tool] = LatencyTracker()
+        return self._breakers[tool], self._latency[tool]
+
+    def allow(self, tool: str) -> bool:
+        with self._lock:
+            return self._get(tool)[0].allow()
+
+    def record(self, tool: str, success: bool, seconds: float | None = None) -> None:
+        with self._lock:
+            breaker, latency = self._get(tool)
+            breaker.record(success)
+            if seconds is not None:
+                latency.observe(seconds)
+
+    def timeout_for(self, tool: str, max_timeout: float) -> float:
+        with self._lock:
+            latency = self._get(tool)[1]
+            if len(latency.samples) < self.min_samples:
+                return max_timeout
+            p99 = latency.percentile(99)
+        return min(max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+
+    def hedge_delay(self, tool: str) -> float | None:
+        with self._lock:
+            latency = self._get(tool)[1]
+            if len(latency.samples) < self.min_samples:
+                return None
+            return latency.percentile(95)
+
+    def snapshot(self, tools: List[str] | None = None) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            names = tools or list(self._breakers)
+            return {
+                tool: {
+                    "breaker": self._get(tool)[0].snapshot(),
+                    "latency": self._get(tool)[1].snapshot(),
+                }
+                for tool in names
+            }
+
+
+# one registry per process: every executor sees the same backend health
+default_health = BackendHealth()
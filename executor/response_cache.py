@@ -0,0 +1,221 @@
+# response_cache.py
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+from typing import Dict, Any
+
+from executor.link_index import write_json_atomic, copy_file_atomic
+from utils.url_canon import canonicalize_url
+
+
+def normalize_endpoint(endpoint: str) -> str:
+    """
+    Canonical form of a `?a=1&b=2` endpoint: decoded, re-encoded the same
+    way every time, with parameters sorted so order does not matter and the
+    `url` parameter canonicalized.
+    """
+    query = endpoint.split("?", 1)[1] if "?" in endpoint else endpoint
+    params = sorted(
+        (k, canonicalize_url(v) if k == "url" else v)
+        for k, v in parse_qsl(query, keep_blank_values=True)
+    )
+    return "?" + urlencode(params)
+
+
+class ResponseCache:
+    """
+    On-disk cache of crawler responses keyed on (tool_name, normalized endpoint).
+
+    Each entry is one JSON file under `cache_dir` holding the response
+    sidecar metadata plus its validators (ETag / Last-Modified), and an
+    optional `<key>.body.gz` blob with the compressed body. Entries younger than the
+    tool's TTL are served directly; older entries with validators can be
+    revalidated with a conditional request. The cache is bounded by entry
+    count and total bytes and evicts least-recently-used entries first.
+
+    Usage:
+        cache = ResponseCache("data/cache/http", ttls={"crawl_get_site_links": 3600})
+        key = cache.key("crawl_get_site_links", "?url=...&search=...")
+        entry = cache.get(key)          # None on miss
+        if entry and cache.is_fresh(entry): ...
+    """
+
+    DEFAULT_TTLS = {
+        "crawl_get_site_links": 6 * 3600,
+        "crawl_external_content": 24 * 3600,
+    }
+
+    def __init__(
+        self,
+        cache_dir: str,
+        ttls: Dict[str, float] | None = None,
+        default_ttl: float = 3600,
+        max_entries: int = 2000,
+        max_bytes: int = 256 * 1024 * 1024
+    ):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.ttls = {**self.DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        # key -> size in bytes, least recently used first
+        self._lru: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "stale": 0, "revalidated": 0, "stores": 0, "evictions": 0}
+        self._load_existing()
+
+    # ------------------------------------------------------------------ #
+    # public API
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def key(tool_name: str, endpoint: str) -> str:
+        raw = f"{tool_name}\n{normalize_endpoint(endpoint)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def ttl_for(self, tool_name: str) -> float:
+        return self.ttls.get(tool_name, self.default_ttl)
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        """
+        Return the stored entry (fresh or stale) and mark it recently used. An
+        entry whose body blob has gone missing is dropped and counts as a miss.
+        """
+        with self._lock:
+            if key not in self._lru:
+                self.counters["misses"] += 1
+                return None
+            if not os.path.exists(self.body_path(key)):
+                self._drop(key)
+                self.counters["misses"] += 1
+                return None
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._drop(key)
+                self.counters["misses"] += 1
+                return None
+            self._lru.move_to_end(key)
+            if self.is_fresh(entry):
+                self.counters["hits"] += 1
+            else:
+                self.counters["stale"] += 1
+            return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        age = time.time() - entry.get("stored_at", 0)
+        return age < self.ttl_for(entry.get("tool_name", ""))
+
+    def conditional_headers(self, entry: Dict[str, Any]) -> Dict[str, str]:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(
+        self,
+        key: str,
+        tool_name: str,
+        endpoint: str,
+        meta: Dict[str, Any],
+        body_src: str | None = None,
+        etag: str | None = None,
+        last_modified: str | None = None
+    ) -> None:
+        """
+        Store `meta` (the record sidecar) and, when given, a copy of the
+        gzip body at `body_src`. Passing body_src=None keeps an existing blob.
+        """
+        entry = {
+            "tool_name": tool_name,
+            "endpoint": normalize_endpoint(endpoint),
+            "stored_at": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "meta": meta,
+        }
+        with self._lock:
+            blob = self.body_path(key)
+            if body_src:
+                copy_file_atomic(body_src, blob)
+            path = self._path(key)
+            write_json_atomic(path, entry, indent=None)
+            size = os.path.getsize(path) + (os.path.getsize(blob) if os.path.exists(blob) else 0)
+            self._bytes -= self._lru.pop(key, 0)
+            self._lru[key] = size
+            self._bytes += size
+            self.counters["stores"] += 1
+            self._evict()
+
+    def touch(self, key: str, entry: Dict[str, Any]) -> None:
+        """Reset the age of an entry after a 304 Not Modified."""
+        self.counters["revalidated"] += 1
+        self.put(key, entry["tool_name"], entry["endpoint"], entry["meta"],
+                 etag=entry.get("etag"), last_modified=entry.get("last_modified"))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"] + self.counters["stale"]
+            return {
+                **self.counters,
+                "entries": len(self._lru),
+                "bytes": self._bytes,
+                "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._lru):
+                self._drop(key)
+
+    # ------------------------------------------------------------------ #
+    # helpers
+    # ------------------------------------------------------------------ #
+    def body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.body.gz")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_existing(self) -> None:
+        # rebuild the LRU order from file mtimes so it survives restarts
+        found = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-len(".json")]
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            blob = self.body_path(key)
+            size = stat.st_size + (os.path.getsize(blob) if os.path.exists(blob) else 0)
+            found.append((stat.st_mtime, key, size))
+        for _, key, size in sorted(found):
+            self._lru[key] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._lru and (len(self._lru) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._lru))
+            self._drop(key)
+            self.counters["evictions"] += 1
+
+    def _drop(self, key: str) -> None:
+        self._bytes -= self._lru.pop(key, 0)
+        for path in (self._path(key), self.body_path(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,192 @@
+# scheduler.py
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Tuple, Callable
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until_token(self) -> float:
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def take(self) -> None:
+        self._refill()
+        self.tokens -= 1
+
+    def try_take(self) -> float:
+        """Take a token if one is free and return 0, else return seconds until one is."""
+        delay = self.time_until_token()
+        if delay <= 0:
+            self.take()
+        return delay
+
+
+class _DomainState:
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.queues: Dict[str, deque] = {}    # user_id -> waiting tickets (FIFO)
+        self.rotation: deque = deque()        # users with waiters, round-robin order
+        self.granted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def head(self):
+        return self.queues[self.rotation[0]][0] if self.rotation else None
+
+    def depth(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+
+class PolitenessScheduler:
+    """
+    Per-target-domain rate limiter shared by every ToolExecutor in the process.
+
+    Each domain (taken from the `url=` parameter of an endpoint) owns a token
+    bucket. Callers block in `acquire()` until a token is free; waiters are
+    served round-robin across user_ids, so one user's 50-link batch cannot
+    starve another user's single request. Subdomains use the limit of the
+    closest configured parent domain (en.wikipedia.org → wikipedia.org).
+
+    Buckets live in the process by default. Several worker processes (or
+    machines) crawling for the same deployment must share them, or each
+    host would see N × its limit: pass a `bucket_factory` such as
+    executor.job_queue.SharedTokenBucket, which keeps the bucket state in
+    the queue's SQLite DB (the crawl queue workers do this).
+
+    Usage:
+        scheduler = PolitenessScheduler(limits={"github.com": (1.0, 2)})
+        waited = scheduler.acquire("github.com", user_id="001")
+        scheduler.stats()["github.com"]["queue_depth"]
+    """
+
+    # domain -> (tokens per second, burst)
+    DEFAULT_LIMITS: Dict[str, Tuple[float, float]] = {
+        "youtube.com": (2.0, 4),
+        "x.com": (1.0, 2),
+        "github.com": (2.0, 4),
+        "linkedin.com": (0.5, 1),
+        "instagram.com": (0.5, 1),
+    }
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[float, float]] | None = None,
+        default_rate: float = 4.0,
+        default_burst: float = 8,
+        bucket_factory: Callable[[str, float, float], Any] | None = None
+    ):
+        self.limits = {**self.DEFAULT_LIMITS, **(limits or {})}
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        # (domain, rate, burst) -> bucket with rate / burst attributes and try_take()
+        self.bucket_factory = bucket_factory or (lambda domain, rate, burst: TokenBucket(rate, burst))
+        self._cond = threading.Condition()
+        self._domains: Dict[str, _DomainState] = {}
+
+    def limit_for(self, domain: str) -> Tuple[float, float]:
+        parts = domain.split(".")
+        for i in range(len(parts) - 1):
+            suffix = ".".join(parts[i:])
+            if suffix in self.limits:
+                return self.limits[suffix]
+        return self.default_rate, self.default_burst
+
+    def set_limit(self, domain: str, rate: float, burst: float) -> None:
+        with self._cond:
+            self.limits[domain] = (rate, burst)
+            for name, state in self._domains.items():
+                if self.limit_for(name) == (rate, burst):
+                    state.bucket.rate, state.bucket.burst = rate, max(1.0, burst)
+            self._cond.notify_all()
+
+    def acquire(self, domain: str, user_id: str = "default", timeout: float | None = None) -> float:
+        """
+        Block until a request to `domain` may be sent. Returns seconds waited.
+        Raises TimeoutError if `timeout` elapses first.
+        """
+        domain = (domain or "").lower()
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        ticket = object()
+
+        with self._cond:
+            state = self._domains.get(domain)
+            if state is None:
+                state = self._domains[domain] = _DomainState(self.bucket_factory(domain, *self.limit_for(domain)))
+            state.queues.setdefault(user_id, deque()).append(ticket)
+            if user_id not in state.rotation:
+                state.rotation.append(user_id)
+
+            try:
+                while True:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"Timed out waiting for a {domain} slot")
+                    if state.head() is ticket:
+                        # one atomic step, so a shared bucket cannot be raced by other processes
+                        delay = state.bucket.try_take()
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay if remaining is None else min(delay, remaining))
+                    else:
+                        self._cond.wait(remaining)
+            except BaseException:
+                self._remove(state, user_id, ticket)
+                self._cond.notify_all()
+                raise
+
+            self._remove(state, user_id, ticket)
+            # the served user goes to the back of the rotation
+            if user_id in state.rotation and state.rotation[0] == user_id:
+                state.rotation.rotate(-1)
+            waited = time.monotonic() - started
+            state.granted += 1
+            state.total_wait += waited
+            state.max_wait = max(state.max_wait, waited)
+            self._cond.notify_all()
+            return waited
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._cond:
+            return {
+                domain: {
+                    "rate": state.bucket.rate,
+                    "burst": state.bucket.burst,
+                    "queue_depth": state.depth(),
+                    "waiting_by_user": {u: len(q) for u, q in state.queues.items() if q},
+                    "granted": state.granted,
+                    "avg_wait_s": round(state.total_wait / state.granted, 4) if state.granted else 0.0,
+                    "max_wait_s": round(state.max_wait, 4),
+                }
+                for domain, state in self._domains.items()
+            }
+
+    @staticmethod
+    def _remove(state: _DomainState, user_id: str, ticket: object) -> None:
+        queue = state.queues.get(user_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+        if not queue:
+            state.queues.pop(user_id, None)
+            if user_id in state.rotation:
+                state.rotation.remove(user_id)
+
+
+# one scheduler per process so concurrent users share the same buckets
+default_scheduler = PolitenessScheduler()
@@ -1,15 +1,29 @@
 # tool_executor.py
-import sys
 import os
 import json
 import uuid
+import time
+import random
+import threading
 import requests
-from typing import List, Dict, Any
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse, parse_qs
+from typing import List, Dict, Any, Iterable
 from dotenv import load_dotenv
 
+from executor import crawl_store
+from executor.link_index import LinkIndex
+from executor.response_cache import ResponseCache, normalize_endpoint
+from executor.scheduler import PolitenessScheduler, default_scheduler
+from executor.resilience import BackendHealth, CircuitOpenError, default_health
+from utils.url_canon import canonicalize_url
+
 load_dotenv()
 BACKEND_URL = os.getenv("BACKEND_URL")
 dirname = os.path.dirname(__file__)
+default_cache_dir = os.path.join(dirname, "..", "data/cache/http")
 
 
 class ToolExecutor:
@@ -19,11 +33,26 @@ class ToolExecutor:
 
     Workflow per item:
       1. Validate the tool_name and HTTP method.
-      2. Ensure user folder exists and load/update link_index.json (mapping link_id ↔ link).
+      2. Ensure user folder exists and assign link_ids through LinkIndex; new IDs
+         are flushed to link_index.json once per batch.
       3. Build the request URL: {backend_url}/{tool_name}{endpoint}.
-      4. Perform HTTP GET.
-      5. Save raw JSON response (or error info) to {user_folder}/{link_id}.json.
-      6. Collect and return a summary record per link.
+      4. Serve fresh (tool, endpoint) responses from the ResponseCache, revalidating
+         stale ones with ETag / Last-Modified; otherwise perform HTTP GET over a pooled keep-alive session, retrying 429/5xx
+         and connection errors with jittered exponential backoff (Retry-After wins).
+      5. Stream the raw response body, gzip-compressed and capped at max_body_bytes,
+         to {user_folder}/{link_id}.body.gz with a {link_id}.json metadata sidecar
+         (or error info in {link_id}.json). Read it back with crawl_store.load_record.
+      6. Collect and return a summary record per link. Duplicate (tool, canonical
+         url, parameters) items in one batch are fetched once and the result fanned out.
+
+    Items run on a bounded thread pool: at most `max_workers` requests are in
+    flight overall and at most `per_host_limit` per target host (the host of
+    the `url=` parameter inside the endpoint). Results keep the input order.
+    Request rate per target domain is limited by the shared PolitenessScheduler
+    (token bucket per domain, round-robin across users). A shared BackendHealth
+    keeps a circuit breaker and latency percentiles per tool: timeouts adapt to
+    observed p99 latency and calls fail fast while a breaker is open
+    (see health_snapshot()).
     """
 
     VALID_TOOLS = {
@@ -31,10 +60,29 @@ class ToolExecutor:
         "crawl_external_content": ["GET"],
     }
 
+    # responses worth another attempt; anything else is returned as-is
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+    # target site throttling us: retried, but not a backend failure for the breaker
+    THROTTLE_STATUS = {429}
+
     def __init__(
         self,
         user_id: str = "001",
-        backend_url: str = BACKEND_URL
+        backend_url: str = BACKEND_URL,
+        max_workers: int = 8,
+        per_host_limit: int = 2,
+        pool_size: int = 16,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        request_timeout: float = 30,
+        response_cache: ResponseCache | None = None,
+        use_cache: bool = True,
+        max_body_bytes: int = 8 * 1024 * 1024,
+        chunk_size: int = 64 * 1024,
+        scheduler: PolitenessScheduler | None = default_scheduler,
+        health: BackendHealth | None = default_health,
+        hedge_tools: List[str] | None = None
     ):
         self.user_id = user_id
         self.backend_url = backend_url.rstrip("/")
@@ -43,33 +91,404 @@ class ToolExecutor:
         self.index_path = os.path.join(self.user_folder, "link_index.json")
         self._load_or_init_index()
 
+        # concurrency limits
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self._locks_guard = threading.Lock()
+        self._host_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._file_locks: Dict[str, threading.Lock] = {}
+
+        # pooled keep-alive session shared by all worker threads
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_timeout = request_timeout
+        self.session = self._build_session(pool_size)
+
+        # response bodies are streamed to gzip files, capped at max_body_bytes
+        self.max_body_bytes = max_body_bytes
+        self.chunk_size = chunk_size
+
+        # per-domain token buckets shared with other executors (None disables)
+        self.scheduler = scheduler
+
+        # per-tool circuit breakers / adaptive timeouts (None disables);
+        # hedging is opt-in per tool because it can double backend load
+        self.health = health
+        self.hedge_tools = set(hedge_tools or [])
+
+        # (tool_name, endpoint) response cache; shared across users
+        if response_cache is None and use_cache:
+            response_cache = ResponseCache(default_cache_dir)
+        self.response_cache = response_cache if use_cache else None
+
+    @staticmethod
+    def _build_session(pool_size: int) -> requests.Session:
+        session = requests.Session()
+        # retries are handled in _get_with_retry so every attempt can be timed
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"Connection": "keep-alive"})
+        return session
+
+    def close(self) -> None:
+        """Release pooled connections."""
+        self.session.close()
+
+    def health_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Circuit-breaker state, latency percentiles/histogram and current timeout per tool."""
+        if self.health is None:
+            return {}
+        snapshot = self.health.snapshot(list(self.VALID_TOOLS))
+        for tool, info in snapshot.items():
+            info["timeout_s"] = round(self.health.timeout_for(tool, self.request_timeout), 2)
+        return snapshot
+
     def _load_or_init_index(self) -> None:
-        if os.path.exists(self.index_path):
-            with open(self.index_path, "r", encoding="utf-8") as f:
-                self.link_index: Dict[str, str] = json.load(f)
-        else:
-            self.link_index = {}
-            with open(self.index_path, "w", encoding="utf-8") as f:
-                json.dump(self.link_index, f, indent=2)
+        self.link_index = LinkIndex(self.index_path)
 
     def _get_or_create_link_id(self, link: str) -> str:
-        # reuse existing ID if link is already indexed
-        for lid, lnk in self.link_index.items():
-            if lnk == link:
-                return lid
-        # else generate new
-        new_id = uuid.uuid4().hex
-        self.link_index[new_id] = link
-        with open(self.index_path, "w", encoding="utf-8") as f:
-            json.dump(self.link_index, f, indent=2)
-        return new_id
+        # O(1) lookup; new IDs stay pending until the batch flush in execute()
+        return self.link_index.get_or_create(link)
+
+    def _retry_delay(self, attempt: int, resp: requests.Response | None) -> float:
+        """Seconds to wait before the next attempt: Retry-After if given, else full-jitter backoff."""
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after:
+            try:
+                return min(self.backoff_max, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                    return min(self.backoff_max, max(0.0, delay))
+                except (TypeError, ValueError):
+                    pass
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, cap)
+
+    def _send(
+        self,
+        url: str,
+        headers: Dict[str, str] | None,
+        timeout: float,
+        tool: str | None,
+        domain: str | None = None
+    ) -> tuple[requests.Response, bool]:
+        """
+        One GET. For tools in `hedge_tools`, if no response arrives within the
+        tool's p95 latency a duplicate request is fired and whichever answers
+        first wins; the loser is closed. The duplicate fetches the target
+        again, so it needs its own politeness token for `domain`; if none is
+        free within another p95, no hedge is sent. Returns (response, hedged).
+        """
+        def _get() -> requests.Response:
+            return self.session.get(url, headers=headers, timeout=timeout, stream=True)
+
+        hedge_after = self.health.hedge_delay(tool) if self.health and tool in self.hedge_tools else None
+        if hedge_after is None:
+            return _get(), False
+
+        pool = ThreadPoolExecutor(max_workers=2)
+        try:
+            first = pool.submit(_get)
+            done, _ = wait([first], timeout=hedge_after)
+            if done:
+                return first.result(), False
+            if self.scheduler is not None and domain:
+                try:
+                    self.scheduler.acquire(domain, user_id=self.user_id, timeout=hedge_after)
+                except TimeoutError:
+                    return first.result(), False
+                if first.done():
+                    # answered while we waited for the token; the token is spent, not the request
+                    return first.result(), False
+
+            pending = {first, pool.submit(_get)}
+            error: Exception | None = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    if fut.exception() is None:
+                        # close whichever copy finishes later
+                        for other in pending:
+                            other.add_done_callback(
+                                lambda f: f.result().close() if f.exception() is None else None
+                            )
+                        return fut.result(), True
+                    error = fut.exception()
+            raise error
+        finally:
+            pool.shutdown(wait=False)
+
+    def _get_with_retry(
+        self,
+        url: str,
+        headers: Dict[str, str] | None = None,
+        domain: str | None = None,
+        tool: str | None = None
+    ) -> tuple[requests.Response | None, List[Dict[str, Any]], Exception | None]:
+        """
+        GET `url` through the pooled session, retrying transient failures
+        (connection errors, timeouts, RETRY_STATUS responses).
+
+        Every attempt is refused immediately while the circuit breaker for
+        `tool` is open, then takes a token for `domain` from the politeness
+        scheduler, and uses the tool's adaptive timeout (hedged for
+        `hedge_tools`). Responses are opened with stream=True; the caller
+        reads and closes the returned one. Timings cover the time to
+        response headers.
+
+        Returns (last response or None, per-attempt timings, last exception or None).
+        """
+        attempts: List[Dict[str, Any]] = []
+        resp: requests.Response | None = None
+        error: Exception | None = None
+
+        for attempt in range(self.max_retries + 1):
+            if self.health is not None and tool and not self.health.allow(tool):
+                # fail fast instead of waiting out a timeout on a sick backend
+                error = CircuitOpenError(f"Circuit open for {tool}")
+                attempts.append({
+                    "attempt": attempt + 1,
+                    "status_code": None,
+                    "elapsed_ms": 0.0,
+                    "queued_ms": 0.0,
+                    "error": str(error)
+                })
+                return None, attempts, error
+
+            queued_ms = 0.0
+            if self.scheduler is not None and domain:
+                queued_ms = round(self.scheduler.acquire(domain, user_id=self.user_id) * 1000, 1)
+            timeout = self.health.timeout_for(tool, self.request_timeout) if self.health and tool else self.request_timeout
+            started = time.perf_counter()
+            resp, error, hedged = None, None, False
+            try:
+                resp, hedged = self._send(url, headers, timeout, tool, domain)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except Exception as e:
+                # not transient – give up straight away
+                if self.health is not None and tool:
+                    self.health.record(tool, False)
+                attempts.append({
+                    "attempt": attempt + 1,
+                    "status_code": None,
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "queued_ms": queued_ms,
+                    "timeout_s": round(timeout, 2),
+                    "error": str(e)
+                })
+                return None, attempts, e
+            elapsed = time.perf_counter() - started
+
+            transient = error is not None or resp.status_code in self.RETRY_STATUS
+            if self.health is not None and tool:
+                # only backend-side failures count towards the breaker: a
+                # target site's 429 must not open the tool for every host
+                backend_failed = transient and not (error is None and resp.status_code in self.THROTTLE_STATUS)
+                # timeouts count as latency samples so the timeout can grow back
+                timed_out = isinstance(error, requests.Timeout)
+                self.health.record(tool, not backend_failed, elapsed if error is None or timed_out else None)
+
+            attempts.append({
+                "attempt": attempt + 1,
+                "status_code": resp.status_code if resp is not None else None,
+                "elapsed_ms": round(elapsed * 1000, 1),
+                "queued_ms": queued_ms,
+                "timeout_s": round(timeout, 2),
+                "hedged": hedged,
+                "error": str(error) if error else None
+            })
+
+            if not transient or attempt == self.max_retries:
+                break
+            if resp is not None:
+                resp.close()
+            time.sleep(self._retry_delay(attempt, resp))
+
+        return resp, attempts, error
+
+    def _target_host(self, endpoint: str) -> str:
+        """Host of the `url=` parameter inside the endpoint (backend host if absent)."""
+        query = endpoint.split("?", 1)[1] if "?" in endpoint else endpoint
+        targets = parse_qs(query).get("url")
+        host = urlparse(canonicalize_url(targets[0])).hostname if targets else None
+        return (host or urlparse(self.backend_url).hostname or "").lower()
+
+    def _host_semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._locks_guard:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_semaphores[host]
+
+    def _file_lock(self, link_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._file_locks.setdefault(link_id, threading.Lock())
+
+    def _validate(self, tool: str | None) -> str | None:
+        """Return an error message if `tool` cannot be executed, else None."""
+        if tool not in self.VALID_TOOLS:
+            return f"Invalid tool: {tool}"
+        if "GET" not in self.VALID_TOOLS[tool]:
+            return f"Unsupported HTTP method for {tool}"
+        return None
+
+    def _assign_link_ids(self, items: List[Dict[str, Any]]) -> List[str | Exception | None]:
+        """
+        Resolve a link_id (or the indexing error) for every executable item and
+        persist new IDs with a single flush.
+        """
+        link_ids: List[str | Exception | None] = []
+        for item in items:
+            if self._validate(item.get("tool_name")):
+                link_ids.append(None)
+                continue
+            try:
+                link_ids.append(self._get_or_create_link_id(item.get("link")))
+            except Exception as e:
+                link_ids.append(e)
+        try:
+            remap = self.link_index.flush()
+        except Exception as e:
+            return [e if isinstance(lid, str) else lid for lid in link_ids]
+        return [remap.get(lid, lid) if isinstance(lid, str) else lid for lid in link_ids]
+
+    def _fetch(self, tool: str, endpoint: str, link_id: str, record: Dict[str, Any]) -> str:
+        """
+        Serve one call from the response cache or the backend and store the
+        result for `link_id` (see executor.crawl_store for the layout).
+        Fills status_code / error / attempts / cache / truncated on `record`
+        and returns the sidecar path.
+        """
+        cache = self.response_cache
+        cache_key = cache.key(tool, endpoint) if cache else None
+        entry = cache.get(cache_key) if cache else None
+        if entry and cache.is_fresh(entry):
+            record["cache"] = "hit"
+            saved = self._save_cached(entry, cache_key, link_id, record)
+            if saved:
+                return saved
+            entry = None             # blob evicted since the lookup: fetch for real
+
+        headers = cache.conditional_headers(entry) if entry else None
+        record["cache"] = "stale" if entry else ("miss" if cache else None)
+
+        # bounded per target host
+        url = f"{self.backend_url}/{tool}{endpoint}"
+        host = self._target_host(endpoint)
+        with self._host_semaphore(host):
+            resp, attempts, error = self._get_with_retry(url, headers=headers, domain=host, tool=tool)
+        record["attempts"] = attempts
+
+        if entry and resp is not None and resp.status_code == 304:
+            resp.close()
+            saved = self._save_cached(entry, cache_key, link_id, record)
+            if saved:
+                cache.touch(cache_key, entry)
+                record["cache"] = "revalidated"
+                return saved
+            # the cached body is gone: ask again without the validators
+            record["cache"] = "miss"
+            with self._host_semaphore(host):
+                resp, attempts, error = self._get_with_retry(url, domain=host, tool=tool)
+            record["attempts"] = record["attempts"] + attempts
+
+        if resp is None:
+            record["error"] = f"Request failed: {error}"
+            with self._file_lock(link_id):
+                return crawl_store.save_record(self.user_folder, link_id, {"error": str(error)})
+
+        # stream the body straight into a compressed temp file
+        tmp_body = os.path.join(self.user_folder, f"{link_id}.{uuid.uuid4().hex}.tmp.gz")
+        try:
+            with resp:
+                stored = crawl_store.stream_to_gzip(
+                    resp.iter_content(chunk_size=self.chunk_size), tmp_body, self.max_body_bytes
+                )
+            meta = {
+                "status_code": resp.status_code,
+                "content_type": resp.headers.get("Content-Type", ""),
+                "max_body_bytes": self.max_body_bytes,
+                **stored,
+            }
+            record["status_code"] = resp.status_code
+            record["truncated"] = stored["truncated"]
+            if cache and resp.status_code == 200:
+                cache.put(cache_key, tool, endpoint, meta, body_src=tmp_body,
+                          etag=resp.headers.get("ETag"),
+                          last_modified=resp.headers.get("Last-Modified"))
+            with self._file_lock(link_id):
+                return crawl_store.save_record(self.user_folder, link_id, meta, body_src=tmp_body)
+        except Exception as e:
+            record["status_code"] = None
+            record["error"] = f"Request failed: {e}"
+            with self._file_lock(link_id):
+                return crawl_store.save_record(self.user_folder, link_id, {"error": str(e)})
+        finally:
+            if os.path.exists(tmp_body):
+                os.remove(tmp_body)
+
+    def _save_cached(self, entry: Dict[str, Any], cache_key: str, link_id: str, record: Dict[str, Any]) -> str | None:
+        """Write the cached response for `link_id`; None if its body blob is no longer there."""
+        meta = entry["meta"]
+        blob = self.response_cache.body_path(cache_key)
+        with self._file_lock(link_id):
+            try:
+                path = crawl_store.save_record(self.user_folder, link_id, meta, body_src=blob, move=False)
+            except FileNotFoundError:
+                return None
+        record["status_code"] = meta.get("status_code")
+        record["truncated"] = meta.get("truncated", False)
+        return path
+
+    def _execute_item(self, item: Dict[str, Any], link_id: str | Exception | None = None) -> Dict[str, Any]:
+        link       = item.get("link")
+        tool       = item.get("tool_name")
+        endpoint   = item.get("parameters", {}).get("endpoint", "")
+        record: Dict[str, Any] = {
+            "link": link,
+            "tool": tool,
+            "link_id": None,
+            "status_code": None,
+            "error": None,
+            "output_file": None,
+            "attempts": [],
+            "cache": None,
+            "truncated": False
+        }
+
+        # 1. Validate tool and method
+        error = self._validate(tool)
+        if error:
+            record["error"] = error
+            return record
+
+        # 2. link_id comes from the batch assignment in execute()
+        if link_id is None:
+            link_id = self._assign_link_ids([item])[0]
+        if isinstance(link_id, Exception):
+            record["error"] = f"Indexing error: {link_id}"
+            return record
+        record["link_id"] = link_id
+
+        # 3. Serve from cache or perform HTTP request; 4. stream to disk
+        try:
+            record["output_file"] = self._fetch(tool, endpoint, link_id, record)
+        except Exception as e:
+            record["error"] = f"Write error: {e}"
+
+        return record
 
     def execute(
         self,
-        items: List[Dict[str, Any]]
+        items: List[Dict[str, Any]],
+        concurrent: bool = True
     ) -> List[Dict[str, Any]]:
         """
-        Process each tool-instruction item and return a list of result records.
+        Process each tool-instruction item and return a list of result records,
+        in the same order as `items`.
 
         items: [
           {
@@ -80,69 +499,86 @@ class ToolExecutor:
           },
           ...
         ]
-        """
-        results = []
 
-        for item in items:
-            link       = item.get("link")
-            tool       = item.get("tool_name")
-            endpoint   = item.get("parameters", {}).get("endpoint", "")
-            record: Dict[str, Any] = {
-                "link": link,
-                "tool": tool,
-                "link_id": None,
-                "status_code": None,
-                "error": None,
-                "output_file": None
-            }
+        concurrent: run items on the thread pool (False = one at a time).
 
-            # 1. Validate tool and method
-            if tool not in self.VALID_TOOLS:
-                record["error"] = f"Invalid tool: {tool}"
-                results.append(record)
-                continue
+        Items that share (tool_name, canonical link, request parameters) are
+        sent once; the result is copied to every duplicate with its own `link`
+        and `deduplicated: True`.
+        """
+        # collapse duplicate requests
+        unique: List[Dict[str, Any]] = []
+        slot_of: List[int] = []
+        seen: Dict[tuple, int] = {}
+        for item in items:
+            key = self._dedup_key(item)
+            if key not in seen:
+                seen[key] = len(unique)
+                unique.append(item)
+            slot_of.append(seen[key])
 
-            if "GET" not in self.VALID_TOOLS[tool]:
-                record["error"] = f"Unsupported HTTP method for {tool}"
-                results.append(record)
-                continue
+        link_ids = self._assign_link_ids(unique)
 
-            # 2. Assign or create link_id
-            try:
-                link_id = self._get_or_create_link_id(link)
-                record["link_id"] = link_id
-            except Exception as e:
-                record["error"] = f"Indexing error: {e}"
-                results.append(record)
-                continue
+        if not concurrent or len(unique) <= 1:
+            unique_results = [self._execute_item(item, lid) for item, lid in zip(unique, link_ids)]
+        else:
+            workers = min(self.max_workers, len(unique))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                unique_results = list(pool.map(self._execute_item, unique, link_ids))
 
-            # 3. Build and perform HTTP request
-            url = f"{self.backend_url}/{tool}{endpoint}"
-            try:
-                resp = requests.get(url, timeout=30)
-                record["status_code"] = resp.status_code
-                data = {
-                    "status_code": resp.status_code,
-                    "body": resp.json() if resp.headers.get("Content-Type", "").startswith("application/json") else resp.text
-                }
-            except Exception as e:
-                record["status_code"] = None
-                data = {
-                    "error": str(e)
-                }
-                record["error"] = f"Request failed: {e}"
+        return self._fan_out(items, slot_of, unique_results)
 
-            # 4. Save to disk
-            out_path = os.path.join(self.user_folder, f"{link_id}.json")
-            try:
-                with open(out_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-                record["output_file"] = out_path
-            except Exception as e:
-                record["error"] = f"Write error: {e}"
+    def execute_iter(self, items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Like execute(), but each item is started on the thread pool as soon as
+        `items` yields it — e.g. straight from ToolSelectorAgent.run_stream —
+        instead of after the whole list is known. Same deduplication and
+        result order; new link IDs are flushed per item rather than per batch.
+        """
+        received: List[Dict[str, Any]] = []
+        slot_of: List[int] = []
+        seen: Dict[tuple, int] = {}
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for item in items:
+                received.append(item)
+                key = self._dedup_key(item)
+                if key not in seen:
+                    seen[key] = len(futures)
+                    link_id = self._assign_link_ids([item])[0]
+                    futures.append(pool.submit(self._execute_item, item, link_id))
+                slot_of.append(seen[key])
+            unique_results = [f.result() for f in futures]
+        return self._fan_out(received, slot_of, unique_results)
 
-            results.append(record)
+    @staticmethod
+    def _dedup_key(item: Dict[str, Any]) -> tuple:
+        """(tool, canonical link, normalized parameters): items differing in e.g. `search=` are both sent."""
+        params = item.get("parameters") or {}
+        endpoint = params.get("endpoint") or ""
+        rest = json.dumps({k: v for k, v in params.items() if k != "endpoint"}, sort_keys=True, default=str)
+        return (
+            item.get("tool_name"),
+            canonicalize_url(item.get("link") or ""),
+            normalize_endpoint(endpoint) if endpoint else "",
+            rest,
+        )
 
+    @staticmethod
+    def _fan_out(
+        items: List[Dict[str, Any]],
+        slot_of: List[int],
+        unique_results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Results back in input order; duplicates get a copy marked deduplicated."""
+        results: List[Dict[str, Any]] = []
+        used = set()
+        for item, slot in zip(items, slot_of):
+            if slot not in used:
+                used.add(slot)
+                results.append(unique_results[slot])
+            else:
+                results.append({**unique_results[slot], "link": item.get("link"), "deduplicated": True})
         return results
 
 
@@ -187,6 +623,7 @@ if __name__ == "__main__":
 
     executor = ToolExecutor(user_id="001")
     summary = executor.execute(example_items)
+    executor.close()
     print(json.dumps(summary, indent=2))
 
     # Expected output:
@@ -198,13 +635,47 @@ if __name__ == "__main__":
     "link_id": "1bc90ff4413c4a6bab8768180b084989",
     "status_code": 200,
     "error": null,
-    "output_file": "/Agent_Crawler/data/user_data/001/1bc90ff4413c4a6bab8768180b084989.json"
+    "output_file": "/Agent_Crawler/data/user_data/001/1bc90ff4413c4a6bab8768180b084989.json",
+    "attempts": [
+      {
+        "attempt": 1,
+        "status_code": 200,
+        "elapsed_ms": 2113.4,
+        "queued_ms": 0.0,
+        "timeout_s": 30,
+        "hedged": false,
+        "error": null
+      }
+    ],
+    "cache": "miss",
+    "truncated": false
   }
 ]
 '''
+    # {link_id}.json sidecar (body lives in {link_id}.body.gz)
     expected_file_saved_output = '''
 {
   "status_code": 200,
+  "content_type": "application/json",
+  "max_body_bytes": 8388608,
+  "raw_bytes": 612,
+  "truncated": false,
+  "body_file": "1bc90ff4413c4a6bab8768180b084989.body.gz",
+  "compression": "gzip",
+  "stored_bytes": 402
+}
+'''
+    # crawl_store.load_record(executor.user_folder, link_id)
+    expected_loaded_record = '''
+{
+  "status_code": 200,
+  "content_type": "application/json",
+  "max_body_bytes": 8388608,
+  "raw_bytes": 612,
+  "truncated": false,
+  "body_file": "1bc90ff4413c4a6bab8768180b084989.body.gz",
+  "compression": "gzip",
+  "stored_bytes": 402,
   "body": {
     "content": "let's look at how to check color contrast in figma first I'll right click and open the start plugin I'll click on contrast first I'll select a layer to check against and as you can see here it fails most contrast ratios if I select the layer on the bottom you'll see that it passes if you're not passing contrast ratios Stark will suggest Alternatives that will pass and you can apply those with the premium version",
     "description": "",
@@ -5,14 +5,21 @@ main.py: Entry point for the Intelligent Agent Crawler CLI application.
 import os
 import sys
 import json
+import asyncio
+from typing import Iterable
 from dotenv import load_dotenv
 from agents.query_handler import QueryHandlerAgent
 from agents.clarifier import ClarifierAgent
 from agents.tool_selector import ToolSelectorAgent
 from agents.info_retriever import InfoRetrieverAgent
+from agents.base_agent import LLM_MAX_CONCURRENCY
+from agents.llm_metrics import default_llm_metrics, format_summary
 from executor.tool_executor import ToolExecutor
+from executor.job_queue import CrawlQueue
+from executor.knowledge_store import KnowledgeStore, migrate as migrate_knowledge_base
 
 from utils.workspace_ui import WorkspaceDashboard
+from utils.url_canon import canonicalize_url
 
 dirname = os.path.dirname(__file__)
 profiles_data_path = os.path.join(dirname, "data/profiles")
@@ -36,29 +43,29 @@ def save_feedback(feedback: dict, path: str = "feedback_info.json"):
     with open(path, "w", encoding="utf-8") as f:
         json.dump(feedback, f, indent=2, ensure_ascii=False)
 
-def append_knowledge(knowledge: any, path: str = "knowledge_base.json"):
-    # Load existing or initialize
-    if os.path.isfile(path):
+def open_knowledge_base(user_data_path: str) -> KnowledgeStore:
+    """The user's append-only knowledge base; a legacy knowledge_base.json is migrated first."""
+    legacy_path = os.path.join(user_data_path, "knowledge_base.json")
+    if os.path.isfile(legacy_path):
         try:
-            with open(path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except json.JSONDecodeError:
-            data = []
-    else:
-        data = []
-    data.append(knowledge)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+            read, kept = migrate_knowledge_base(legacy_path)
+            print(f"Migrated {legacy_path}: {read} items to {kept} entries.")
+        except ValueError as e:
+            # the legacy file stays where it is for a manual look
+            print(f"Knowledge base migration skipped: {e}", file=sys.stderr)
+    return KnowledgeStore(os.path.join(user_data_path, "knowledge_base.jsonl"))
 
 def update_workspace_links(workspace_links: dict, items: list, dashboard: WorkspaceDashboard = None):
     """
-    Merge or add each link_item into workspace_links by URL;
+    Merge or add each link_item into workspace_links by canonical URL
+    (so www./trailing-slash/tracking variants share one entry);
     ensure an 'add_to_db' flag exists.
     """
     for link_item in items:
         url = link_item.get("link")
         if not url:
             continue
+        url = canonicalize_url(url)
         if url not in workspace_links:
             workspace_links[url] = link_item.copy()
             workspace_links[url].setdefault("add_to_db", False)
@@ -70,6 +77,83 @@ def update_workspace_links(workspace_links: dict, items: list, dashboard: Worksp
     return workspace_links
 
 
+async def retrieve_all(
+    agent: InfoRetrieverAgent,
+    records: Iterable[dict],
+    workspace_links: dict,
+    user_profile: dict,
+    timeout: float | None = None,
+    dashboard: WorkspaceDashboard = None
+) -> list:
+    """
+    Run the info retriever over every record. Records are consumed lazily and
+    packed into batches (see InfoRetrieverAgent.iter_batches) so the system
+    prompt, profile and workspace are sent once per batch; each batch is sent
+    as soon as it is formed, and at most 2 × LLM_MAX_CONCURRENCY batches are
+    held in memory at a time. Replies are streamed: each to_knowledge_base
+    entry is merged into workspace_links (and the dashboard) as soon as it is
+    generated. A record the batched reply leaves out is retried on its own.
+    Returns ({"link_id", "url"}, output) pairs in record order; a failed call
+    yields its exception instead of aborting the batch.
+    """
+    snapshot = dict(workspace_links)
+    in_flight = asyncio.Semaphore(2 * LLM_MAX_CONCURRENCY)
+
+    def _merge(output: dict) -> None:
+        for item in output.get("to_knowledge_base") or []:
+            update_workspace_links(workspace_links, [item], dashboard)
+
+    async def _retrieve(rec: dict) -> dict:
+        stream = agent.arun_stream(
+            workspace_data=snapshot,
+            retrieved_context=rec,
+            user_profile=user_profile,
+            timeout=timeout
+        )
+        async for key, item in stream:
+            if key == "to_knowledge_base":
+                _merge({"to_knowledge_base": [item]})
+        return stream.result
+
+    async def _retrieve_batch(batch: list) -> list:
+        if len(batch) == 1:
+            return [await _retrieve(batch[0])]
+        stream = agent.arun_batch_stream(
+            records=batch,
+            workspace_data=snapshot,
+            user_profile=user_profile,
+            timeout=timeout
+        )
+        async for key, output in stream:
+            if key == "results" and isinstance(output, dict):
+                _merge(output)
+        by_id = stream.result
+        missing = [rec for rec in batch if rec.get("link_id") not in by_id]
+        retried = await asyncio.gather(*(_retrieve(rec) for rec in missing), return_exceptions=True)
+        by_id.update({rec.get("link_id"): out for rec, out in zip(missing, retried)})
+        return [by_id[rec.get("link_id")] for rec in batch]
+
+    async def _run(batch: list) -> list:
+        # only ids are kept once the batch is done, so memory stays flat
+        refs = [{"link_id": rec.get("link_id"), "url": rec.get("url")} for rec in batch]
+        try:
+            outputs = await _retrieve_batch(batch)
+        except Exception as e:
+            # a whole batch that failed fails each of its records
+            outputs = [e] * len(batch)
+        finally:
+            in_flight.release()
+        return list(zip(refs, outputs))
+
+    tasks = []
+    for batch in agent.iter_batches(records):
+        await in_flight.acquire()
+        tasks.append(asyncio.create_task(_run(batch)))
+        await asyncio.sleep(0)        # let the batch start before reading the next records
+    done = await asyncio.gather(*tasks)
+    return [pair for pairs in done for pair in pairs]
+
+
 def print_workspace_status(workspace_links: dict):
     items = list(workspace_links.values())
     print("\n" + "=" * 60)
@@ -95,134 +179,189 @@ def main():
     user_profile = load_user_profile(user_id)
     
     user_data_path = os.path.join(all_user_data_path, user_id)
-    knowledge_base_path = os.path.join(user_data_path, "knowledge_base.json")
+    knowledge_base = open_knowledge_base(user_data_path)
 
     qh_agent = QueryHandlerAgent()
     clarifier_agent = ClarifierAgent()
     tool_selector_agent = ToolSelectorAgent()
+    # keeps a watermark of processed crawl records under user_data_path
+    info_retriever_agent = InfoRetrieverAgent(user_root=user_data_path)
 
     dashboard = WorkspaceDashboard(ui_dir='ui', port=8000)
     
 
-    # Tool executor for backend calls
+    # Tool executor for backend calls; with CRAWL_QUEUE_DB set, crawls are
+    # handed to `python -m executor.job_queue` workers instead of run inline
     executor = ToolExecutor(user_id=user_id)
+    crawl_queue_db = os.getenv("CRAWL_QUEUE_DB")
+    crawl_queue = CrawlQueue(crawl_queue_db) if crawl_queue_db else None
 
     workspace_links: dict = {}
 
     # Main interaction loop
 
     ir_output = None
-    while True:
-        if workspace_links and all(v.get("add_to_db") is True for v in workspace_links.values()):
-            print("+" * 60)
-            user_input = input("All links are added. Type 'END' to exit or press Enter to continue: ").strip()
-        else:
-            user_input = input("\nYour query> ").strip()
-        
-        if user_input.upper() == "END":
-            print("Goodbye!")
-            break
-
-        # 1. Primary query handling
-        qh_output = qh_agent.run(
-            user_query=user_input,
-            user_profile=user_profile
-        )
-        
-        # Merge any new 'links' from QH
-        if qh_output.get("links"):
-            workspace_links = update_workspace_links(workspace_links, qh_output["links"], dashboard)
-            print_workspace_status(workspace_links)
-            # If all links are flagged added, offer to exit
-            # test_add_to_db = workspace_links.values()
-            # for test in test_add_to_db:
-            #         test_instance = test.get("add_to_db")
+    try:
+        while True:
+            # LLM time / tokens / cost of the turn that just finished
+            if default_llm_metrics.turn:
+                print(format_summary(default_llm_metrics.turn_summary()))
 
             if workspace_links and all(v.get("add_to_db") is True for v in workspace_links.values()):
-                choice = input("All links are added. Type 'END' to exit or press Enter to continue: ").strip()
-                if choice.upper() == "END":
-                    print("Goodbye!")
-                    break
-
-        # 2. Clarification step
-        if qh_output.get("to_clarifier"):
-            clar_in = {"to_clarifier": qh_output["to_clarifier"]}
-            clar_output = clarifier_agent.run(
-                links_payload=clar_in,
-                user_profile=user_profile
-            )
-            if clar_output.get("clarified_links"):
-                clarified_links = clar_output["clarified_links"]
-                workspace_links = update_workspace_links(workspace_links, clarified_links, dashboard)
-                
-            print("Clarifier action required:")
-            if clar_output.get("to_user") and dashboard:
-                dashboard.update(workspace_links, clar_output["to_user"])
-                
-            print(json.dumps(clar_output, indent=2))
-            print_workspace_status(workspace_links)
-            continue
+                print("+" * 60)
+                user_input = input("All links are added. Type 'END' to exit or press Enter to continue: ").strip()
+            else:
+                user_input = input("\nYour query> ").strip()
+        
+            if user_input.upper() == "END":
+                print("Goodbye!")
+                break
+            default_llm_metrics.begin_turn()
 
-        # 3. Tool selection and execution
-        if qh_output.get("to_tool_selector"):
-            ts_input = {"to_tool_selector": qh_output["to_tool_selector"]}
-            ts_output = tool_selector_agent.run(
-                to_tool_selector=ts_input,
+            # 1. Primary query handling; each new link is merged into the
+            #    workspace (and dashboard) as soon as the model has written it
+            #    (an unrecoverable reply only costs this turn, not the session)
+            qh_stream = qh_agent.run_stream(
+                user_query=user_input,
                 user_profile=user_profile
             )
-            print("Tool Selector output:")
-            ts_output_results = ts_output.get("results", [])
-            print(json.dumps(ts_output, indent=2))
+            try:
+                for key, link_item in qh_stream:
+                    if key == "links":
+                        workspace_links = update_workspace_links(workspace_links, [link_item], dashboard)
+            except ValueError as e:
+                print(f"Query handler failed: {e}", file=sys.stderr)
+                continue
+            qh_output = qh_stream.result
 
-            exec_results = executor.execute(ts_output_results)
-            print("Tool Executor results:")
-            print(json.dumps(exec_results, indent=2))
+            if qh_output.get("links"):
+                print_workspace_status(workspace_links)
+                # If all links are flagged added, offer to exit
+                # test_add_to_db = workspace_links.values()
+                # for test in test_add_to_db:
+                #         test_instance = test.get("add_to_db")
 
+                if workspace_links and all(v.get("add_to_db") is True for v in workspace_links.values()):
+                    choice = input("All links are added. Type 'END' to exit or press Enter to continue: ").strip()
+                    if choice.upper() == "END":
+                        print("Goodbye!")
+                        break
 
-        # 4. Retrieve external/context data
-        info_retriever_agent = InfoRetrieverAgent(user_root=user_data_path)
-        for rec in info_retriever_agent.get_retrieved_data():
-            ir_output = info_retriever_agent.run(
-                workspace_data=workspace_links,
-                retrieved_context=rec,
-                user_profile=user_profile
-            )
-            print("Info Retriever output:")
-            print(json.dumps(ir_output, indent=2))
-
-            if ir_output.get("to_knowledge_base"):
-                knowledge_to_add = ir_output["to_knowledge_base"]
-                workspace_links = update_workspace_links(workspace_links, knowledge_to_add, dashboard)
-                append_knowledge(knowledge_to_add, knowledge_base_path)
-                print("Knowledge base updated.")
-                print(knowledge_to_add)
-            if ir_output.get("to_clarifier"):
-                clar_output = clarifier_agent.run(
-                    links_payload={"to_clarifier": ir_output["to_clarifier"]},
-                    user_profile=user_profile
-                )
+            # 2. Clarification step
+            if qh_output.get("to_clarifier"):
+                clar_in = {"to_clarifier": qh_output["to_clarifier"]}
+                try:
+                    clar_output = clarifier_agent.run(
+                        links_payload=clar_in,
+                        user_profile=user_profile
+                    )
+                except ValueError as e:
+                    print(f"Clarifier failed: {e}", file=sys.stderr)
+                    continue
                 if clar_output.get("clarified_links"):
                     clarified_links = clar_output["clarified_links"]
                     workspace_links = update_workspace_links(workspace_links, clarified_links, dashboard)
-                    print_workspace_status(workspace_links)
-                print("Clarifier output:")
+                
+                print("Clarifier action required:")
+                if clar_output.get("to_user") and dashboard:
+                    dashboard.update(workspace_links, clar_output["to_user"])
+                
                 print(json.dumps(clar_output, indent=2))
+                print_workspace_status(workspace_links)
                 continue
 
+            # 3. Tool selection and execution
+            if qh_output.get("to_tool_selector"):
+                ts_input = {"to_tool_selector": qh_output["to_tool_selector"]}
+                ts_stream = tool_selector_agent.run_stream(
+                    to_tool_selector=ts_input,
+                    user_profile=user_profile
+                )
+                # crawl instructions are dispatched while the rest are still generated
+                ts_items = (item for key, item in ts_stream if key == "results")
+
+                try:
+                    if crawl_queue:
+                        job_ids = [job_id for item in ts_items for job_id in crawl_queue.enqueue(user_id, [item])]
+                        exec_results = None
+                    else:
+                        exec_results = executor.execute_iter(ts_items)
+                except ValueError as e:
+                    # crawls already dispatched are on disk; step 4 still picks them up
+                    print(f"Tool selector failed: {e}", file=sys.stderr)
+                    exec_results, job_ids = [], []
+
+                print("Tool Selector output:")
+                print(json.dumps(ts_stream.result, indent=2))
+                if exec_results is None:
+                    print(f"Queued {len(job_ids)} crawl jobs; results are picked up on later turns.")
+                else:
+                    print("Tool Executor results:")
+                    print(json.dumps(exec_results, indent=2))
+
+
+            # 4. Retrieve external/context data: only records that are new or
+            #    changed since an earlier turn processed them
+            info_retriever_agent.refresh()
+            ir_results = asyncio.run(retrieve_all(
+                info_retriever_agent, info_retriever_agent.get_retrieved_data(),
+                workspace_links, user_profile, dashboard=dashboard
+            ))
+            # failed records stay below the watermark and are retried next turn
+            info_retriever_agent.mark_processed(
+                [rec for rec, ir_output in ir_results if not isinstance(ir_output, Exception)]
+            )
+            for rec, ir_output in ir_results:
+                if isinstance(ir_output, Exception):
+                    print(f"Info Retriever failed for {rec.get('url')}: {ir_output}", file=sys.stderr)
+                    ir_output = None
+                    continue
+                print("Info Retriever output:")
+                print(json.dumps(ir_output, indent=2))
+
+                if ir_output.get("to_knowledge_base"):
+                    knowledge_to_add = ir_output["to_knowledge_base"]
+                    workspace_links = update_workspace_links(workspace_links, knowledge_to_add, dashboard)
+                    knowledge_base.append(knowledge_to_add)
+                    print("Knowledge base updated.")
+                    print(knowledge_to_add)
+                if ir_output.get("to_clarifier"):
+                    try:
+                        clar_output = clarifier_agent.run(
+                            links_payload={"to_clarifier": ir_output["to_clarifier"]},
+                            user_profile=user_profile
+                        )
+                    except ValueError as e:
+                        print(f"Clarifier failed: {e}", file=sys.stderr)
+                        continue
+                    if clar_output.get("clarified_links"):
+                        clarified_links = clar_output["clarified_links"]
+                        workspace_links = update_workspace_links(workspace_links, clarified_links, dashboard)
+                        print_workspace_status(workspace_links)
+                    print("Clarifier output:")
+                    print(json.dumps(clar_output, indent=2))
+                    continue
+
 
-        # 5. Direct important info to user
-        if ir_output.get("to_user"):
-            print(ir_output["to_user"])
-            if dashboard:
-                dashboard.update(workspace_links, ir_output["to_user"])
-        if qh_output.get("to_user"):
-            print(qh_output["to_user"])
-            if dashboard:
-                dashboard.update(workspace_links, qh_output["to_user"])
-        # 6. Save feedback info if present
-        if qh_output.get("feedback_info"):
-            save_feedback(qh_output["feedback_info"])
-            print("Feedback info saved to feedback_info.json.")
+            # 5. Direct important info to user
+            if ir_output and ir_output.get("to_user"):
+                print(ir_output["to_user"])
+                if dashboard:
+                    dashboard.update(workspace_links, ir_output["to_user"])
+            if qh_output.get("to_user"):
+                print(qh_output["to_user"])
+                if dashboard:
+                    dashboard.update(workspace_links, qh_output["to_user"])
+            # 6. Save feedback info if present
+            if qh_output.get("feedback_info"):
+                save_feedback(qh_output["feedback_info"])
+                print("Feedback info saved to feedback_info.json.")
+    finally:
+        # fsync appends still pending under KB_FSYNC=interval, also on errors / Ctrl-C
+        knowledge_base.close()
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        print(format_summary(default_llm_metrics.session_summary()))
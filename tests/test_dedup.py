@@ -0,0 +1,75 @@
+import random
+
+from agents.dedup import FingerprintIndex, simhash, reuse_verdict, SIMHASH_BITS
+
+WORDS = [f"word{i}" for i in range(400)]
+
+
+def _text(seed, n=200):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def test_simhash_is_deterministic_and_case_insensitive():
+    text = _text(1)
+    assert simhash(text) == simhash(text.upper())
+    assert 0 <= simhash(text) < 1 << SIMHASH_BITS
+
+
+def test_simhash_skips_short_texts():
+    assert simhash("too short to fingerprint") is None
+
+
+def test_near_duplicates_are_close_unrelated_texts_are_not():
+    base = _text(1)
+    edited = base.replace(base.split()[100], "changed", 1)
+    close = bin(simhash(base) ^ simhash(edited)).count("1")
+    far = bin(simhash(base) ^ simhash(_text(2))).count("1")
+    assert close < far
+    assert far > 10
+
+
+def test_index_finds_within_distance_and_persists(tmp_path):
+    path = str(tmp_path / "fingerprints.json")
+    index = FingerprintIndex(path, max_distance=3)
+    fp = simhash(_text(1))
+    index.add("L1", fp, "https://a.com/x", {"to_knowledge_base": []})
+    index.save()
+
+    reloaded = FingerprintIndex(path, max_distance=3)
+    link_id, entry, distance = reloaded.find(fp ^ 0b101)          # 2 bits differ
+    assert (link_id, entry["url"], distance) == ("L1", "https://a.com/x", 2)
+    assert reloaded.find(fp ^ 0b1111) is None                     # 4 bits differ
+    assert reloaded.find(fp ^ ((1 << SIMHASH_BITS) - 1)) is None  # no shared band
+
+
+def test_index_replaces_an_entry_and_its_buckets(tmp_path):
+    index = FingerprintIndex(str(tmp_path / "fp.json"), max_distance=0)
+    old, new = simhash(_text(1)), simhash(_text(2))
+    index.add("L1", old, "https://a.com", {})
+    index.add("L1", new, "https://a.com", {})
+    assert index.find(old) is None
+    assert index.find(new)[0] == "L1"
+
+
+def test_reuse_verdict_carries_over_only_the_duplicated_link():
+    verdict = {
+        "thinking_process": "Profile matches.",
+        "to_knowledge_base": [
+            {"link": "https://www.a.com/x/", "confidence": 3, "add_to_db": True},
+            {"link": "https://other.com", "add_to_db": True},
+        ],
+        "to_clarifier": [{"link": "https://b.com"}],
+    }
+    confirmed = reuse_verdict(verdict, "https://a.com/x", "https://mirror.com/x", True, 2)
+    assert confirmed["to_knowledge_base"] == [
+        {"link": "https://mirror.com/x", "confidence": 4, "add_to_db": True, "is_confirmed": True}
+    ]
+    assert confirmed["to_clarifier"] == []
+    assert confirmed["thinking_process"].startswith("Near-duplicate of https://a.com/x (SimHash distance 2)")
+
+    unconfirmed = reuse_verdict(verdict, "https://a.com/x", "https://mirror.com/x", False, 2)
+    assert unconfirmed["to_knowledge_base"] == []
+    assert unconfirmed["to_clarifier"] == [
+        {"link": "https://mirror.com/x", "confidence": 3, "add_to_db": False, "is_confirmed": False}
+    ]
@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+from executor.job_queue import CrawlQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return CrawlQueue(str(tmp_path / "queue.db"), max_attempts=2)
+
+
+def _expire(queue, job_id):
+    with queue._tx() as conn:
+        conn.execute("UPDATE jobs SET lease_expires = ? WHERE id = ?", (time.time() - 1, job_id))
+
+
+def test_claim_leases_each_job_once(queue):
+    ids = queue.enqueue("001", [{"link": f"https://example.com/{i}"} for i in range(3)])
+    first = queue.claim("w1", limit=2)
+    second = queue.claim("w2", limit=2)
+    assert [j["id"] for j in first] == ids[:2]
+    assert [j["id"] for j in second] == ids[2:]
+    assert queue.claim("w3") == []
+    assert first[0]["item"] == {"link": "https://example.com/0"}
+    assert first[0]["status"] == "leased" and first[0]["attempts"] == 1
+
+
+def test_claim_filters_by_user(queue):
+    queue.enqueue("001", [{"n": 1}])
+    other = queue.enqueue("002", [{"n": 2}])
+    assert [j["id"] for j in queue.claim("w1", limit=5, user_id="002")] == other
+
+
+def test_complete_requires_the_lease(queue):
+    (job_id,) = queue.enqueue("001", [{}])
+    queue.claim("w1")
+    assert not queue.complete(job_id, "w2", {"ok": True})
+    assert queue.complete(job_id, "w1", {"ok": True})
+    job = queue.get(job_id)
+    assert job["status"] == "done" and job["result"] == {"ok": True}
+    assert not queue.complete(job_id, "w1", {"ok": True})
+
+
+def test_heartbeat_extends_only_own_leases(queue):
+    (job_id,) = queue.enqueue("001", [{}])
+    leased = queue.claim("w1", lease_seconds=1)[0]
+    assert queue.heartbeat("w2", [job_id], lease_seconds=60) == 0
+    assert queue.heartbeat("w1", [job_id], lease_seconds=60) == 1
+    assert queue.get(job_id)["lease_expires"] > leased["lease_expires"]
+    assert queue.heartbeat("w1", []) == 0
+
+
+def test_expired_lease_is_reclaimed(queue):
+    (job_id,) = queue.enqueue("001", [{}])
+    queue.claim("w1")
+    assert queue.claim("w2") == []
+    _expire(queue, job_id)
+    reclaimed = queue.claim("w2")
+    assert [j["id"] for j in reclaimed] == [job_id]
+    assert reclaimed[0]["lease_owner"] == "w2" and reclaimed[0]["attempts"] == 2
+    # the first worker lost its lease
+    assert not queue.complete(job_id, "w1", {})
+
+
+def test_exhausted_expired_lease_is_failed_on_claim(queue):
+    (job_id,) = queue.enqueue("001", [{}])
+    for worker in ("w1", "w2"):
+        assert queue.claim(worker)
+        _expire(queue, job_id)
+    assert queue.claim("w3") == []
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["error"] == "lease expired"
+    assert job["lease_owner"] is None
+
+
+def test_fail_requeues_until_max_attempts(queue):
+    (job_id,) = queue.enqueue("001", [{}])
+    queue.claim("w1")
+    assert queue.fail(job_id, "w1", "Request failed: boom")
+    assert queue.get(job_id)["status"] == "queued"
+    queue.claim("w1")
+    assert queue.fail(job_id, "w1", "Request failed: boom")
+    job = queue.get(job_id)
+    assert job["status"] == "failed" and job["error"] == "Request failed: boom"
+    assert queue.stats() == {"queued": 0, "leased": 0, "done": 0, "failed": 1}
+
+
+def test_release_expired(queue):
+    ids = queue.enqueue("001", [{}, {}])
+    queue.claim("w1", limit=2)
+    _expire(queue, ids[0])
+    assert queue.release_expired() == 1
+    assert queue.get(ids[0])["status"] == "queued"
+    assert queue.get(ids[1])["status"] == "leased"
+
+
+def test_take_token_is_shared_through_the_db(queue):
+    other = CrawlQueue(queue.db_path)
+    assert queue.take_token("example.com", rate=0.5, burst=2) == 0
+    assert other.take_token("example.com", rate=0.5, burst=2) == 0
+    wait = queue.take_token("example.com", rate=0.5, burst=2)
+    assert 0 < wait <= 2
+    assert other.take_token("other.org", rate=0.5, burst=2) == 0
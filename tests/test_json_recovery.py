@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from agents.json_recovery import repair_json, RecoveryMetrics
+
+
+def test_clean_reply_needs_no_fixes():
+    assert repair_json('{"a": [1, 2]}') == ({"a": [1, 2]}, [])
+
+
+@pytest.mark.parametrize("text, value, fixes", [
+    ('```json\n{"a": 1}\n```', {"a": 1}, ["fence"]),
+    ('```\n{"a": 1}', {"a": 1}, ["fence"]),
+    ('Here you go:\n{"a": 1}\nHope this helps!', {"a": 1}, ["prose"]),
+    ('{"a": True, "b": False, "c": None, "d": "True"}',
+     {"a": True, "b": False, "c": None, "d": "True"}, ["python_literals"]),
+    ('{"a": [1, 2,], "b": {"c": 1, },}', {"a": [1, 2], "b": {"c": 1}}, ["trailing_comma"]),
+    ('[1, 2]', [1, 2], []),
+])
+def test_local_fixes(text, value, fixes):
+    assert repair_json(text) == (value, fixes)
+
+
+def test_strings_are_left_untouched():
+    text = '{"a": "x, ] None ```", "b": "say \\"hi\\", }"}'
+    assert repair_json(text) == (json.loads(text), [])
+
+
+def test_truncated_reply_drops_unfinished_element():
+    text = '{"thinking_process": "ok", "links": [{"link": "https://a.com", "n": 1}, {"link": "https://b.c'
+    value, fixes = repair_json(text)
+    assert value == {"thinking_process": "ok", "links": [{"link": "https://a.com", "n": 1}]}
+    assert fixes == ["truncated"]
+
+
+def test_truncated_after_complete_element():
+    value, fixes = repair_json('{"links": [{"link": "https://a.com"},')
+    assert value == {"links": [{"link": "https://a.com"}]}
+    assert fixes == ["truncated"]
+
+
+def test_truncated_mid_field_keeps_earlier_fields():
+    value, _ = repair_json('{"a": 1, "b": "unfinish')
+    assert value == {"a": 1}
+
+
+def test_fixes_combine():
+    value, fixes = repair_json('```json\n{"a": [True,], "b": [{"c": 1}, {"c": 2')
+    assert value == {"a": [True], "b": [{"c": 1}]}
+    assert fixes == ["fence", "python_literals", "trailing_comma", "truncated"]
+
+
+@pytest.mark.parametrize("text", ["", "no json here", "Sorry, I cannot help with that."])
+def test_unrecoverable(text):
+    with pytest.raises(json.JSONDecodeError):
+        repair_json(text)
+
+
+def test_recovery_metrics():
+    metrics = RecoveryMetrics()
+    metrics.record("clarifier", "clean")
+    metrics.record("clarifier", "repaired")
+    metrics.record("clarifier", "fence", 2)
+    snap = metrics.snapshot("clarifier")["clarifier"]
+    assert snap["clean"] == 1 and snap["repaired"] == 1 and snap["fence"] == 2 and snap["failed"] == 0
+    assert metrics.snapshot("other") == {"other": {}}
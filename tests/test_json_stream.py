@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from agents.json_stream import JSONArrayStream, array_elements
+
+REPLY = {
+    "thinking_process": "links: [not, an, array] {x}",
+    "links": [
+        {"link": "https://example.com/a?q=[1]", "note": "brace } and \"quote\""},
+        {"link": "https://example.com/b", "tags": ["x", {"y": [1, 2]}]},
+    ],
+    "scores": [1, 2.5, True, None, "s,]"],
+    "meta": {"nested": [9, 9]},
+    "empty": [],
+}
+
+
+def _feed(text, size):
+    parser = JSONArrayStream()
+    out = []
+    for i in range(0, len(text), size):
+        out += parser.feed(text[i:i + size])
+    return parser, out
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 10_000])
+def test_elements_emitted_whatever_the_chunking(size):
+    text = json.dumps(REPLY, indent=2)
+    parser, out = _feed(text, size)
+    assert out == list(array_elements(REPLY))
+    assert parser.emitted == {"links": 2, "scores": 5}
+    assert parser.close() == REPLY
+    assert not parser.failed
+
+
+def test_element_emitted_as_soon_as_it_closes():
+    parser = JSONArrayStream()
+    assert parser.feed('{"links": [{"link": "https://a.com"}') == [("links", {"link": "https://a.com"})]
+    assert parser.feed(', {"link": "https://b') == []
+    assert parser.feed('.com"}]}') == [("links", {"link": "https://b.com"})]
+
+
+def test_root_array():
+    _, out = _feed('[{"a": 1}, 2, "three"]', 4)
+    assert out == [("", {"a": 1}), ("", 2), ("", "three")]
+
+
+def test_escaped_key():
+    _, out = _feed('{"we\\"ird": [1]}', 1)
+    assert out == [('we"ird', 1)]
+
+
+def test_malformed_element_stops_emitting_but_keeps_text():
+    parser = JSONArrayStream()
+    out = parser.feed('{"links": [{"a": 1}, {"b": True}, {"c": 3}]}')
+    assert out == [("links", {"a": 1})]
+    assert parser.failed
+    assert parser.feed("  ") == []
+    assert parser.text() == '{"links": [{"a": 1}, {"b": True}, {"c": 3}]}  '
+    with pytest.raises(json.JSONDecodeError):
+        parser.close()
+
+
+def test_array_elements_of_parsed_reply():
+    assert list(array_elements({"a": [1, 2], "b": "x", "c": []})) == [("a", 1), ("a", 2)]
+    assert list(array_elements([1])) == [("", 1)]
+    assert list(array_elements("text")) == []
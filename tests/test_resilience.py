@@ -0,0 +1,64 @@
+import pytest
+
+from executor import resilience
+from executor.resilience import CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _breaker():
+    return CircuitBreaker(failure_threshold=0.5, window=4, min_calls=4, cooldown=10)
+
+
+def test_stays_closed_below_min_calls_and_threshold(clock):
+    breaker = _breaker()
+    for success in (False, False, False):
+        breaker.record(success)
+    assert breaker.state == CircuitBreaker.CLOSED      # only 3 calls
+    breaker = _breaker()
+    for success in (True, True, True, False):
+        breaker.record(success)
+    assert breaker.state == CircuitBreaker.CLOSED      # 25% failures
+    assert breaker.allow()
+
+
+def test_opens_rejects_then_probes(clock):
+    breaker = _breaker()
+    for success in (True, False, True, False):
+        breaker.record(success)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow() and breaker.rejected == 1
+    assert breaker.snapshot()["retry_in_s"] == 10
+
+    clock[0] += 10
+    assert breaker.allow()                             # the half-open probe
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()                         # one probe at a time
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.snapshot()["window_calls"] == 0
+
+
+def test_failed_probe_reopens(clock):
+    breaker = _breaker()
+    for _ in range(4):
+        breaker.record(False)
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    assert not breaker.allow()
+
+
+def test_window_forgets_old_outcomes(clock):
+    breaker = _breaker()
+    for success in (False, True, True, True, True):
+        breaker.record(success)
+    assert breaker.snapshot()["error_rate"] == 0.0
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,49 @@
+import pytest
+
+from executor import scheduler
+from executor.scheduler import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    return clock
+
+
+def test_burst_then_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.try_take() for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_take() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.try_take() == 0
+    assert bucket.try_take() == pytest.approx(0.5)
+
+
+def test_refill_is_capped_at_burst(clock):
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.take()
+    clock.now += 100
+    assert bucket.time_until_token() == 0
+    assert bucket.tokens == 2
+
+
+def test_burst_is_at_least_one(clock):
+    bucket = TokenBucket(rate=1, burst=0)
+    assert bucket.try_take() == 0
+    assert bucket.try_take() == pytest.approx(1)
+
+
+def test_zero_rate_never_refills(clock):
+    bucket = TokenBucket(rate=0, burst=1)
+    assert bucket.try_take() == 0
+    clock.now += 1e6
+    assert bucket.try_take() == float("inf")
@@ -0,0 +1,62 @@
+import pytest
+
+from utils.url_canon import canonicalize_url
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTP://WWW.Example.com/About/", "https://example.com/About"),
+    ("https://example.com", "https://example.com/"),
+    ("example.com/a", "https://example.com/a"),
+    ("example.com:8080/a", "https://example.com:8080/a"),
+    ("https://example.com//a//b/", "https://example.com/a/b"),
+    ("https://example.com/a#section", "https://example.com/a"),
+    ("https://example.com./a", "https://example.com/a"),
+])
+def test_basic_normalization(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("http://example.com:80/a", "https://example.com/a"),
+    ("https://example.com:443/a", "https://example.com/a"),
+    # the default port is judged by the scheme as given, before the upgrade
+    ("http://example.com:443/", "https://example.com:443/"),
+    ("https://example.com:80/", "https://example.com:80/"),
+    ("https://example.com:8080/a", "https://example.com:8080/a"),
+])
+def test_default_ports(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+def test_tracking_params_dropped_and_rest_sorted():
+    url = "https://example.com/p?b=2&utm_source=x&a=1&fbclid=y&UTM_Medium=z"
+    assert canonicalize_url(url) == "https://example.com/p?a=1&b=2"
+
+
+def test_host_aliases():
+    assert canonicalize_url("https://mobile.twitter.com/someone") == "https://x.com/someone"
+    assert canonicalize_url("https://m.youtube.com/@chan") == "https://youtube.com/@chan"
+
+
+def test_youtube_video_variants_collapse():
+    expected = "https://youtube.com/watch?v=s0jn7eE33nk"
+    assert canonicalize_url("https://youtu.be/s0jn7eE33nk") == expected
+    assert canonicalize_url("https://www.youtube.com/watch?v=s0jn7eE33nk&list=PL1&t=42") == expected
+
+
+def test_platforms_without_meaningful_queries():
+    assert canonicalize_url("https://x.com/someone?s=20&t=abc") == "https://x.com/someone"
+    assert canonicalize_url("https://www.linkedin.com/in/someone/?originalSubdomain=uk") == \
+        "https://linkedin.com/in/someone"
+
+
+def test_github_keeps_page_selecting_queries():
+    assert canonicalize_url("https://github.com/someone?tab=repositories&ref=home") == \
+        "https://github.com/someone?tab=repositories"
+    assert canonicalize_url("https://github.com/someone?tab=stars") != \
+        canonicalize_url("https://github.com/someone?tab=repositories")
+
+
+@pytest.mark.parametrize("value", ["", "not a url", "mailto:someone@example.com", "http://[::1"])
+def test_non_urls_left_alone(value):
+    assert canonicalize_url(value) == value.strip()
@@ -0,0 +1,74 @@
+"""
+URL extraction and platform tagging without an LLM.
+
+PLATFORMS is a compiled rule table (host pattern → platform label, first
+match wins) shared by QueryHandlerAgent's fast path and the offline LLM
+provider. Hosts no rule matches are tagged "PersonalSite" when the URL is a
+site root and "Unknown" otherwise, following the query-handler prompt.
+"""
+import re
+from typing import List, Tuple
+from urllib.parse import urlsplit
+
+from utils.url_canon import canonicalize_url
+
+_PLATFORM_TABLE: List[Tuple[str, str]] = [
+    (r"(x|twitter)\.com", "X"),
+    (r"(youtube\.com|youtu\.be)", "YouTube"),
+    (r"github\.com", "GitHub"),
+    (r"gitlab\.com", "GitLab"),
+    (r"linkedin\.com", "LinkedIn"),
+    (r"instagram\.com", "Instagram"),
+    (r"facebook\.com|fb\.com", "Facebook"),
+    (r"tiktok\.com", "TikTok"),
+    (r"threads\.net", "Threads"),
+    (r"bsky\.app", "Bluesky"),
+    (r"reddit\.com", "Reddit"),
+    (r"medium\.com", "Medium"),
+    (r"substack\.com", "Substack"),
+    (r"dribbble\.com", "Dribbble"),
+    (r"behance\.net", "Behance"),
+    (r"(en\.)?wikipedia\.org", "Wikipedia"),
+    (r"imdb\.com", "IMDb"),
+    (r"vimeo\.com", "Vimeo"),
+    (r"twitch\.tv", "Twitch"),
+    (r"soundcloud\.com", "SoundCloud"),
+    (r"spotify\.com", "Spotify"),
+    (r"producthunt\.com", "ProductHunt"),
+    (r"stackoverflow\.com", "StackOverflow"),
+    (r"scholar\.google\.com", "GoogleScholar"),
+]
+# the host itself or any subdomain of it
+PLATFORMS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(rf"^(?:[\w-]+\.)*(?:{pattern})$"), label) for pattern, label in _PLATFORM_TABLE
+]
+
+_URL_RE = re.compile(r"(?:https?://|www\.)[^\s<>\"'`,]+", re.IGNORECASE)
+_TRAILING = ".,;:!?)]}'\""
+
+
+def extract_urls(text: str) -> List[str]:
+    """URLs in `text` in order of appearance, trailing punctuation stripped, one per canonical URL."""
+    found: List[str] = []
+    seen = set()
+    for match in _URL_RE.finditer(text):
+        url = match.group(0)
+        # keep a closing ")" that belongs to the URL, e.g. /wiki/Mercury_(planet)
+        while url and url[-1] in _TRAILING and not (url[-1] == ")" and url.count("(") >= url.count(")")):
+            url = url[:-1]
+        if url.lower().startswith("www."):
+            url = "https://" + url
+        key = canonicalize_url(url)
+        if key not in seen:
+            seen.add(key)
+            found.append(url)
+    return found
+
+
+def classify_platform(url: str) -> str:
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    for pattern, label in PLATFORMS:
+        if pattern.match(host):
+            return label
+    return "PersonalSite" if parts.path in ("", "/") else "Unknown"
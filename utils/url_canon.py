@@ -0,0 +1,118 @@
+"""
+URL canonicalization shared by the link index, the executor and the
+workspace bookkeeping in main.py, so `www.`/trailing-slash/tracking-param
+variants of one page collapse onto a single key.
+"""
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# query parameters that never change the page content
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid",
+    "ref_src", "ref_url", "si", "feature", "_hsenc", "_hsmi",
+}
+TRACKING_PREFIXES = ("utm_",)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# host aliases → canonical host
+HOST_ALIASES = {
+    "m.youtube.com": "youtube.com",
+    "music.youtube.com": "youtube.com",
+    "twitter.com": "x.com",
+    "mobile.twitter.com": "x.com",
+    "mobile.x.com": "x.com",
+    "m.facebook.com": "facebook.com",
+    "m.wikipedia.org": "wikipedia.org",
+}
+
+_YOUTU_BE_RE = re.compile(r"^/([\w-]{6,})$")
+# "example.com/…" or "example.com:8080/…" without a scheme (not "mailto:a@b.c")
+_BARE_HOST_RE = re.compile(r"^[\w-]+(\.[\w-]+)+(:\d+)?$")
+
+
+def _youtube(host: str, path: str, params: list[tuple[str, str]]):
+    # youtu.be/<id> and /watch?v=<id>&list=…&t=… all identify one video
+    if host == "youtu.be":
+        m = _YOUTU_BE_RE.match(path)
+        if m:
+            return "youtube.com", "/watch", [("v", m.group(1))]
+    if path == "/watch":
+        return host, path, [(k, v) for k, v in params if k == "v"]
+    return host, path, params
+
+
+def _drop_query(host: str, path: str, params: list[tuple[str, str]]):
+    return host, path, []
+
+
+# GitHub queries select different pages (?tab=repositories vs ?tab=stars,
+# ?q=, ?page=…); only its own referral params are dropped
+_GITHUB_TRACKING = {"ref", "ref_cta", "ref_loc", "ref_page", "source", "email_source", "email_token"}
+
+
+def _github(host: str, path: str, params: list[tuple[str, str]]):
+    return host, path, [(k, v) for k, v in params if k.lower() not in _GITHUB_TRACKING]
+
+
+# canonical host → rule(host, path, params) -> (host, path, params)
+PLATFORM_RULES = {
+    "youtube.com": _youtube,
+    "youtu.be": _youtube,
+    "x.com": _drop_query,
+    "linkedin.com": _drop_query,
+    "instagram.com": _drop_query,
+    "github.com": _github,
+}
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Return the canonical form of `url`:
+      • scheme and host lower-cased, http upgraded to https, `www.` and
+        default ports removed, known host aliases folded (twitter.com → x.com);
+      • trailing slash removed (except for the bare root path);
+      • fragment and tracking parameters (utm_*, fbclid, …) dropped, the rest sorted;
+      • per-platform rules applied (e.g. YouTube keeps only `watch?v=`).
+    Strings that do not look like absolute URLs are returned stripped but otherwise unchanged.
+    """
+    if not url:
+        return url
+    raw = url.strip()
+    if "://" not in raw and _BARE_HOST_RE.match(raw.split("/", 1)[0]) and " " not in raw:
+        raw = "https://" + raw
+    try:
+        parts = urlsplit(raw)
+        port = parts.port
+    except ValueError:
+        return url.strip()
+    if not parts.scheme or not parts.hostname:
+        return url.strip()
+
+    scheme = parts.scheme.lower()
+    # the default port is the one of the scheme as given (http://…:80 drops
+    # it, http://…:443 keeps it); only then is http upgraded
+    default_port = DEFAULT_PORTS.get(scheme)
+    if scheme == "http":
+        scheme = "https"
+    host = parts.hostname.lower().rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    host = HOST_ALIASES.get(host, host)
+    netloc = host if port in (None, default_port) else f"{host}:{port}"
+
+    path = re.sub(r"/{2,}", "/", parts.path or "/")
+    params = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    ]
+
+    rule = PLATFORM_RULES.get(host)
+    if rule:
+        host, path, params = rule(host, path, params)
+        netloc = host if port in (None, default_port) else f"{host}:{port}"
+
+    if len(path) > 1:
+        path = path.rstrip("/")
+    query = urlencode(sorted(params))
+    return urlunsplit((scheme, netloc, path, query, ""))